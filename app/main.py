@@ -1,20 +1,31 @@
-from flask import Flask, redirect, request, session, url_for, render_template, flash, jsonify
+from flask import Flask, redirect, request, session, url_for, render_template, flash, jsonify, Response, stream_with_context, g
 from flask_session import Session
 from flask_cors import CORS
 from datetime import timedelta, datetime
 import os
+import json
+import time
+import hmac
+import ipaddress
 import logging
 from dotenv import load_dotenv
+from spotipy import Spotify
 from app.services.spotify_service import SpotifyService, SpotifyAuthError
-from app.services.rate_limiter import rate_limit
-from app.manager import SpotifyPlaylistManager
+from app.services.rate_limiter import rate_limit, rate_limiter
+from app.services.http_pool import http_pool
+from app.services.client_pool import client_pool
+from app.services.jobs import job_queue
+from app.services.single_flight import upstream_requests
+from app.services.metrics import metrics
+from app.services.library_index import library_index
+from app.services.logging_control import log_control
+from app.services import projections
+from app.manager import SpotifyPlaylistManager, PlaylistConflictError
 
 load_dotenv()
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Queued output and the LOG_MODE level; switch modes by writing to LOG_MODE_FILE
+log_control.configure()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -27,14 +38,142 @@ app.config.update(
     SESSION_COOKIE_SECURE=True,
     SESSION_COOKIE_HTTPONLY=True,
     SESSION_COOKIE_SAMESITE='Lax',
-    SESSION_COOKIE_NAME='spotify_session'
+    SESSION_COOKIE_NAME='spotify_session',
+    RATE_LIMIT_BACKEND=os.getenv('RATE_LIMIT_BACKEND', 'memory'),
+    RATE_LIMIT_REDIS_URL=os.getenv('RATE_LIMIT_REDIS_URL', os.getenv('REDIS_URL')),
+    RATE_LIMIT_MAX_REQUESTS=int(os.getenv('RATE_LIMIT_MAX_REQUESTS', 100)),
+    RATE_LIMIT_WINDOW_SECONDS=int(os.getenv('RATE_LIMIT_WINDOW_SECONDS', 60)),
+    JOBS_BACKEND=os.getenv('JOBS_BACKEND', 'sqlite'),
+    JOBS_REDIS_URL=os.getenv('JOBS_REDIS_URL', os.getenv('REDIS_URL')),
+    BULK_MAX_PLAYLISTS=int(os.getenv('BULK_MAX_PLAYLISTS', 50)),
+    DASHBOARD_PAGE_SIZE=int(os.getenv('DASHBOARD_PAGE_SIZE', 48)),
+    METRICS_TOKEN=os.getenv('METRICS_TOKEN'),
+    METRICS_ALLOWED_IPS=[
+        ipaddress.ip_network(network.strip()) for network in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if network.strip()
+    ]
 )
 
 CORS(app)
 Session(app)
+rate_limiter.init_app(app)
+job_queue.init_app(app)
 
 spotify_service = SpotifyService()
 
+def get_user_manager(playlist_id=None):
+    """Playlist manager on the current user's pooled Spotify client."""
+    sp = spotify_service.get_spotify_client()
+    if not isinstance(sp, Spotify):
+        raise SpotifyAuthError("No valid Spotify client")
+    return SpotifyPlaylistManager(playlist_id, sp=sp)
+
+def get_public_manager(playlist_id=None):
+    """Playlist manager on the pooled guest client, or None if no guest token is available."""
+    sp = spotify_service.get_public_client()
+    if sp is None:
+        return None
+    return SpotifyPlaylistManager(playlist_id, sp=sp)
+
+def ndjson_response(events):
+    """Stream events to the client as newline-delimited JSON while they are produced."""
+    lines = (json.dumps(event, default=str) + '\n' for event in events)
+    return Response(
+        stream_with_context(lines),
+        mimetype='application/x-ndjson',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def analysis_events(manager, criteria):
+    """Analysis events with the final result shaped like the analyze-optimization response."""
+    tracks_to_remove = []
+    for event in manager.iter_analyze_tracks(criteria):
+        if event['type'] == 'track' and event['track']['remove']:
+            tracks_to_remove.append(event['track'])
+        elif event['type'] == 'result':
+            event = {
+                'type': 'result',
+                'snapshotId': event['analysis']['snapshot_id'],
+                'tracksToRemove': tracks_to_remove,
+                'duplicates': event['analysis']['duplicates'],
+                'totalTracks': event['analysis']['total_tracks'],
+                'affectedTracks': len(tracks_to_remove)
+            }
+        yield event
+
+def run_optimization(manager, criteria):
+    """Remove the tracks of a dry-run plan, or of a fresh evaluation against ``criteria``.
+
+    A plan is the ``snapshotId`` and ``tracksToRemove`` returned by
+    analyze-optimization and is only applied if the playlist is still at that
+    snapshot. Without a plan the playlist is evaluated first and matching
+    tracks are removed if autoRemove is set.
+    """
+    if criteria.get('snapshotId') and isinstance(criteria.get('tracksToRemove'), list):
+        snapshot_id, tracks_to_remove = criteria['snapshotId'], criteria['tracksToRemove']
+    else:
+        evaluation = manager.evaluate_optimization(criteria)
+        snapshot_id = evaluation['snapshot_id']
+        tracks_to_remove = evaluation['tracks_to_remove'] if criteria.get('autoRemove') else []
+    
+    removal = manager.remove_planned_tracks(snapshot_id, tracks_to_remove)
+    return {
+        'message': f"Successfully optimized playlist. Removed {removal['tracks_removed']} tracks.",
+        'removedTracks': removal['tracks_removed'],
+        'snapshotId': removal['snapshot_id']
+    }
+
+def get_job_manager(job, params):
+    """Playlist manager for a background job, on its own client with the submitting user's token."""
+    sp = client_pool.detached_client(params.get('access_token'))
+    if not isinstance(sp, Spotify):
+        raise SpotifyAuthError("No valid Spotify client")
+    return SpotifyPlaylistManager(job['playlist_id'], sp=sp)
+
+@job_queue.handler('analyze')
+def run_analysis_job(job, params, report):
+    manager = get_job_manager(job, params)
+    for event in analysis_events(manager, job['criteria']):
+        if event['type'] == 'progress':
+            report({'stage': event['stage'], 'done': event['done'], 'total': event['total']})
+        elif event['type'] == 'result':
+            return {key: value for key, value in event.items() if key != 'type'}
+    raise RuntimeError("Analysis finished without a result")
+
+@job_queue.handler('optimize', retryable=False)
+def run_optimization_job(job, params, report):
+    report({'stage': 'optimize'})
+    result = run_optimization(get_job_manager(job, params), job['criteria'])
+    library_index.mark_stale(job['owner'], job['playlist_id'], -result['removedTracks'])
+    return result
+
+def submit_job(kind, playlist_id):
+    """Queue a ``kind`` job for the current user and respond with it right away."""
+    try:
+        criteria = request.json
+        if not criteria:
+            return jsonify({'error': 'No criteria provided'}), 400
+        
+        # Refreshes the session token if needed before it is handed to the job
+        get_user_manager(playlist_id)
+        job = job_queue.submit(
+            kind,
+            playlist_id,
+            criteria,
+            spotify_service.current_client_key(),
+            params={'access_token': session['token_info']['access_token']}
+        )
+        
+        response = jsonify(job_queue.public(job))
+        response.headers['Location'] = url_for('get_job', job_id=job['id'])
+        return response, 202
+        
+    except Exception as e:
+        logger.error("Error submitting %s job: %s", kind, e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 # Context processor to inject year into all templates
 @app.context_processor
 def inject_year():
@@ -50,7 +189,36 @@ def inject_user():
     return {'current_user': User()}
 
 # Public endpoints for browsing without authentication
-PUBLIC_ENDPOINTS = ['/', '/login', '/callback', '/public', '/browse', '/api/browse', '/api/public', '/static', '/index', '/error', '/public_playlists', '/api/category_playlists', '/api/playlists/category', '/playlist', '/api/playlist']
+PUBLIC_ENDPOINTS = ['/', '/login', '/callback', '/public', '/browse', '/api/browse', '/api/public', '/static', '/index', '/error', '/public_playlists', '/api/category_playlists', '/api/playlists/category', '/playlist', '/api/playlist', '/metrics']
+
+def metrics_access_allowed():
+    """Whether the scraper presents METRICS_TOKEN as a bearer token or connects from METRICS_ALLOWED_IPS."""
+    token = app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    if token and authorization.startswith('Bearer ') and hmac.compare_digest(authorization[len('Bearer '):], token):
+        return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in app.config['METRICS_ALLOWED_IPS'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe(
+            'http_request_duration_seconds',
+            time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else 'unmatched',
+            method=request.method,
+            status=str(response.status_code)
+        )
+    return response
 
 @app.after_request
 def add_header(response):
@@ -81,11 +249,11 @@ def check_session():
                     session['token_info'] = new_token
                     session['created_at'] = datetime.now().isoformat()
                 except Exception as e:
-                    logger.error(f"Token refresh failed: {str(e)}")
+                    logger.error("Token refresh failed: %s", e)
                     session.clear()
                     return redirect(url_for('index'))
         except Exception as e:
-            logger.error(f"Session check error: {str(e)}")
+            logger.error("Session check error: %s", e)
             session.clear()
             return redirect(url_for('index'))
 
@@ -114,7 +282,7 @@ def login():
         auth_url = spotify_service.get_auth_url()
         return redirect(auth_url)
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         flash('Failed to initialize login', 'error')
         return render_template('error.html', error="Authentication failed"), 500
 
@@ -133,6 +301,8 @@ def callback():
             flash('Authentication failed: State verification failed', 'error')
             return redirect(url_for('index'))
 
+        # A profile left from an earlier login must not key the new token's client
+        session.pop('user_info', None)
         token_info = spotify_service.get_token(code)
         if not token_info:
             flash('Authentication failed: No token received', 'error')
@@ -156,7 +326,7 @@ def callback():
         return redirect(url_for('dashboard'))
         
     except Exception as e:
-        logger.error(f"Callback error: {str(e)}", exc_info=True)
+        logger.error("Callback error: %s", e, exc_info=True)
         flash(f'Authentication failed: {str(e)}', 'error')
         return redirect(url_for('index'))
 
@@ -164,12 +334,18 @@ def callback():
 @spotify_service.require_auth
 def dashboard():
     try:
-        playlists = spotify_service.get_user_playlists()
+        page = max(1, request.args.get('page', 1, type=int))
+        page_size = app.config['DASHBOARD_PAGE_SIZE']
+        user_key = spotify_service.current_client_key()
+        playlists = library_index.get(user_key, get_user_manager(), page_size, (page - 1) * page_size)
+        pages = max(1, -(-library_index.count(user_key) // page_size))
         return render_template('dashboard.html', 
                              playlists=playlists,
+                             page=page,
+                             pages=pages,
                              user=session.get('user_info'))
     except Exception as e:
-        logger.error(f"Dashboard error: {str(e)}")
+        logger.error("Dashboard error: %s", e)
         flash('Failed to load playlists', 'error')
         return redirect(url_for('index'))
 
@@ -182,95 +358,110 @@ def analyze_optimization(playlist_id):
         if not criteria:
             return jsonify({'error': 'No criteria provided'}), 400
             
-        manager = SpotifyPlaylistManager(playlist_id)
-        
-        # Get the playlist tracks and analyze them
-        tracks = manager.get_playlist_tracks()
+        manager = get_user_manager(playlist_id)
         
-        tracks_to_remove = []
-        for track in tracks:
-            if not track.get('track'):
-                continue
-                
-            track_data = track['track']
-            reasons = []
-            
-            # Check popularity
-            if track_data['popularity'] < int(criteria.get('minPopularity', 30)):
-                reasons.append(f"Low popularity ({track_data['popularity']}%)")
-            
-            # Check energy
-            energy = manager.get_energy(track_data['id'])
-            if energy < float(criteria.get('minEnergy', 0.2)):
-                reasons.append(f"Low energy ({energy*100:.0f}%)")
-            
-            if reasons:
-                tracks_to_remove.append({
-                    'id': track_data['id'],
-                    'name': track_data['name'],
-                    'artist': track_data['artists'][0]['name'],
-                    'reasons': reasons,
-                    'popularity': track_data['popularity'],
-                    'energy': energy
-                })
+        # Evaluate all tracks in a single batched pass
+        evaluation = manager.evaluate_optimization(criteria)
+        tracks_to_remove = evaluation['tracks_to_remove']
         
         return jsonify({
+            'snapshotId': evaluation['snapshot_id'],
             'tracksToRemove': tracks_to_remove,
-            'totalTracks': len(tracks),
+            'totalTracks': evaluation['total_tracks'],
             'affectedTracks': len(tracks_to_remove)
         })
         
     except Exception as e:
-        logger.error(f"Optimization analysis error: {str(e)}", exc_info=True)
+        logger.error("Optimization analysis error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/optimize/<playlist_id>', methods=['POST'])
+@app.route('/api/analyze-optimization/<playlist_id>/stream', methods=['POST'])
 @spotify_service.require_auth
 @rate_limit
-def optimize_playlist(playlist_id):
+def analyze_optimization_stream(playlist_id):
+    """Streaming variant of analyze_optimization that reports progress and per-track verdicts."""
     try:
         criteria = request.json
         if not criteria:
-            return jsonify({'error': 'No optimization criteria provided'}), 400
+            return jsonify({'error': 'No criteria provided'}), 400
             
-        manager = SpotifyPlaylistManager(playlist_id)
-        tracks_to_remove = []
+        manager = get_user_manager(playlist_id)
+    except Exception as e:
+        logger.error("Optimization analysis error: %s", e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        try:
+            yield from analysis_events(manager, criteria)
+        except Exception as e:
+            logger.error("Optimization analysis stream error: %s", e, exc_info=True)
+            yield {'type': 'error', 'error': str(e)}
+
+    return ndjson_response(generate())
+
+@app.route('/api/analyze-playlists', methods=['POST'])
+@spotify_service.require_auth
+@rate_limit
+def analyze_playlists():
+    """Analyse several playlists at once, sharing pagination and one audio feature fetch."""
+    try:
+        playlist_ids = (request.json or {}).get('playlistIds')
+        if not isinstance(playlist_ids, list) or not playlist_ids or not all(isinstance(playlist_id, str) and playlist_id for playlist_id in playlist_ids):
+            return jsonify({'error': 'playlistIds must be a non-empty list of playlist IDs'}), 400
+        if len(playlist_ids) > app.config['BULK_MAX_PLAYLISTS']:
+            return jsonify({'error': f"At most {app.config['BULK_MAX_PLAYLISTS']} playlists can be analysed at once"}), 400
         
-        # Get all tracks
-        tracks = manager.get_playlist_tracks()
+        manager = get_user_manager()
+        return jsonify(manager.analyze_playlists(playlist_ids))
         
-        for track in tracks:
-            if not track.get('track'):
-                continue
-                
-            track_data = track['track']
-            remove = False
-            
-            # Check criteria
-            if track_data['popularity'] < int(criteria.get('minPopularity', 30)):
-                remove = True
-            
-            energy = manager.get_energy(track_data['id'])
-            if energy < float(criteria.get('minEnergy', 0.2)):
-                remove = True
+    except Exception as e:
+        logger.error("Bulk analysis error: %s", e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/optimize/<playlist_id>', methods=['POST'])
+@spotify_service.require_auth
+@rate_limit
+def optimize_playlist(playlist_id):
+    try:
+        criteria = request.json
+        if not criteria:
+            return jsonify({'error': 'No optimization criteria provided'}), 400
             
-            if remove:
-                tracks_to_remove.append(track_data['id'])
-        
-        # Remove tracks if specified
-        if criteria.get('autoRemove') and tracks_to_remove:
-            track_uris = [f"spotify:track:{track_id}" for track_id in tracks_to_remove]
-            manager.sp.playlist_remove_all_occurrences_of_items(playlist_id, track_uris)
-        
-        return jsonify({
-            'message': f'Successfully optimized playlist. Removed {len(tracks_to_remove)} tracks.',
-            'removedTracks': len(tracks_to_remove)
-        })
-        
+        manager = get_user_manager(playlist_id)
+        result = run_optimization(manager, criteria)
+        library_index.mark_stale(spotify_service.current_client_key(), playlist_id, -result['removedTracks'])
+        return jsonify(result)
+        
+    except PlaylistConflictError as e:
+        logger.info("Optimization of playlist %s rejected: %s", playlist_id, e)
+        return jsonify({'error': str(e), 'snapshotId': e.snapshot_id}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Optimization error: {str(e)}", exc_info=True)
+        logger.error("Optimization error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/analyze-optimization/<playlist_id>/jobs', methods=['POST'])
+@spotify_service.require_auth
+@rate_limit
+def submit_analysis_job(playlist_id):
+    return submit_job('analyze', playlist_id)
+
+@app.route('/api/optimize/<playlist_id>/jobs', methods=['POST'])
+@spotify_service.require_auth
+@rate_limit
+def submit_optimization_job(playlist_id):
+    return submit_job('optimize', playlist_id)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@spotify_service.require_auth
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    # Jobs of other users are reported as missing
+    if not job or job.get('owner') != spotify_service.current_client_key():
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_queue.public(job))
+
 @app.route('/api/playlist/<playlist_id>/similar/add', methods=['POST'])  
 @spotify_service.require_auth
 @rate_limit
@@ -280,14 +471,15 @@ def add_similar_tracks(playlist_id):
         if not track_ids:
             return jsonify({'error': 'No tracks specified'}), 400
 
-        manager = SpotifyPlaylistManager(playlist_id)
+        manager = get_user_manager(playlist_id)
         
        
         if not manager.verify_playlist():
             return jsonify({'error': 'Playlist not found or not accessible'}), 404
 
      
-        manager.add_similar_tracks(track_ids)
+        added = manager.add_similar_tracks(track_ids)
+        library_index.mark_stale(spotify_service.current_client_key(), playlist_id, len(track_ids) if added else 0)
         
         return jsonify({
             'message': f'Successfully added {len(track_ids)} tracks',
@@ -295,7 +487,7 @@ def add_similar_tracks(playlist_id):
         })
         
     except Exception as e:
-        logger.error(f"Error adding similar tracks: {str(e)}", exc_info=True)
+        logger.error("Error adding similar tracks: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/logout', methods=['GET', 'POST'])
@@ -311,7 +503,7 @@ def logout():
         flash('Successfully logged out', 'success')
         return response
     except Exception as e:
-        logger.error(f"Logout error: {str(e)}")
+        logger.error("Logout error: %s", e)
         return redirect(url_for('index'))
 
 @app.route('/api/playlist/<playlist_id>/similar', methods=['GET'])
@@ -319,14 +511,14 @@ def logout():
 @rate_limit
 def get_similar_tracks(playlist_id):
     try:
-        logger.info(f"Starting similar tracks request for playlist: {playlist_id}")
+        logger.info("Starting similar tracks request for playlist: %s", playlist_id)
         
        
-        manager = SpotifyPlaylistManager(playlist_id)
+        manager = get_user_manager(playlist_id)
         
         
         if not manager.verify_playlist():
-            logger.error(f"Playlist {playlist_id} not found or not accessible")
+            logger.error("Playlist %s not found or not accessible", playlist_id)
             return jsonify({
                 'error': 'Playlist not found or not accessible'
             }), 404
@@ -347,16 +539,44 @@ def get_similar_tracks(playlist_id):
             'total': len(similar_tracks)
         }
         
-        logger.info(f"Successfully found {len(similar_tracks)} similar tracks")
+        logger.info("Successfully found %s similar tracks", len(similar_tracks))
         return jsonify(response)
         
     except Exception as e:
-        logger.error(f"Similar tracks error: {str(e)}", exc_info=True)
+        logger.error("Similar tracks error: %s", e, exc_info=True)
+        return jsonify({
+            'error': 'Failed to fetch similar tracks',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/playlist/<playlist_id>/similar/stream', methods=['GET'])
+@spotify_service.require_auth
+@rate_limit
+def get_similar_tracks_stream(playlist_id):
+    """Streaming variant of get_similar_tracks that reports progress while candidates are found."""
+    try:
+        manager = get_user_manager(playlist_id)
+        
+        if not manager.verify_playlist():
+            logger.error("Playlist %s not found or not accessible", playlist_id)
+            return jsonify({
+                'error': 'Playlist not found or not accessible'
+            }), 404
+    except Exception as e:
+        logger.error("Similar tracks error: %s", e, exc_info=True)
         return jsonify({
             'error': 'Failed to fetch similar tracks',
             'details': str(e)
         }), 500
 
+    def generate():
+        for event in manager.iter_similar_tracks(limit=20):
+            if event['type'] == 'result':
+                event = dict(event, total=len(event['tracks']))
+            yield event
+
+    return ndjson_response(generate())
+
 @app.errorhandler(404)
 def not_found_error(error):
     return redirect(url_for('index'))
@@ -375,12 +595,11 @@ def public_playlists():
 def browse_category(category):
     """Get public playlists by category - no authentication required"""
     try:
-        # Use guest token for public access
-        token = spotify_service.get_guest_token()
-        if not token:
+        # Use the pooled guest client for public access
+        manager = get_public_manager()
+        if not manager:
             return jsonify({'error': 'Unable to access Spotify API'}), 500
         
-        manager = SpotifyPlaylistManager(token)
         results = manager.get_category_playlists(category)
         
         if not results:
@@ -398,7 +617,7 @@ def browse_category(category):
             
         return jsonify({'playlists': playlists}), 200
     except Exception as e:
-        logger.error(f"Error fetching category playlists: {str(e)}")
+        logger.error("Error fetching category playlists: %s", e)
         return jsonify({'error': 'Failed to load playlists'}), 500
 
 @app.route('/api/playlists/category/<category>', methods=['GET'])
@@ -409,30 +628,24 @@ def get_category_playlists(category):
     Returns an empty list instead of an error if no playlists are found.
     """
     try:
-        # Initialize SpotifyService to get an access token
-        token = None
-        if 'access_token' in session:
-            token = session['access_token']
-            app.logger.info("Using user token for category playlists")
-        else:
-            # Try to get a guest token for public access
-            try:
-                token_info = spotify_service.get_guest_token()
-                if token_info and 'access_token' in token_info:
-                    token = token_info['access_token']
-                    app.logger.info("Using guest token for category playlists")
-                else:
-                    app.logger.warning("No guest token available, proceeding with limited access")
-            except Exception as token_error:
-                app.logger.error(f"Error getting guest token: {str(token_error)}")
-                app.logger.warning("Proceeding without authentication")
+        # Use the signed-in user's pooled client, or the pooled guest client for public access
+        try:
+            if 'token_info' in session:
+                manager = get_user_manager()
+                app.logger.info("Using user token for category playlists")
+            else:
+                manager = get_public_manager()
+                app.logger.info("Using guest token for category playlists")
+        except Exception as token_error:
+            app.logger.error("Error getting Spotify client: %s", token_error)
+            manager = None
+        
+        if not manager:
+            app.logger.warning("No Spotify client available for category playlists")
+            return jsonify([])
         
         # Use the PlaylistManager to fetch category playlists
         try:
-            manager = SpotifyPlaylistManager(playlist_id=None)
-            if token:
-                manager.sp.auth_manager.set_access_token(token)
-            
             playlists = manager.get_category_playlists(category)
             
             # Process playlists to include only necessary information
@@ -452,12 +665,12 @@ def get_category_playlists(category):
             
             return jsonify(simplified_playlists)
         except Exception as e:
-            app.logger.error(f"Error fetching category playlists: {str(e)}")
+            app.logger.error("Error fetching category playlists: %s", e)
             # Return empty list for better user experience
             return jsonify([])
             
     except Exception as e:
-        app.logger.error(f"Unexpected error in category playlists route: {str(e)}")
+        app.logger.error("Unexpected error in category playlists route: %s", e)
         return jsonify([]), 500
 
 @app.route('/api/playlist/<playlist_id>/follow', methods=['POST'])
@@ -466,8 +679,7 @@ def get_category_playlists(category):
 def follow_playlist(playlist_id):
     """Follow a public playlist"""
     try:
-        token_info = session.get('token_info')
-        manager = SpotifyPlaylistManager(token_info)
+        manager = get_user_manager()
         
         success = manager.follow_playlist(playlist_id)
         if success:
@@ -475,7 +687,7 @@ def follow_playlist(playlist_id):
         else:
             return jsonify({'error': 'Failed to follow playlist'}), 400
     except Exception as e:
-        logger.error(f"Error following playlist: {str(e)}")
+        logger.error("Error following playlist: %s", e)
         return jsonify({'error': 'Failed to follow playlist'}), 500
 
 @app.route('/browse')
@@ -493,15 +705,13 @@ def view_playlist(playlist_id):
 def get_playlist_details(playlist_id):
     """Get details for a specific playlist"""
     try:
-        # Use guest token for public access
-        token = spotify_service.get_guest_token()
-        if not token:
+        # Use the pooled guest client for public access
+        manager = get_public_manager(playlist_id)
+        if not manager:
             return jsonify({'error': 'Unable to access Spotify API'}), 500
         
-        manager = SpotifyPlaylistManager(token)
-        
         # Get playlist details from Spotify
-        playlist = manager.sp.playlist(playlist_id, fields='id,name,description,images,owner,followers,tracks.total')
+        playlist = manager.get_playlist(fields=projections.playlist('details'))
         
         if not playlist:
             return jsonify({'error': 'Playlist not found'}), 404
@@ -520,7 +730,7 @@ def get_playlist_details(playlist_id):
             
         return jsonify(response), 200
     except Exception as e:
-        logger.error(f"Error fetching playlist details: {str(e)}")
+        logger.error("Error fetching playlist details: %s", e)
         return jsonify({'error': 'Failed to load playlist details'}), 500
 
 @app.route('/api/playlist/<playlist_id>/tracks', methods=['GET'])
@@ -528,18 +738,13 @@ def get_playlist_details(playlist_id):
 def get_playlist_tracks(playlist_id):
     """Get tracks for a specific playlist"""
     try:
-        # Use guest token for public access
-        token = spotify_service.get_guest_token()
-        if not token:
+        # Use the pooled guest client for public access
+        manager = get_public_manager(playlist_id)
+        if not manager:
             return jsonify({'error': 'Unable to access Spotify API'}), 500
         
-        manager = SpotifyPlaylistManager(token)
-        
         # Get playlist tracks from Spotify
-        results = manager.sp.playlist_tracks(
-            playlist_id, 
-            fields='items(track(id,name,artists(name),album(name,images),duration_ms,preview_url))'
-        )
+        results = manager.get_playlist_page(fields=projections.playlist_items('listing', paging=False))
         
         if not results or 'items' not in results:
             return jsonify([]), 200
@@ -563,9 +768,25 @@ def get_playlist_tracks(playlist_id):
             
         return jsonify(tracks), 200
     except Exception as e:
-        logger.error(f"Error fetching playlist tracks: {str(e)}")
+        logger.error("Error fetching playlist tracks: %s", e)
         return jsonify({'error': 'Failed to load playlist tracks'}), 500
 
+@app.route('/api/pool-stats', methods=['GET'])
+def pool_stats():
+    """Connection and client pool usage for this worker"""
+    return jsonify({
+        'http_pool': http_pool.stats(),
+        'client_pool': client_pool.stats(),
+        'coalescing': upstream_requests.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, upstream, backoff, cache and rate limiter metrics summed across workers"""
+    if not metrics_access_allowed():
+        return Response('Forbidden\n', status=403, content_type='text/plain')
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Test endpoint to check Spotify API
 @app.route('/api/test')
 def test_spotify_api():
@@ -600,7 +821,7 @@ def test_spotify_api():
             'direct_token_error': direct_token_error
         })
     except Exception as e:
-        logger.error(f"Error in test endpoint: {str(e)}")
+        logger.error("Error in test endpoint: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/test-token', methods=['GET'])
@@ -639,7 +860,7 @@ def test_token():
         response_data['status'] = 'complete'
         return jsonify(response_data)
     except Exception as e:
-        logger.error(f"Token test error: {str(e)}")
+        logger.error("Token test error: %s", e)
         response_data['status'] = 'error'
         response_data['error'] = str(e)
         return jsonify(response_data), 500
@@ -653,7 +874,7 @@ if __name__ == '__main__':
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     
     if missing_vars:
-        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+        logger.error("Missing required environment variables: %s", ', '.join(missing_vars))
         exit(1)
         
     app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=True)
@@ -4,18 +4,31 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 import logging
-from typing import Dict, List, Optional
-from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+from collections import defaultdict, deque
+from itertools import islice
 from typing import Any
 import time
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from requests.exceptions import RequestException
 from spotipy.exceptions import SpotifyException
+from app.services.feature_store import feature_store
+from app.services.request_scheduler import request_scheduler, MAX_BATCH_SIZES
+from app.services.http_pool import http_pool
+from app.services.analysis_cache import analysis_cache
+from app.services.track_columns import TrackColumns
+from app.services.track_index import TrackVectorIndex
+from app.services.duplicates import DuplicateDetector
+from app.services import projections
+from app.services.category_cache import category_cache
+from app.services.single_flight import upstream_requests, COALESCED_METHODS
+from app.services.metrics import metrics
+from app.services.logging_control import UPSTREAM_LOGGER
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
+upstream_logger = logging.getLogger(UPSTREAM_LOGGER)
 
 class PlaylistAnalysisError(Exception):
     """Custom exception for playlist analysis errors."""
@@ -25,11 +38,47 @@ class SpotifyRateLimitError(Exception):
     """Custom exception for rate limit errors."""
     pass
 
+class PlaylistConflictError(Exception):
+    """Raised when a playlist changed since the snapshot a removal plan was made against."""
+
+    def __init__(self, message: str, snapshot_id: Optional[str] = None):
+        super().__init__(message)
+        self.snapshot_id = snapshot_id
+
+def default_audio_features() -> Dict[str, Any]:
+    """Placeholder audio features used when none can be retrieved."""
+    return {
+        'energy': 0.5,
+        'danceability': 0.5,
+        'valence': 0.5,
+        'tempo': 120.0,
+        'acousticness': 0.5,
+        'instrumentalness': 0.0,
+        'key': -1,
+        'mode': 0,
+        'time_signature': 4,
+        'source': 'default'
+    }
+
+# Fields every cached analysis row must carry; entries cached before one was added are rebuilt
+CACHED_ROW_FIELDS = frozenset(('position', 'isrc', 'feature_source', 'acousticness'))
+
+def placeholder_rows_expired(cached: Dict[str, Any]) -> bool:
+    """Whether an analysis cache entry holds rows built from fallback or default features the feature store has expired."""
+    return (time.time() - cached['updated_at'] >= feature_store.placeholder_ttl
+            and any(row.get('feature_source') != 'api' for row in cached['track_details']))
+
+def progress_event(stage: str, done: int, total: int) -> Dict[str, Any]:
+    """Progress event yielded by the streaming analysis generators."""
+    return {'type': 'progress', 'stage': stage, 'done': done, 'total': total}
+
 class SpotifyPlaylistManager:
-    def __init__(self, playlist_id: str):
-        """Initialize the Spotify client with comprehensive scope."""
-        load_dotenv()
-    
+    def __init__(self, playlist_id: str, sp: Optional[spotipy.Spotify] = None):
+        """Initialize the Spotify client with comprehensive scope.
+
+        When ``sp`` is given (normally a pooled, already verified client) it is
+        used as-is and no OAuth setup or credential check is performed.
+        """
         self.scope = (
             "playlist-modify-public playlist-modify-private "
             "user-library-read user-read-recently-played "
@@ -42,6 +91,15 @@ class SpotifyPlaylistManager:
             "user-library-modify user-read-audio-features"
         )
         self.rate_limit_delay = 1
+        self.page_size = 100
+        # Maximum playlist pages fetched concurrently once the total is known
+        self.max_in_flight_pages = int(os.getenv('SPOTIFY_MAX_INFLIGHT_PAGES', 4))
+        # Similar-track candidates: recommendation pulls, feature clusters and saved tracks considered
+        self.recommendation_pulls = int(os.getenv('SIMILAR_RECOMMENDATION_PULLS', 3))
+        self.similar_clusters = int(os.getenv('SIMILAR_CLUSTERS', 4))
+        self.library_candidates = int(os.getenv('SIMILAR_LIBRARY_TRACKS', 200))
+        # Playlists paged concurrently by a bulk analysis
+        self.max_in_flight_playlists = int(os.getenv('BULK_MAX_INFLIGHT_PLAYLISTS', 4))
         
         # Map common category names to Spotify category IDs
         self.category_id_map = {
@@ -73,6 +131,13 @@ class SpotifyPlaylistManager:
             'chill': '0JQ5DAqbMKFFzDl7qN9Apr'
         }
         
+        if sp is not None:
+            self.sp = sp
+            self.playlist_id = playlist_id
+            return
+        
+        load_dotenv()
+        
         try:
             # Get credentials from environment
             client_id = os.getenv('SPOTIFY_CLIENT_ID')
@@ -90,143 +155,276 @@ class SpotifyPlaylistManager:
                 raise ValueError(error_msg)
             
             # Log credential info (without revealing secrets)
-            logger.info(f"Using Spotify credentials - Client ID: {client_id[:5]}... Redirect URI: {redirect_uri}")
+            logger.info("Using Spotify credentials - Client ID: %s... Redirect URI: %s", client_id[:5], redirect_uri)
             
             auth_manager = SpotifyOAuth(
                 client_id=client_id,
                 client_secret=client_secret,
                 redirect_uri=redirect_uri,
                 scope=self.scope,
-                cache_handler=None
+                cache_handler=None,
+                requests_session=http_pool.session
             )
             
+            # The shared session's retry policy leaves 429s to the request scheduler
             self.sp = spotipy.Spotify(
                 auth_manager=auth_manager,
-                requests_timeout=60,
-                retries=3,
-                backoff_factor=2
+                requests_session=http_pool.session,
+                requests_timeout=60
             )
             self.playlist_id = playlist_id
-            logger.info(f"Successfully initialized SpotifyPlaylistManager for playlist: {playlist_id}")
+            logger.info("Successfully initialized SpotifyPlaylistManager for playlist: %s", playlist_id)
             
             # Verify credentials by making a simple API call
             self._verify_credentials()
             
         except Exception as e:
-            logger.error(f"Failed to initialize Spotify client: {str(e)}")
+            logger.error("Failed to initialize Spotify client: %s", e)
             raise
 
     def _handle_rate_limit(self, e: Exception) -> None:
-        """Handle rate limit errors with exponential backoff."""
-        if hasattr(e, 'headers') and 'Retry-After' in e.headers:
-            delay = int(e.headers['Retry-After'])
-        else:
-            delay = self.rate_limit_delay
-            self.rate_limit_delay *= 2  
+        """Report a rate limit error to the request scheduler, which pauses outbound calls."""
+        retry_after = None
+        headers = getattr(e, 'headers', None) or {}
+        if 'Retry-After' in headers:
+            try:
+                retry_after = float(headers['Retry-After'])
+            except (TypeError, ValueError):
+                retry_after = None
         
-        logger.warning(f"Rate limit hit, waiting {delay} seconds")
-        time.sleep(delay)
+        request_scheduler.record_throttle(retry_after)
 
     def _make_spotify_request(self, func, *args, **kwargs):
-        """Make a Spotify API request with retry logic and rate limiting."""
+        """Make a Spotify API request with retry logic and rate limiting.
+
+        Identical reads already in flight on the same client are coalesced
+        into one upstream call whose result is shared by every caller.
+        """
+        name = getattr(func, '__name__', '')
+        if name not in COALESCED_METHODS:
+            return self._send_spotify_request(func, *args, **kwargs)
+        
+        # Keyed by client so users never receive each other's private data
+        key = (id(getattr(func, '__self__', None)), name, repr(args), repr(sorted(kwargs.items())))
+        return upstream_requests.do(key, lambda: self._send_spotify_request(func, *args, **kwargs))
+
+    def _send_spotify_request(self, func, *args, **kwargs):
+        """Send one Spotify API request, retrying on rate limits and auth errors but not permission errors."""
         max_retries = 3
         retry_count = 0
 
         while retry_count < max_retries:
+            started = None
             try:
-                logger.info(f"Making Spotify API request: {func.__name__} (attempt {retry_count + 1}/{max_retries})")
+                request_scheduler.acquire()
+                upstream_logger.info("Making Spotify API request: %s (attempt %s/%s)", func.__name__, retry_count + 1, max_retries)
+                started = time.perf_counter()
                 result = func(*args, **kwargs)
-                logger.info(f"Spotify API request successful: {func.__name__}")
+                metrics.record_upstream(func.__name__, '2xx', time.perf_counter() - started)
+                request_scheduler.record_success()
+                upstream_logger.info("Spotify API request successful: %s", func.__name__)
                 return result
             except Exception as e:
                 error_str = str(e)
-                logger.warning(f"Spotify API error: {error_str}")
+                logger.warning("Spotify API error: %s", error_str)
+                if started is not None:
+                    metrics.record_upstream(func.__name__, str(getattr(e, 'http_status', None) or 'error'), time.perf_counter() - started)
                 
                 # Handle rate limiting
                 if 'status: 429' in error_str and retry_count < max_retries - 1:
                     self._handle_rate_limit(e)
+                    metrics.inc('spotify_retries_total', method=func.__name__, reason='rate_limited')
                     retry_count += 1
                     continue
                 
                 # Handle authentication errors
                 if 'status: 401' in error_str or 'invalid_client' in error_str:
-                    logger.error(f"Authentication error in {func.__name__}: {error_str}. Check your Spotify API credentials.")
+                    logger.error("Authentication error in %s: %s. Check your Spotify API credentials.", func.__name__, error_str)
                     # Try to refresh the token
                     try:
                         if hasattr(self.sp, 'auth_manager') and hasattr(self.sp.auth_manager, 'refresh_access_token'):
                             logger.info("Attempting to refresh access token...")
                             self.sp.auth_manager.refresh_access_token()
+                            metrics.inc('spotify_retries_total', method=func.__name__, reason='auth')
                             retry_count += 1
-                            time.sleep(1)  # Wait a bit before retrying
                             continue
                     except Exception as refresh_error:
-                        logger.error(f"Failed to refresh token: {refresh_error}")
+                        logger.error("Failed to refresh token: %s", refresh_error)
                 
-                # Handle permission errors
+                # Permission errors are not retried: the same scopes give the same answer
                 if 'status: 403' in error_str:
-                    logger.error(f"Permission denied for {func.__name__}: {error_str}")
-                    logger.error(f"Request details - Function: {func.__name__}, Args: {args}, Kwargs: {kwargs}")
+                    logger.error("Permission denied for %s: %s", func.__name__, error_str)
+                    logger.error("Request details - Function: %s, Args: %s, Kwargs: %s", func.__name__, args, kwargs)
                     logger.error("This is likely due to missing scopes. Check if your app has the required scopes in the Spotify Developer Dashboard.")
-                    logger.error(f"Current scopes: {self.scope}")
-                    
-                    if retry_count < max_retries - 1:
-                        wait_time = 2 * (retry_count + 1)  # Exponential backoff
-                        logger.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                        retry_count += 1
-                        continue
+                    logger.error("Current scopes: %s", self.scope)
+                    raise e
                 
                 # If we've reached max retries or it's not a retryable error
                 if retry_count >= max_retries - 1:
-                    logger.error(f"Max retries reached for Spotify API request: {func.__name__}")
+                    logger.error("Max retries reached for Spotify API request: %s", func.__name__)
                 raise e
 
-    def get_playlist_tracks(self) -> List[Dict]:
-        """Get all tracks from the playlist with pagination."""
+    def get_playlist(self, fields: Optional[str] = None) -> Dict:
+        """Get the playlist object, limited to ``fields``."""
+        return self._make_spotify_request(
+            self.sp.playlist,
+            self.playlist_id,
+            fields=fields
+        )
+
+    def get_playlist_page(self, offset: int = 0, fields: Optional[str] = None) -> Dict:
+        """Fetch a single page of playlist items at the given offset."""
+        return self._make_spotify_request(
+            self.sp.playlist_tracks,
+            self.playlist_id,
+            fields=fields,
+            limit=self.page_size,
+            offset=offset
+        )
+
+    def get_user_playlists_page(self, offset: int = 0, limit: int = 50) -> Dict:
+        """Fetch a single page of the current user's playlists at the given offset."""
+        return self._make_spotify_request(
+            self.sp.current_user_playlists,
+            limit=limit,
+            offset=offset
+        )
+
+    @staticmethod
+    def _valid_items(page: Dict) -> List[Dict]:
+        """Playlist items of a page that carry a track with an ID."""
+        return SpotifyPlaylistManager._positioned_items(page, 0)[0]
+
+    @staticmethod
+    def _positioned_items(page: Dict, offset: int) -> Tuple[List[Dict], List[int]]:
+        """Valid items of a page and their playlist positions, given the page's offset."""
+        items, positions = [], []
+        for position, item in enumerate(page.get('items', []), start=offset):
+            if item and item.get('track') and item['track'].get('id'):
+                items.append(item)
+                positions.append(position)
+        return items, positions
+
+    def iter_playlist_pages(self, max_in_flight: Optional[int] = None, fields: Optional[str] = None) -> Iterator[Dict]:
+        """Yield the playlist's pages in order, fetching the remaining pages concurrently.
+
+        The first page reports the playlist total, which fixes every remaining
+        page offset. At most ``max_in_flight`` of those pages are requested
+        ahead of the consumer, all going through the shared request scheduler,
+        and they are yielded in playlist order as soon as each is available.
+        Pages not yet started are cancelled if the consumer stops early or a
+        page fails. ``fields`` limits the item fields returned and must keep
+        ``total`` and ``next``.
+        """
+        max_in_flight = max_in_flight or self.max_in_flight_pages
+        first_page = self.get_playlist_page(0, fields)
+        if not first_page:
+            return
+        yield first_page
+        
+        total = first_page.get('total') or 0
+        offsets = list(range(len(first_page['items']), total, self.page_size)) if first_page.get('next') else []
+        if not offsets:
+            return
+        
+        logger.info("Fetching %s remaining pages for playlist %s with up to %s in flight", len(offsets), self.playlist_id, max_in_flight)
+        if max_in_flight > 1:
+            executor = ThreadPoolExecutor(max_workers=min(max_in_flight, len(offsets)))
+            remaining = iter(offsets)
+            pending = deque(executor.submit(self.get_playlist_page, offset, fields) for offset in islice(remaining, max_in_flight))
+            try:
+                while pending:
+                    page = pending.popleft().result()
+                    # Refill the window before yielding so requests overlap the consumer's work
+                    for offset in islice(remaining, 1):
+                        pending.append(executor.submit(self.get_playlist_page, offset, fields))
+                    if page:
+                        yield page
+            finally:
+                # Also reached on GeneratorExit when the consumer stops early
+                executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for offset in offsets:
+                page = self.get_playlist_page(offset, fields)
+                if page:
+                    yield page
+
+    def get_playlist_tracks(self, max_in_flight: Optional[int] = None, fields: Optional[str] = None) -> List[Dict]:
+        """Get all tracks from the playlist, fetching the remaining pages concurrently."""
         try:
-            tracks = []
-            results = self._make_spotify_request(self.sp.playlist_tracks, self.playlist_id)
-            
-            while results:
-                tracks.extend(results['items'])
-                if results['next']:
-                    results = self._make_spotify_request(self.sp.next, results)
-                else:
-                    break
-            
-            
             valid_tracks = [
-                track for track in tracks 
-                if track and track.get('track') and track['track'].get('id')
+                item for page in self.iter_playlist_pages(max_in_flight, fields)
+                for item in self._valid_items(page)
             ]
                     
-            logger.info(f"Retrieved {len(valid_tracks)} tracks from playlist {self.playlist_id}")
+            logger.info("Retrieved %s tracks from playlist %s", len(valid_tracks), self.playlist_id)
             return valid_tracks
         except Exception as e:
-            logger.error(f"Error retrieving playlist tracks: {str(e)}")
+            logger.error("Error retrieving playlist tracks: %s", e)
             raise PlaylistAnalysisError(f"Failed to get playlist tracks: {str(e)}")
 
+    def _iter_feature_pages(self, fields: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield progress events and each playlist page's items with their audio features.
+
+        Features for a page are fetched as soon as it arrives, while later
+        pages are still in flight. Each page is yielded as a ``page`` event
+        carrying its valid items, their playlist positions and their features.
+        """
+        fetched = 0
+        for page in self.iter_playlist_pages(fields=fields):
+            total = page.get('total') or 0
+            items, positions = self._positioned_items(page, fetched)
+            fetched += len(page['items'])
+            yield progress_event('pages', fetched, total)
+            
+            track_ids = [item['track']['id'] for item in items]
+            features = self.get_audio_features_batch(track_ids) if track_ids else {}
+            yield progress_event('features', fetched, total)
+            yield {'type': 'page', 'items': items, 'positions': positions, 'features': features}
+
+    def get_tracks_batch(self, track_ids: List[str]) -> Dict[str, Dict]:
+        """Get full track objects for multiple tracks using the tracks API's maximum batch size."""
+        tracks = {}
+        offset = 0
+        while offset < len(track_ids):
+            batch = track_ids[offset:offset+request_scheduler.batch_size('tracks')]
+            offset += len(batch)
+            results = self._make_spotify_request(
+                self.sp.tracks,
+                batch
+            )
+            for track in (results or {}).get('tracks', []):
+                if track and track.get('id'):
+                    tracks[track['id']] = track
+        return tracks
+
     def get_audio_features_batch(self, track_ids: List[str]) -> Dict[str, float]:
-        """Get audio features for multiple tracks in one request."""
+        """Get audio features for multiple tracks, checking the local store before any request."""
         if not track_ids:
             logger.warning("No track IDs provided for audio features")
             return {}
             
         try:
+            stored_features = feature_store.get_many(track_ids)
+            missing_ids = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in stored_features]
+            if not missing_ids:
+                logger.info("Audio features for all %s tracks served from the feature store", len(stored_features))
+                return stored_features
+
             features_dict = {}
-            batch_size = 10  # Reduced from 15 to be even safer with API limits
+            logger.info("Getting audio features for %s tracks (%s already stored)", len(missing_ids), len(stored_features))
             
-            logger.info(f"Getting audio features for {len(track_ids)} tracks in batches of {batch_size}")
-            
-            for i in range(0, len(track_ids), batch_size):
-                batch = track_ids[i:i+batch_size]
-                batch_ids_str = ','.join(batch[:5]) + '...' if len(batch) > 5 else ','.join(batch)
+            offset = 0
+            batch_number = 0
+            while offset < len(missing_ids):
+                # The scheduler shrinks batches after a 429 and grows them back to the API maximum
+                batch_size = request_scheduler.batch_size('audio_features')
+                batch = missing_ids[offset:offset+batch_size]
+                offset += len(batch)
+                batch_number += 1
                 
                 try:
-                    # Add more delay to avoid rate limiting
-                    time.sleep(4)  # Increased from 3 to 4 seconds
-                    
-                    logger.info(f"Requesting audio features for batch {i//batch_size + 1} of {(len(track_ids) + batch_size - 1)//batch_size} ({len(batch)} tracks, IDs: {batch_ids_str})")
+                    upstream_logger.info("Requesting audio features for batch %s (%s tracks, first IDs: %s)", batch_number, len(batch), batch[:5])
                     
                     # Try to use the audio_features endpoint first
                     got_batch_features = False
@@ -241,46 +439,22 @@ class SpotifyPlaylistManager:
                             
                             # Log the response structure for debugging
                             if features:
-                                logger.info(f"Audio features response type: {type(features)}, length: {len(features) if isinstance(features, list) else 'not a list'}")
+                                upstream_logger.info("Audio features response type: %s, length: %s", type(features).__name__, len(features) if isinstance(features, list) else 'not a list')
                                 got_batch_features = True
                             else:
-                                logger.warning(f"Empty response from audio_features for batch {i//batch_size + 1}")
+                                logger.warning("Empty response from audio_features for batch %s", batch_number)
                     except Exception as batch_error:
-                        logger.warning(f"Batch audio_features request failed: {str(batch_error)}")
+                        logger.warning("Batch audio_features request failed: %s", batch_error)
                         
-                    # If batch request failed or returned empty, use fallback methods
+                    # If batch request failed or returned empty, derive features from the tracks API
                     if not got_batch_features or not features:
-                        logger.info("Using fallback methods to get audio features")
-                        features = []
-                        
-                        for track_id in batch:
-                            try:
-                                # First try individual audio_features call
-                                try:
-                                    time.sleep(1)
-                                    logger.info(f"Trying individual audio_features call for track {track_id}")
-                                    feature = self._make_spotify_request(
-                                        self.sp.audio_features,
-                                        [track_id]
-                                    )
-                                    if feature and len(feature) > 0 and feature[0]:
-                                        features.append(feature[0])
-                                        continue
-                                except Exception as e:
-                                    logger.warning(f"Individual audio_features call failed for {track_id}: {str(e)}")
-                                
-                                # If that fails, use our fallback method that uses the tracks API
-                                logger.info(f"Using track info fallback for {track_id}")
-                                fallback_feature = self._get_track_info_fallback(track_id)
-                                features.append(fallback_feature)
-                                
-                            except Exception as e:
-                                logger.error(f"All fallback methods failed for track {track_id}: {str(e)}")
-                                features.append(None)
+                        logger.info("Using track info fallback to get audio features")
+                        fallback_features = self._get_track_info_fallback_batch(batch)
+                        features = [fallback_features.get(track_id) for track_id in batch]
                     
                     if features:
                         valid_features = [f for f in features if f]
-                        logger.info(f"Successfully retrieved audio features for {len(valid_features)}/{len(batch)} tracks")
+                        upstream_logger.info("Successfully retrieved audio features for %s/%s tracks", len(valid_features), len(batch))
                         
                         for track_id, feature in zip(batch, features):
                             if feature:
@@ -291,37 +465,29 @@ class SpotifyPlaylistManager:
                                     'valence': feature.get('valence', 0.5),
                                     'tempo': feature.get('tempo', 120.0),
                                     'acousticness': feature.get('acousticness', 0.5),
-                                    'instrumentalness': feature.get('instrumentalness', 0.0)
+                                    'instrumentalness': feature.get('instrumentalness', 0.0),
+                                    'key': feature.get('key', -1),
+                                    'mode': feature.get('mode', 0),
+                                    'time_signature': feature.get('time_signature', 4),
+                                    'source': feature.get('source', 'api')
                                 }
-                                logger.debug(f"Audio features for track {track_id}: energy={feature.get('energy', 0.5):.2f}, danceability={feature.get('danceability', 0.5):.2f}")
+                                logger.debug("Audio features for track %s: energy=%.2f, danceability=%.2f", track_id, feature.get('energy', 0.5), feature.get('danceability', 0.5))
                             else:
-                                logger.warning(f"No features returned for track {track_id}")
-                                features_dict[track_id] = {
-                                    'energy': 0.5,
-                                    'danceability': 0.5,
-                                    'valence': 0.5,
-                                    'tempo': 120.0,
-                                    'acousticness': 0.5,
-                                    'instrumentalness': 0.0
-                                }
+                                logger.warning("No features returned for track %s", track_id)
+                                features_dict[track_id] = default_audio_features()
                                 
                 except Exception as e:
-                    logger.error(f"Error processing batch {i//batch_size + 1}: {str(e)}", exc_info=True)
+                    logger.error("Error processing batch %s: %s", batch_number, e, exc_info=True)
                     # Still provide default values for tracks in this batch
                     for track_id in batch:
-                        features_dict[track_id] = {
-                            'energy': 0.5,
-                            'danceability': 0.5,
-                            'valence': 0.5,
-                            'tempo': 120.0,
-                            'acousticness': 0.5,
-                            'instrumentalness': 0.0
-                        }
+                        features_dict[track_id] = default_audio_features()
                         
-            logger.info(f"Completed audio features retrieval for {len(features_dict)}/{len(track_ids)} tracks")
+            feature_store.put_many(features_dict)
+            features_dict.update(stored_features)
+            logger.info("Completed audio features retrieval for %s/%s tracks", len(features_dict), len(track_ids))
             return features_dict
         except Exception as e:
-            logger.error(f"Error getting audio features for batch: {str(e)}", exc_info=True)
+            logger.error("Error getting audio features for batch: %s", e, exc_info=True)
             # Return empty dict as fallback
             return {}
 
@@ -337,214 +503,534 @@ class SpotifyPlaylistManager:
                     return float(features[track_id])
             return 0.0
         except Exception as e:
-            logger.error(f"Error getting energy for track {track_id}: {str(e)}")
+            logger.error("Error getting energy for track %s: %s", track_id, e)
             return 0.0
 
+    def evaluate_optimization(self, criteria: Dict[str, Any]) -> Dict[str, Any]:
+        """Evaluate every playlist track against the optimization criteria in one batched pass.
+
+        Tracks are paginated once, audio features are fetched once for all unique
+        track IDs and each criterion is applied as a vectorized mask, so no
+        per-track upstream calls are made. The result is a dry-run removal plan:
+        each flagged track carries its playlist position, and ``snapshot_id``
+        is the snapshot those positions refer to.
+        """
+        try:
+            min_popularity = int(criteria.get('minPopularity', 30))
+            min_energy = float(criteria.get('minEnergy', 0.2))
+
+            snapshot_id = self.get_playlist(fields=projections.playlist('snapshot')).get('snapshot_id')
+            tracks, positions = [], []
+            fetched = 0
+            for page in self.iter_playlist_pages(fields=projections.playlist_items('evaluation')):
+                page_items, page_positions = self._positioned_items(page, fetched)
+                tracks.extend(page_items)
+                positions.extend(page_positions)
+                fetched += len(page['items'])
+            logger.info("Retrieved %s tracks from playlist %s", len(tracks), self.playlist_id)
+
+            track_ids = [item['track']['id'] for item in tracks]
+            unique_ids = list(dict.fromkeys(track_ids))
+            features = self.get_audio_features_batch(unique_ids) if unique_ids else {}
+
+            popularity = np.fromiter(
+                (item['track'].get('popularity') or 0 for item in tracks),
+                dtype=np.int64,
+                count=len(tracks)
+            )
+            energy = np.fromiter(
+                (features.get(track_id, {}).get('energy', 0.0) for track_id in track_ids),
+                dtype=np.float64,
+                count=len(track_ids)
+            )
+
+            low_popularity = popularity < min_popularity
+            low_energy = energy < min_energy
+            flagged = np.flatnonzero(low_popularity | low_energy)
+
+            tracks_to_remove = []
+            for index in flagged:
+                track = tracks[index]['track']
+                reasons = []
+                if low_popularity[index]:
+                    reasons.append(f"Low popularity ({popularity[index]}%)")
+                if low_energy[index]:
+                    reasons.append(f"Low energy ({energy[index]*100:.0f}%)")
+
+                tracks_to_remove.append({
+                    'id': track['id'],
+                    'name': track['name'],
+                    'artist': track['artists'][0]['name'] if track.get('artists') else 'Unknown Artist',
+                    'reasons': reasons,
+                    'popularity': int(popularity[index]),
+                    'energy': float(energy[index]),
+                    'position': positions[index]
+                })
+
+            logger.info("Evaluated %s tracks, %s match removal criteria", len(tracks), len(tracks_to_remove))
+            return {
+                'snapshot_id': snapshot_id,
+                'total_tracks': len(tracks),
+                'tracks_to_remove': tracks_to_remove,
+                'criteria': {
+                    'minPopularity': min_popularity,
+                    'minEnergy': min_energy
+                }
+            }
+        except PlaylistAnalysisError:
+            raise
+        except Exception as e:
+            logger.error("Error evaluating optimization criteria: %s", e, exc_info=True)
+            raise PlaylistAnalysisError(f"Failed to evaluate playlist: {str(e)}")
+
+    def _build_track_info(self, track: Dict, added_at: str, audio_features: Dict, position: Optional[int] = None) -> Dict[str, Any]:
+        """Build the per-track analysis row for a track and its audio features."""
+        return {
+            'id': track['id'],
+            'position': position,
+            'name': track['name'],
+            'artists': [artist['name'] for artist in track['artists']],
+            'added_at': added_at or '',
+            'popularity': track.get('popularity', 0),
+            'duration_ms': track.get('duration_ms', 0),
+            'explicit': track.get('explicit', False),
+            'preview_url': track.get('preview_url'),
+            'energy': audio_features.get('energy', 0.0),
+            'tempo': audio_features.get('tempo', 0.0),
+            'key': audio_features.get('key', -1),
+            'mode': audio_features.get('mode', 0),
+            'time_signature': audio_features.get('time_signature', 4),
+            'danceability': audio_features.get('danceability', 0.0),
+            'instrumentalness': audio_features.get('instrumentalness', 0.0),
+            'acousticness': audio_features.get('acousticness', 0.0),
+            'valence': audio_features.get('valence', 0.0),
+            'album': track.get('album', {}).get('name', 'Unknown Album'),
+            'release_date': track.get('album', {}).get('release_date', ''),
+            'album_type': track.get('album', {}).get('album_type', 'unknown'),
+            'uri': track.get('uri', ''),
+            'isrc': (track.get('external_ids') or {}).get('isrc'),
+            'feature_source': audio_features.get('source', 'api') if audio_features else 'default'
+        }
+
+    def _build_track_rows(self, track_items: List[Dict], all_audio_features: Optional[Dict] = None,
+                          positions: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """Build analysis rows for playlist items, fetching their audio features in one batch if not given."""
+        if all_audio_features is None:
+            track_ids = [item['track']['id'] for item in track_items]
+            try:
+                logger.info("Getting audio features for %s analysis tracks", len(track_ids))
+                all_audio_features = self.get_audio_features_batch(track_ids) if track_ids else {}
+            except Exception as e:
+                logger.error("Error getting audio features batch: %s", e)
+                # Add default values for all tracks
+                all_audio_features = {track_id: default_audio_features() for track_id in track_ids}
+
+        rows = []
+        for track_item, position in zip(track_items, positions or [None] * len(track_items)):
+            try:
+                track = track_item['track']
+                rows.append(self._build_track_info(
+                    track,
+                    track_item.get('added_at', ''),
+                    all_audio_features.get(track['id'], {}),
+                    position
+                ))
+            except Exception as track_error:
+                logger.error("Error processing track: %s", track_error)
+                continue
+        return rows
+
+    def _iter_track_rows(self, playlist_info: Dict) -> Iterator[Dict[str, Any]]:
+        """Yield progress events and ``rows`` events with the per-track rows of the current snapshot.
+
+        Rows are served from the analysis cache when the snapshot is unchanged.
+        When it has changed, only track IDs are re-paginated; rows of tracks
+        still in the playlist are reused and only added tracks are fetched.
+        Rows built from fallback or default features are refetched the same
+        way once the feature store has expired them. Otherwise rows are built
+        page by page as pages arrive. Rows events concatenate to the playlist
+        in order.
+        """
+        snapshot_id = playlist_info.get('snapshot_id')
+        cached = analysis_cache.get(self.playlist_id) if snapshot_id else None
+        if cached and cached['track_details'] and not CACHED_ROW_FIELDS <= cached['track_details'][0].keys():
+            cached = None
+        expired = bool(cached) and placeholder_rows_expired(cached)
+        
+        if cached and cached['snapshot_id'] == snapshot_id and not expired:
+            logger.info("Analysis cache hit for playlist %s at snapshot %s", self.playlist_id, snapshot_id)
+            metrics.record_cache('analysis_cache', 'hit')
+            yield {'type': 'rows', 'rows': cached['track_details']}
+            return
+        
+        rows = []
+        updated_at = None
+        metrics.record_cache('analysis_cache', 'incremental' if cached else 'miss')
+        if cached:
+            logger.info("Snapshot or features of playlist %s changed, re-analysing incrementally", self.playlist_id)
+            items, positions = [], []
+            fetched = 0
+            for page in self.iter_playlist_pages(fields=projections.playlist_items('id', added_at=True)):
+                page_items, page_positions = self._positioned_items(page, fetched)
+                items.extend(page_items)
+                positions.extend(page_positions)
+                fetched += len(page['items'])
+                yield progress_event('pages', fetched, page.get('total') or 0)
+            
+            cached_rows = {
+                row['id']: row for row in cached['track_details']
+                if not expired or row['feature_source'] == 'api'
+            }
+            if any(row['feature_source'] != 'api' for row in cached_rows.values()):
+                # Reused placeholder rows keep their age so they still expire on time
+                updated_at = cached['updated_at']
+            current_ids = [item['track']['id'] for item in items]
+            added_ids = [track_id for track_id in dict.fromkeys(current_ids) if track_id not in cached_rows]
+            removed_count = len(set(cached_rows) - set(current_ids))
+            
+            added_tracks = self.get_tracks_batch(added_ids)
+            added_rows = {
+                row['id']: row for row in self._build_track_rows(
+                    [{'track': track} for track in added_tracks.values()]
+                )
+            }
+            yield progress_event('features', len(added_ids), len(added_ids))
+            logger.info("Playlist %s: %s tracks added, %s removed, %s reused", self.playlist_id, len(added_rows), removed_count, len(current_ids) - len(added_ids))
+            
+            for item, position in zip(items, positions):
+                row = cached_rows.get(item['track']['id']) or added_rows.get(item['track']['id'])
+                if row is not None:
+                    rows.append(dict(row, added_at=item.get('added_at') or '', position=position))
+            yield {'type': 'rows', 'rows': rows}
+        else:
+            for event in self._iter_feature_pages(projections.playlist_items('analysis', added_at=True)):
+                if event['type'] == 'page':
+                    page_rows = self._build_track_rows(event['items'], event['features'], event['positions'])
+                    rows.extend(page_rows)
+                    yield {'type': 'rows', 'rows': page_rows}
+                else:
+                    yield event
+            logger.info("Built analysis rows for %s tracks", len(rows))
+        
+        analysis_cache.put(self.playlist_id, snapshot_id, playlist_info.get('name'), rows, updated_at)
+
+    def _get_recent_plays_lookup(self) -> Dict[str, Dict]:
+        """Map recently played track IDs to when and where they were played."""
+        logger.info("Getting recently played tracks")
+        try:
+            recent_plays = self._make_spotify_request(
+                self.sp.current_user_recently_played,
+                limit=50
+            )
+            return {
+                item['track']['id']: {
+                    'played_at': datetime.fromisoformat(item['played_at'].replace('Z', '+00:00')),
+                    'context': item.get('context')
+                } for item in recent_plays['items'] if item.get('track', {}).get('id')
+            }
+        except Exception as e:
+            logger.warning("Failed to get recent plays: %s", e)
+            return {}
+
+    def _track_verdict(self, row: Dict[str, Any], min_popularity: int, min_energy: float) -> Dict[str, Any]:
+        """Removal verdict for one analysis row against the optimization criteria."""
+        reasons = []
+        if row['popularity'] < min_popularity:
+            reasons.append(f"Low popularity ({row['popularity']}%)")
+        if row['energy'] < min_energy:
+            reasons.append(f"Low energy ({row['energy']*100:.0f}%)")
+        
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'artist': row['artists'][0] if row['artists'] else 'Unknown Artist',
+            'popularity': row['popularity'],
+            'energy': row['energy'],
+            'reasons': reasons,
+            'remove': bool(reasons),
+            'position': row.get('position')
+        }
+
     def analyze_tracks(self) -> Dict[str, Any]:
         """Analyze tracks for potential removal based on multiple factors."""
+        for event in self.iter_analyze_tracks():
+            if event['type'] == 'result':
+                return event['analysis']
+        raise PlaylistAnalysisError("Analysis finished without a result")
+
+    def iter_analyze_tracks(self, criteria: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Generator version of ``analyze_tracks`` that reports progress while it runs.
+
+        Yields ``playlist``, ``progress`` (page and feature fetches), one
+        ``duplicate`` event per repeated track and, when ``criteria`` are
+        given, one ``track`` verdict per track as soon as its page is analysed.
+        The last event is ``result`` with the full analysis.
+        """
         try:
+            if criteria is not None:
+                min_popularity = int(criteria.get('minPopularity', 30))
+                min_energy = float(criteria.get('minEnergy', 0.2))
+            
             logger.info("Getting playlist information")
             playlist_info = self._make_spotify_request(
                 self.sp.playlist, 
                 self.playlist_id, 
-                fields='name'
+                fields=projections.playlist('snapshot')
             )
+            yield {
+                'type': 'playlist',
+                'name': playlist_info.get('name', 'Untitled Playlist'),
+                'snapshot_id': playlist_info.get('snapshot_id')
+            }
             
-            logger.info("Starting get_playlist_tracks")
-            tracks = self.get_playlist_tracks()
-            logger.info(f"Retrieved {len(tracks)} tracks")
+            rows = []
+            duplicates = DuplicateDetector()
+            for event in self._iter_track_rows(playlist_info):
+                if event['type'] != 'rows':
+                    yield event
+                    continue
+                rows.extend(event['rows'])
+                for duplicate in duplicates.add_many(event['rows']):
+                    yield {'type': 'duplicate', 'duplicate': duplicate}
+                if criteria is not None:
+                    for row in event['rows']:
+                        yield {'type': 'track', 'track': self._track_verdict(row, min_popularity, min_energy)}
             
-            logger.info("Getting recently played tracks")
-            try:
-                recent_plays = self._make_spotify_request(
-                    self.sp.current_user_recently_played,
-                    limit=50
+            analysis = self._build_analysis(playlist_info, rows, self._get_recent_plays_lookup(), duplicates.duplicates)
+            logger.info("Completed analysis for playlist %s", self.playlist_id)
+            yield {'type': 'result', 'analysis': analysis}
+
+        except Exception as e:
+            logger.error("Error analyzing tracks: %s", e, exc_info=True)
+            raise PlaylistAnalysisError(f"Failed to analyze tracks: {str(e)}")  
+
+    def _build_analysis(self, playlist_info: Dict, rows: List[Dict[str, Any]], recent_plays_lookup: Dict[str, Dict],
+                        duplicates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """The ``analyze_tracks`` result for a playlist's rows, ready to serialise."""
+        analysis = {
+            'playlist_name': playlist_info.get('name', 'Untitled Playlist'),
+            'snapshot_id': playlist_info.get('snapshot_id'),
+            'total_tracks': len(rows),
+            'skipped_tracks': 0,
+            'duplicates': duplicates,
+            'track_details': [],
+            'genre_distribution': {}
+        }
+
+        for row in rows:
+            track_id = row['id']
+            track_info = dict(row)
+            played = recent_plays_lookup.get(track_id)
+            track_info['last_played'] = played['played_at'].isoformat() if played else None
+            analysis['track_details'].append(track_info)
+
+        analysis.update(TrackColumns(analysis['track_details']).summary())
+
+        for dist_key in [
+            'artist_distribution', 
+            'popularity_distribution', 
+            'decade_distribution',
+            'energy_ranges',
+            'tempo_distribution',
+            'key_distribution',
+            'mode_distribution'
+        ]:
+            if dist_key in analysis:
+                analysis[dist_key] = dict(
+                    sorted(
+                        analysis[dist_key].items(),
+                        key=lambda x: x[1],
+                        reverse=True
+                    )
                 )
-                recent_plays_lookup = {
-                    item['track']['id']: {
-                        'played_at': datetime.fromisoformat(item['played_at'].replace('Z', '+00:00')),
-                        'context': item.get('context')
-                    } for item in recent_plays['items'] if item.get('track', {}).get('id')
-                }
-            except Exception as e:
-                logger.warning(f"Failed to get recent plays: {e}")
-                recent_plays_lookup = {}
+        return self.convert_to_serializable(analysis)
 
-            analysis = {
-                'playlist_name': playlist_info.get('name', 'Untitled Playlist'),
-                'total_tracks': len(tracks),
-                'played_tracks': 0,
-                'skipped_tracks': 0,
-                'inactive_tracks': 0,
-                'duplicates': [],
-                'track_details': [],
-                'genre_distribution': defaultdict(int),
-                'artist_distribution': defaultdict(int),
-                'popularity_distribution': defaultdict(int),
-                'decade_distribution': defaultdict(int),
-                'total_duration_ms': 0,
-                'explicit_tracks': 0,
-                'preview_available': 0,
-                'energy_ranges': defaultdict(int),
-                'tempo_distribution': defaultdict(int),
-                'key_distribution': defaultdict(int),
-                'mode_distribution': defaultdict(int),
-                'time_signature_distribution': defaultdict(int)
-            }
+    def _page_playlist_items(self) -> Tuple[List[Dict], List[int]]:
+        """Every valid playlist item with its position, without audio features."""
+        items, positions = [], []
+        fetched = 0
+        for page in self.iter_playlist_pages(fields=projections.playlist_items('analysis', added_at=True)):
+            page_items, page_positions = self._positioned_items(page, fetched)
+            items.extend(page_items)
+            positions.extend(page_positions)
+            fetched += len(page['items'])
+        return items, positions
 
-            track_ids = [track['track']['id'] for track in tracks if track.get('track', {}).get('id')]
-            
-            all_audio_features = {}
-            for i in range(0, len(track_ids), 25):
-                batch_ids = track_ids[i:i+25]
-                try:
-                    logger.info(f"Getting audio features for analysis batch {i//25 + 1}/{(len(track_ids) + 24)//25}")
-                    # Use our improved audio features batch method
-                    batch_features = self.get_audio_features_batch(batch_ids)
-                    all_audio_features.update(batch_features)
-                except Exception as e:
-                    logger.error(f"Error getting audio features batch: {e}")
-                    # Add default values for tracks in this batch
-                    for track_id in batch_ids:
-                        all_audio_features[track_id] = {
-                            'energy': 0.5,
-                            'danceability': 0.5,
-                            'valence': 0.5,
-                            'tempo': 120.0,
-                            'acousticness': 0.5,
-                            'instrumentalness': 0.0
-                        }
-                time.sleep(2)
-
-            seen_track_ids = set()
-            
-            for track_item in tracks:
-                try:
-                    track = track_item.get('track')
-                    if not track or not track.get('id'):
-                        continue
+    def analyze_playlists(self, playlist_ids: List[str], max_in_flight: Optional[int] = None) -> Dict[str, Any]:
+        """``analyze_tracks`` results for several playlists, plus a combined summary.
 
-                    track_id = track['id']
-                    
-                    # Check for duplicates
-                    if track_id in seen_track_ids:
-                        analysis['duplicates'].append(track['name'])
-                    seen_track_ids.add(track_id)
+        Playlists are paged concurrently, at most ``max_in_flight`` at a time,
+        and those whose snapshot is in the analysis cache are not paged at
+        all. Track IDs are then deduplicated across every playlist so audio
+        features are fetched once, in one batched pass, for the whole set.
+        Every call goes through the shared request scheduler. A playlist
+        that fails is reported with its error and left out of the summary.
+        """
+        playlist_ids = list(dict.fromkeys(playlist_ids))
+        max_in_flight = max_in_flight or self.max_in_flight_playlists
+        managers = {playlist_id: SpotifyPlaylistManager(playlist_id, sp=self.sp) for playlist_id in playlist_ids}
+        
+        def fetch(playlist_id: str) -> Dict[str, Any]:
+            manager = managers[playlist_id]
+            try:
+                playlist_info = manager.get_playlist(projections.playlist('snapshot'))
+                cached = analysis_cache.get(playlist_id)
+                if (cached and cached['snapshot_id'] == playlist_info.get('snapshot_id')
+                        and cached['track_details'] and CACHED_ROW_FIELDS <= cached['track_details'][0].keys()
+                        and not placeholder_rows_expired(cached)):
+                    metrics.record_cache('analysis_cache', 'hit')
+                    return {'info': playlist_info, 'rows': cached['track_details']}
+                metrics.record_cache('analysis_cache', 'miss')
+                items, positions = manager._page_playlist_items()
+                return {'info': playlist_info, 'items': items, 'positions': positions}
+            except Exception as e:
+                logger.error("Error paging playlist %s for bulk analysis: %s", playlist_id, e)
+                return {'error': str(e)}
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(playlist_ids)))) as executor:
+            fetched = dict(zip(playlist_ids, executor.map(fetch, playlist_ids)))
+        
+        # One shared feature fetch for every track not already analysed
+        track_ids = list(dict.fromkeys(
+            item['track']['id'] for result in fetched.values() for item in result.get('items', [])
+        ))
+        item_count = sum(len(result.get('items', [])) for result in fetched.values())
+        logger.info("Bulk analysis of %s playlists: fetching features for %s unique of %s tracks", len(playlist_ids), len(track_ids), item_count)
+        try:
+            features = self.get_audio_features_batch(track_ids) if track_ids else {}
+        except Exception as e:
+            logger.error("Error getting audio features for bulk analysis: %s", e)
+            features = {track_id: default_audio_features() for track_id in track_ids}
+        
+        recent_plays_lookup = self._get_recent_plays_lookup()
+        playlists = {}
+        for playlist_id, result in fetched.items():
+            if 'error' in result:
+                playlists[playlist_id] = {'error': result['error']}
+                continue
+            try:
+                rows = result.get('rows')
+                if rows is None:
+                    rows = self._build_track_rows(result['items'], features, result['positions'])
+                    analysis_cache.put(playlist_id, result['info'].get('snapshot_id'), result['info'].get('name'), rows)
+                playlists[playlist_id] = self._build_analysis(
+                    result['info'], rows, recent_plays_lookup, DuplicateDetector().add_many(rows)
+                )
+            except Exception as e:
+                logger.error("Error analysing playlist %s in bulk: %s", playlist_id, e)
+                playlists[playlist_id] = {'error': str(e)}
+        
+        return {'playlists': playlists, 'summary': self._combined_summary(playlists)}
 
-                    
-                    audio_features = all_audio_features.get(track_id, {})
-                    
-                    track_info = {
-                        'id': track_id,
-                        'name': track['name'],
-                        'artists': [artist['name'] for artist in track['artists']],
-                        'added_at': track_item.get('added_at', ''),
-                        'popularity': track.get('popularity', 0),
-                        'duration_ms': track.get('duration_ms', 0),
-                        'explicit': track.get('explicit', False),
-                        'preview_url': track.get('preview_url'),
-                        'energy': audio_features.get('energy', 0.0),
-                        'tempo': audio_features.get('tempo', 0.0),
-                        'key': audio_features.get('key', -1),
-                        'mode': audio_features.get('mode', 0),
-                        'time_signature': audio_features.get('time_signature', 4),
-                        'danceability': audio_features.get('danceability', 0.0),
-                        'instrumentalness': audio_features.get('instrumentalness', 0.0),
-                        'valence': audio_features.get('valence', 0.0),
-                        'album': track.get('album', {}).get('name', 'Unknown Album'),
-                        'release_date': track.get('album', {}).get('release_date', ''),
-                        'album_type': track.get('album', {}).get('album_type', 'unknown'),
-                        'uri': track.get('uri', '')
-                    }
+    def _combined_summary(self, playlists: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Totals across analysed playlists, with averages over their distinct tracks."""
+        analyses = [analysis for analysis in playlists.values() if 'error' not in analysis]
+        occurrences = defaultdict(int)
+        unique_rows = {}
+        for analysis in analyses:
+            for row in analysis['track_details']:
+                unique_rows.setdefault(row['id'], row)
+            for track_id in {row['id'] for row in analysis['track_details']}:
+                occurrences[track_id] += 1
+        
+        columns = TrackColumns(list(unique_rows.values()))
+        summary = {
+            'playlists': len(playlists),
+            'analysed_playlists': len(analyses),
+            'failed_playlists': len(playlists) - len(analyses),
+            'total_tracks': sum(analysis['total_tracks'] for analysis in analyses),
+            'unique_tracks': len(unique_rows),
+            'shared_tracks': sum(1 for count in occurrences.values() if count > 1),
+            'duplicates': sum(len(analysis['duplicates']) for analysis in analyses),
+            'total_duration_ms': int(columns['duration_ms'].sum()),
+            'average_popularity': columns.mean('popularity'),
+            'average_energy': columns.mean('energy'),
+            'average_tempo': columns.mean('tempo'),
+            'average_danceability': columns.mean('danceability'),
+            'average_valence': columns.mean('valence'),
+            'artist_distribution': dict(columns.artists.most_common())
+        }
+        return self.convert_to_serializable(summary)
 
-                    
-                    analysis['popularity_distribution'][track_info['popularity'] // 10 * 10] += 1
-                    analysis['energy_ranges'][int(track_info['energy'] * 10) * 10] += 1
-                    analysis['key_distribution'][track_info['key']] += 1
-                    analysis['mode_distribution'][track_info['mode']] += 1
-                    analysis['time_signature_distribution'][track_info['time_signature']] += 1
-
-                    for artist in track_info['artists']:
-                        analysis['artist_distribution'][artist] += 1
-
-                    if track_info['release_date']:
-                        try:
-                            year = int(track_info['release_date'][:4])
-                            decade = (year // 10) * 10
-                            analysis['decade_distribution'][decade] += 1
-                        except (ValueError, TypeError):
-                            pass
-
-                    if track_id in recent_plays_lookup:
-                        track_info['last_played'] = recent_plays_lookup[track_id]['played_at'].isoformat()
-                        analysis['played_tracks'] += 1
-                    else:
-                        track_info['last_played'] = None
-                        analysis['inactive_tracks'] += 1
-
-                    analysis['total_duration_ms'] += track_info['duration_ms']
-                    if track_info['explicit']:
-                        analysis['explicit_tracks'] += 1
-                    if track_info['preview_url']:
-                        analysis['preview_available'] += 1
-
-                    analysis['track_details'].append(track_info)
-
-                except Exception as track_error:
-                    logger.error(f"Error processing track: {str(track_error)}")
-                    continue
+    def remove_planned_tracks(self, snapshot_id: str, removals: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Remove the playlist occurrences of a dry-run plan made against ``snapshot_id``.
 
-            
-            if len(analysis['track_details']) > 0:
-                analysis.update({
-                    'average_popularity': sum(t['popularity'] for t in analysis['track_details']) / len(analysis['track_details']),
-                    'average_energy': sum(t['energy'] for t in analysis['track_details']) / len(analysis['track_details']),
-                    'average_tempo': sum(t['tempo'] for t in analysis['track_details']) / len(analysis['track_details']),
-                    'average_danceability': sum(t['danceability'] for t in analysis['track_details']) / len(analysis['track_details']),
-                    'average_valence': sum(t['valence'] for t in analysis['track_details']) / len(analysis['track_details']),
-                    'explicit_percentage': (analysis['explicit_tracks'] / len(analysis['track_details'])) * 100,
-                    'active_percentage': (analysis['played_tracks'] / len(analysis['track_details'])) * 100
-                })
-            else:
-                analysis.update({
-                    'average_popularity': 0,
-                    'average_energy': 0,
-                    'average_tempo': 0,
-                    'average_danceability': 0,
-                    'average_valence': 0,
-                    'explicit_percentage': 0,
-                    'active_percentage': 0
-                })
+        Each removal names a track (``id`` or ``uri``) and its ``position`` in
+        that snapshot. The plan is applied only if the playlist is still at
+        ``snapshot_id``, otherwise ``PlaylistConflictError`` is raised with the
+        current snapshot. Occurrences are grouped per track so each write call
+        carries the API maximum of tracks; calls are made back to back, paced
+        only by the request scheduler, each against the snapshot the previous
+        one returned, highest positions first. Returns the resulting
+        ``snapshot_id``, which the analysis cache is moved to without refetching.
+        """
+        positions_by_uri = defaultdict(set)
+        for removal in removals:
+            uri = removal.get('uri') or (f"spotify:track:{removal['id']}" if removal.get('id') else None)
+            position = removal.get('position')
+            if not uri or not isinstance(position, int) or isinstance(position, bool) or position < 0:
+                raise ValueError("Every planned removal needs a track ID and a playlist position")
+            positions_by_uri[uri].add(position)
 
-            
-            for dist_key in [
-                'artist_distribution', 
-                'popularity_distribution', 
-                'decade_distribution',
-                'energy_ranges',
-                'key_distribution',
-                'mode_distribution'
-            ]:
-                if dist_key in analysis:
-                    analysis[dist_key] = dict(
-                        sorted(
-                            analysis[dist_key].items(),
-                            key=lambda x: x[1],
-                            reverse=True
-                        )
-                    )
+        if not positions_by_uri:
+            return {'snapshot_id': snapshot_id, 'tracks_removed': 0, 'write_calls': 0}
 
-            logger.info(f"Completed analysis for playlist {self.playlist_id}")
-            return self.convert_to_serializable(analysis)
+        current = self.get_playlist(fields=projections.playlist('snapshot')).get('snapshot_id')
+        if current != snapshot_id:
+            raise PlaylistConflictError(
+                f"Playlist {self.playlist_id} changed since the removal plan was made",
+                snapshot_id=current
+            )
 
+        entries = sorted(
+            ((uri, sorted(positions)) for uri, positions in positions_by_uri.items()),
+            key=lambda entry: entry[1][-1],
+            reverse=True
+        )
+        batch_size = MAX_BATCH_SIZES['playlist_items']
+        planned_snapshot = snapshot_id
+        removed = []  # Positions removed so far, in the planned snapshot's numbering
+        write_calls = 0
+        try:
+            for start in range(0, len(entries), batch_size):
+                batch = entries[start:start + batch_size]
+                # Earlier batches shift later positions down by the occurrences they removed before them
+                items = [
+                    {'uri': uri, 'positions': [position - bisect_left(removed, position) for position in positions]}
+                    for uri, positions in batch
+                ]
+                response = self._make_spotify_request(
+                    self.sp.playlist_remove_specific_occurrences_of_items,
+                    self.playlist_id,
+                    items,
+                    snapshot_id=snapshot_id
+                )
+                write_calls += 1
+                snapshot_id = response.get('snapshot_id') if response else None
+                for _, positions in batch:
+                    for position in positions:
+                        insort(removed, position)
         except Exception as e:
-            logger.error(f"Error analyzing tracks: {str(e)}", exc_info=True)
-            raise PlaylistAnalysisError(f"Failed to analyze tracks: {str(e)}")  
+            analysis_cache.invalidate(self.playlist_id)
+            logger.error("Removal from playlist %s failed after %s tracks: %s", self.playlist_id, len(removed), e)
+            raise PlaylistAnalysisError(f"Removed {len(removed)} of {sum(len(p) for _, p in entries)} tracks before failing: {str(e)}")
+
+        if snapshot_id:
+            analysis_cache.apply_removal(self.playlist_id, planned_snapshot, snapshot_id, removed)
+        else:
+            analysis_cache.invalidate(self.playlist_id)
+
+        logger.info("Removed %s tracks from playlist %s in %s write calls", len(removed), self.playlist_id, write_calls)
+        return {'snapshot_id': snapshot_id, 'tracks_removed': len(removed), 'write_calls': write_calls}
 
     def optimize_playlist(self, criteria: Dict[str, Any]) -> Dict[str, Any]:
-        """Optimize playlist based on given criteria with improved error handling."""
+        """Optimize playlist based on given criteria with improved error handling.
+
+        The analysis is the dry-run plan; with ``autoRemove`` its flagged
+        occurrences are removed against the analysed snapshot.
+        """
         try:
-            logger.info(f"Starting playlist optimization with criteria: {criteria}")
+            logger.info("Starting playlist optimization with criteria: %s", criteria)
             
             
             analysis = self.analyze_tracks()
@@ -552,61 +1038,42 @@ class SpotifyPlaylistManager:
             if not analysis['track_details']:
                 raise PlaylistAnalysisError("No tracks found in playlist")
                 
-            tracks_to_remove = []
             min_popularity = int(criteria.get('minPopularity', 30))
             min_energy = float(criteria.get('minEnergy', 0.2))
             
-            for track in analysis['track_details']:
+            track_details = analysis['track_details']
+            columns = TrackColumns(track_details)
+            low_popularity, low_energy = columns.below_thresholds(min_popularity, min_energy)
+            
+            tracks_to_remove = []
+            for index in np.flatnonzero(low_popularity | low_energy):
+                track = track_details[index]
                 reasons = []
-                
-                
-                try:
-                    if track['popularity'] < min_popularity:
-                        reasons.append(f"Low popularity ({track['popularity']}%)")
+                if low_popularity[index]:
+                    reasons.append(f"Low popularity ({track['popularity']}%)")
+                if low_energy[index]:
+                    reasons.append(f"Low energy ({track['energy']*100:.0f}%)")
                     
-                    if track['energy'] < min_energy:
-                        reasons.append(f"Low energy ({track['energy']*100:.0f}%)")
-                        
-                    if reasons:
-                        tracks_to_remove.append({
-                            'id': track['id'],
-                            'name': track['name'],
-                            'artist': track['artists'][0] if track['artists'] else 'Unknown Artist',
-                            'popularity': track['popularity'],
-                            'energy': track['energy'],
-                            'reasons': reasons
-                        })
-                except (KeyError, TypeError) as e:
-                    logger.warning(f"Error processing track criteria: {str(e)}")
-                    continue
-            
+                tracks_to_remove.append({
+                    'id': track['id'],
+                    'name': track['name'],
+                    'artist': track['artists'][0] if track['artists'] else 'Unknown Artist',
+                    'popularity': track['popularity'],
+                    'energy': track['energy'],
+                    'reasons': reasons,
+                    'position': track['position']
+                })
             
-            removed_tracks = []
+            removal = {'snapshot_id': analysis['snapshot_id'], 'tracks_removed': 0, 'write_calls': 0}
             if criteria.get('autoRemove') and tracks_to_remove:
-                try:
-                    track_uris = [f"spotify:track:{track['id']}" for track in tracks_to_remove]
-                    
-                    
-                    for i in range(0, len(track_uris), 100):
-                        batch = track_uris[i:i+100]
-                        try:
-                            time.sleep(self.rate_limit_delay)  
-                            self._make_spotify_request(
-                                self.sp.playlist_remove_all_occurrences_of_items,
-                                self.playlist_id,
-                                batch
-                            )
-                            removed_tracks.extend(batch)
-                        except Exception as batch_error:
-                            logger.error(f"Error removing batch of tracks: {str(batch_error)}")
-                except Exception as remove_error:
-                    logger.error(f"Error during track removal: {str(remove_error)}")
+                removal = self.remove_planned_tracks(analysis['snapshot_id'], tracks_to_remove)
             
             result = {
                 'playlistName': analysis['playlist_name'],
                 'tracksAnalyzed': len(analysis['track_details']),
                 'tracksToRemove': tracks_to_remove,
-                'tracksRemoved': len(removed_tracks) if criteria.get('autoRemove') else 0,
+                'tracksRemoved': removal['tracks_removed'],
+                'snapshotId': removal['snapshot_id'],
                 'criteriaUsed': {
                     'minPopularity': min_popularity,
                     'minEnergy': min_energy,
@@ -614,57 +1081,58 @@ class SpotifyPlaylistManager:
                 }
             }
             
-            logger.info(f"Optimization complete. Found {len(tracks_to_remove)} tracks to remove.")
+            logger.info("Optimization complete. Found %s tracks to remove.", len(tracks_to_remove))
             return self.convert_to_serializable(result)
             
+        except PlaylistConflictError:
+            raise
         except Exception as e:
-            logger.error(f"Optimization error: {str(e)}", exc_info=True)
+            logger.error("Optimization error: %s", e, exc_info=True)
             raise PlaylistAnalysisError(f"Failed to optimize playlist: {str(e)}")
 
     def get_similar_tracks(self, limit: int = 20) -> List[Dict]:
         """Get similar tracks based on playlist tracks and audio features."""
+        for event in self.iter_similar_tracks(limit):
+            if event['type'] == 'result':
+                return event['tracks']
+        return []
+
+    def iter_similar_tracks(self, limit: int = 20) -> Iterator[Dict[str, Any]]:
+        """Generator version of ``get_similar_tracks`` that reports progress while it runs.
+
+        Candidates from several recommendation pulls and the user's saved
+        tracks are ranked by similarity to the playlist's audio features.
+        Yields ``progress`` events for page, feature and candidate fetches, a
+        ``seeds`` event, one ``track`` event per recommendation kept and
+        finally a ``result`` event with the ranked tracks. Failures end the
+        stream with an ``error`` event.
+        """
         try:
-            logger.info(f"Starting to get similar tracks for playlist: {self.playlist_id}")
+            logger.info("Starting to get similar tracks for playlist: %s", self.playlist_id)
             
-            # Get playlist tracks
-            tracks = self.get_playlist_tracks()
-            logger.info(f"Got {len(tracks)} tracks from playlist")
+            # Get playlist tracks and their audio features page by page
+            tracks = []
+            features = {}
+            for event in self._iter_feature_pages(projections.playlist_items('id')):
+                if event['type'] == 'page':
+                    tracks.extend(event['items'])
+                    features.update(event['features'])
+                else:
+                    yield event
+            logger.info("Got %s tracks from playlist with audio features for %s", len(tracks), len(features))
             
             if not tracks:
                 logger.warning("No tracks found in playlist")
-                return []
+                yield {'type': 'result', 'tracks': []}
+                return
     
-            # Get audio features for all tracks to make better selections
-            track_ids = [track['track']['id'] for track in tracks if track.get('track', {}).get('id')]
-            if not track_ids:
-                logger.warning("No valid track IDs found in playlist")
-                return []
-                
-            try:
-                features = self.get_audio_features_batch(track_ids)
-                logger.info(f"Retrieved audio features for {len(features)} tracks")
-            except Exception as e:
-                logger.error(f"Error getting audio features: {e}", exc_info=True)
-                features = {}
+            # Index the playlist's feature vectors to pick seeds and rank candidates locally
+            index = TrackVectorIndex.from_features(features, clusters=self.similar_clusters)
             
-            # Select diverse seed tracks based on audio features if available
-            seed_tracks = []
-            
-            # If we have features, try to select diverse tracks
-            if features and len(features) > 5:
-                # Sort tracks by energy to get a range
-                energy_sorted = sorted(
-                    [(tid, features[tid]['energy'] if isinstance(features[tid], dict) else 0.0) 
-                     for tid in features],
-                    key=lambda x: x[1]
-                )
-                
-                # Get tracks from different energy levels
-                if len(energy_sorted) >= 5:
-                    indices = [0, len(energy_sorted)//4, len(energy_sorted)//2, 
-                              3*len(energy_sorted)//4, len(energy_sorted)-1]
-                    seed_tracks = [energy_sorted[i][0] for i in indices]
-                    logger.info(f"Selected diverse seed tracks based on energy: {seed_tracks}")
+            # Seeds spread across every feature dimension, not just energy
+            seed_tracks = index.diverse_seeds(5) if len(index) > 5 else []
+            if seed_tracks:
+                logger.info("Selected diverse seed tracks across audio features: %s", seed_tracks)
             
             # If we couldn't select diverse tracks, fall back to the first 5 tracks
             if len(seed_tracks) < 5:
@@ -676,85 +1144,120 @@ class SpotifyPlaylistManager:
                                 if len(seed_tracks) >= 5:
                                     break
                     except Exception as e:
-                        logger.error(f"Error processing potential seed track: {e}")
+                        logger.error("Error processing potential seed track: %s", e)
                         continue
     
-            logger.info(f"Selected {len(seed_tracks)} seed tracks: {seed_tracks}")
+            logger.info("Selected %s seed tracks: %s", len(seed_tracks), seed_tracks)
     
             if len(seed_tracks) == 0:
                 logger.error("No valid seed tracks found")
-                return []
+                yield {'type': 'result', 'tracks': []}
+                return
+            yield {'type': 'seeds', 'seed_tracks': seed_tracks[:5]}
     
-            # Get recommendations with more parameters for better results
-            try:
-                logger.info("Requesting recommendations from Spotify")
-                
-                # Calculate average audio features to use as targets
-                avg_features = {}
-                if features:
-                    feature_keys = ['energy', 'danceability', 'valence', 'acousticness']
-                    for key in feature_keys:
-                        values = []
-                        for tid in features:
-                            if isinstance(features[tid], dict) and key in features[tid]:
-                                values.append(features[tid][key])
-                        if values:
-                            avg_features[f'target_{key}'] = sum(values) / len(values)
-                
-                # Add the average features to the recommendation request
-                recommendation_params = {
-                    'seed_tracks': seed_tracks[:5],
-                    'limit': min(limit * 2, 100),  # Request more tracks to filter later
-                    'min_popularity': 30
-                }
-                recommendation_params.update(avg_features)
-                
-                recommendations = self._make_spotify_request(
-                    self.sp.recommendations,
-                    **recommendation_params
-                )
-                
-                logger.info(f"Got recommendations response: {recommendations.keys() if recommendations else 'None'}")
-            except Exception as e:
-                logger.error(f"Error getting recommendations: {e}", exc_info=True)
-                return []
-    
-            # Get existing track IDs
             existing_ids = {
                 track['track']['id'] for track in tracks 
                 if track.get('track', {}).get('id')
             }
-    
-            # Process recommendations
+            
+            # One pull around the whole playlist, then one per cluster, largest first
+            pulls = [{'seed_tracks': seed_tracks[:5], **index.targets()}]
+            clusters = np.argsort(-index.cluster_sizes, kind='stable') if len(index.cluster_sizes) > 1 else []
+            for cluster in clusters[:self.recommendation_pulls - 1]:
+                pulls.append({
+                    'seed_tracks': index.cluster_members(int(cluster), 5),
+                    **index.targets(index.cluster_centroids[cluster])
+                })
+            
+            candidates = {}
+            failures = 0
+            logger.info("Requesting %s recommendation pulls from Spotify", len(pulls))
+            with ThreadPoolExecutor(max_workers=min(self.max_in_flight_pages, len(pulls))) as executor:
+                for recommendations in executor.map(self._get_recommendation_tracks, pulls):
+                    if recommendations is None:
+                        failures += 1
+                        continue
+                    for track in recommendations:
+                        if track and track.get('id') and track['id'] not in existing_ids:
+                            candidates.setdefault(track['id'], track)
+            
+            if failures == len(pulls):
+                yield {'type': 'error', 'error': "Failed to get recommendations"}
+                return
+            
+            for track in self._get_saved_track_candidates():
+                if track.get('id') and track['id'] not in existing_ids:
+                    candidates.setdefault(track['id'], track)
+            yield progress_event('candidates', len(candidates), len(candidates))
+            
+            candidate_ids = list(candidates)
+            candidate_features = self.get_audio_features_batch(candidate_ids) if candidate_ids else {}
+            
+            # Score every candidate in one vectorized pass against the playlist's centroids
             similar_tracks = []
-            for track in recommendations.get('tracks', []):
+            for track_id, similarity in index.rank(candidate_features, candidate_ids):
+                track = candidates[track_id]
                 try:
-                    if track['id'] not in existing_ids:
-                        similar_tracks.append({
-                            'id': track['id'],
-                            'name': track['name'],
-                            'artist': track['artists'][0]['name'] if track['artists'] else 'Unknown',
-                            'album': track['album']['name'] if track.get('album') else 'Unknown',
-                            'image': track['album']['images'][0]['url'] if track.get('album', {}).get('images') and track['album']['images'] else None,
-                            'uri': track['uri'],
-                            'popularity': track.get('popularity', 0)
-                        })
+                    similar_tracks.append({
+                        'id': track['id'],
+                        'name': track['name'],
+                        'artist': track['artists'][0]['name'] if track['artists'] else 'Unknown',
+                        'album': track['album']['name'] if track.get('album') else 'Unknown',
+                        'image': track['album']['images'][0]['url'] if track.get('album', {}).get('images') and track['album']['images'] else None,
+                        'uri': track['uri'],
+                        'popularity': track.get('popularity', 0),
+                        'similarity': round(similarity, 4)
+                    })
                 except Exception as e:
-                    logger.error(f"Error processing recommendation track: {e}")
+                    logger.error("Error processing recommendation track: %s", e)
                     continue
-            
-            # Sort by popularity and limit to requested number
-            similar_tracks.sort(key=lambda x: x.get('popularity', 0), reverse=True)
-            similar_tracks = similar_tracks[:limit]
+                if len(similar_tracks) >= limit:
+                    break
+    
+            for track in similar_tracks:
+                yield {'type': 'track', 'track': track}
     
-            logger.info(f"Found {len(similar_tracks)} similar tracks that are not already in the playlist")
-            return similar_tracks
+            logger.info("Found %s similar tracks that are not already in the playlist", len(similar_tracks))
+            yield {'type': 'result', 'tracks': similar_tracks}
             
         except Exception as e:
-            logger.error(f"Error getting similar tracks: {e}", exc_info=True)
-            return []
+            logger.error("Error getting similar tracks: %s", e, exc_info=True)
+            yield {'type': 'error', 'error': str(e)}
 
 
+    def _get_recommendation_tracks(self, params: Dict[str, Any]) -> Optional[List[Dict]]:
+        """Tracks of one recommendations pull, or None when the request fails."""
+        try:
+            recommendations = self._make_spotify_request(
+                self.sp.recommendations,
+                limit=100,
+                min_popularity=30,
+                **params
+            )
+            return (recommendations or {}).get('tracks', [])
+        except Exception as e:
+            logger.error("Error getting recommendations: %s", e, exc_info=True)
+            return None
+
+    def _get_saved_track_candidates(self) -> List[Dict]:
+        """Up to ``library_candidates`` of the user's most recently saved tracks."""
+        tracks = []
+        try:
+            while len(tracks) < self.library_candidates:
+                page = self._make_spotify_request(
+                    self.sp.current_user_saved_tracks,
+                    limit=min(50, self.library_candidates - len(tracks)),
+                    offset=len(tracks)
+                )
+                items = (page or {}).get('items', [])
+                tracks.extend(item['track'] for item in items if item and item.get('track'))
+                if not items or not page.get('next'):
+                    break
+        except Exception as e:
+            # Clients without a user, such as the public one, have no library
+            logger.warning("Saved tracks unavailable as similar-track candidates: %s", e)
+        return tracks[:self.library_candidates]
+
     def add_similar_tracks(self, track_ids: List[str]) -> bool:
         """Add similar tracks with improved error handling and rate limiting."""
         try:
@@ -767,19 +1270,18 @@ class SpotifyPlaylistManager:
             for i in range(0, len(track_uris), 100):
                 batch = track_uris[i:i+100]
                 try:
-                    time.sleep(self.rate_limit_delay)
                     self._make_spotify_request(
                         self.sp.playlist_add_items,
                         self.playlist_id,
                         batch
                     )
                 except Exception as batch_error:
-                    logger.error(f"Error adding batch of tracks: {str(batch_error)}")
+                    logger.error("Error adding batch of tracks: %s", batch_error)
                     raise
             
             return True
         except Exception as e:
-            logger.error(f"Error adding similar tracks: {str(e)}")
+            logger.error("Error adding similar tracks: %s", e)
             raise PlaylistAnalysisError(f"Failed to add similar tracks: {str(e)}")
 
     def verify_playlist(self) -> bool:
@@ -788,11 +1290,11 @@ class SpotifyPlaylistManager:
             playlist = self._make_spotify_request(
                 self.sp.playlist,
                 self.playlist_id,
-                fields='id,name,owner'
+                fields=projections.playlist('verify')
             )
             return bool(playlist and playlist.get('id'))
         except Exception as e:
-            logger.error(f"Error verifying playlist {self.playlist_id}: {str(e)}")
+            logger.error("Error verifying playlist %s: %s", self.playlist_id, e)
             return False
 
     def convert_to_serializable(self, data: Any) -> Any:
@@ -810,7 +1312,7 @@ class SpotifyPlaylistManager:
                 return data.isoformat()
             return data
         except Exception as e:
-            logger.error(f"Error converting to serializable: {str(e)}")
+            logger.error("Error converting to serializable: %s", e)
             return str(data)
 
     def get_playlist_info(self) -> Dict[str, Any]:
@@ -819,7 +1321,7 @@ class SpotifyPlaylistManager:
             playlist = self._make_spotify_request(
                 self.sp.playlist,
                 self.playlist_id,
-                fields='id,name,owner,images,tracks.total,description,public,collaborative'
+                fields=projections.playlist('info')
             )
             
             return {
@@ -834,7 +1336,7 @@ class SpotifyPlaylistManager:
                 'collaborative': playlist.get('collaborative')
             }
         except Exception as e:
-            logger.error(f"Error getting playlist info: {str(e)}")
+            logger.error("Error getting playlist info: %s", e)
             raise PlaylistAnalysisError(f"Failed to get playlist info: {str(e)}")
 
     def _reset_rate_limit_delay(self):
@@ -865,12 +1367,15 @@ class SpotifyPlaylistManager:
             self._reset_rate_limit_delay()
             
         except Exception as e:
-            logger.error(f"Error during cleanup: {str(e)}")
+            logger.error("Error during cleanup: %s", e)
     
     def get_category_playlists(self, category, limit=20):
         """
         Get playlists for a specific category with improved error handling and fallback.
         
+        Results are shared by every visitor through the category cache, which
+        serves stale entries while refreshing them in the background.
+        
         Args:
             category: The name of the category (case-insensitive)
             limit: Maximum number of playlists to return
@@ -878,6 +1383,13 @@ class SpotifyPlaylistManager:
         Returns:
             List of playlist objects or empty list if none found
         """
+        return category_cache.get(
+            f"{category.lower()}:{limit}",
+            lambda: self._fetch_category_playlists(category, limit)
+        )
+
+    def _fetch_category_playlists(self, category, limit=20):
+        """Fetch category playlists upstream, falling back to search."""
         # Common category mapping (lowercase name to Spotify ID)
         category_ids = {
             'rock': '0JQ5DAqbMKFHCxg5H5PtqW',
@@ -899,7 +1411,7 @@ class SpotifyPlaylistManager:
             'chill': '0JQ5DAqbMKFFzDl7qN9Apr'
         }
         
-        logger.info(f"Getting playlists for category: {category}")
+        logger.info("Getting playlists for category: %s", category)
         
         # Normalize category name for case-insensitive lookup
         category_lower = category.lower()
@@ -908,26 +1420,33 @@ class SpotifyPlaylistManager:
         playlists = []
         
         try:
-            # First try to get playlists from the category endpoint
-            logger.info(f"Attempting to get playlists for category ID: {category_id}")
-            results = self._make_spotify_request(
-                self.sp.category_playlists, 
-                category_id=category_id, 
-                limit=limit
-            )
-            
-            if results and 'playlists' in results and 'items' in results['playlists']:
-                playlists = results['playlists']['items']
-                logger.info(f"Found {len(playlists)} playlists for category {category}")
+            # First try to get playlists from the category endpoint, unless the ID is known to 404
+            if category_cache.is_missing(category_id):
+                logger.info("Category ID %s is known to be missing, skipping category endpoint", category_id)
             else:
-                logger.warning(f"No playlists found for category: {category}")
+                logger.info("Attempting to get playlists for category ID: %s", category_id)
+                results = self._make_spotify_request(
+                    self.sp.category_playlists, 
+                    category_id=category_id, 
+                    limit=limit
+                )
+                
+                if results and 'playlists' in results and 'items' in results['playlists']:
+                    playlists = [playlist for playlist in results['playlists']['items'] if playlist]
+                    logger.info("Found %s playlists for category %s", len(playlists), category)
+                else:
+                    logger.warning("No playlists found for category: %s", category)
         
+        except SpotifyException as e:
+            logger.error("Error getting category playlists for %s: %s", category, e)
+            if e.http_status == 404:
+                category_cache.mark_missing(category_id)
         except Exception as e:
-            logger.error(f"Error getting category playlists for {category}: {str(e)}")
+            logger.error("Error getting category playlists for %s: %s", category, e)
             
         # If no playlists found or error occurred, try search as fallback
         if not playlists:
-            logger.info(f"Falling back to search for category: {category}")
+            logger.info("Falling back to search for category: %s", category)
             try:
                 search_results = self._make_spotify_request(
                     self.sp.search, 
@@ -938,9 +1457,9 @@ class SpotifyPlaylistManager:
                 
                 if search_results and 'playlists' in search_results and 'items' in search_results['playlists']:
                     playlists = search_results['playlists']['items']
-                    logger.info(f"Found {len(playlists)} playlists via search for {category}")
+                    logger.info("Found %s playlists via search for %s", len(playlists), category)
             except Exception as e:
-                logger.error(f"Error searching for playlists for category {category}: {str(e)}")
+                logger.error("Error searching for playlists for category %s: %s", category, e)
         
         return playlists
             
@@ -954,7 +1473,7 @@ class SpotifyPlaylistManager:
                 
             return results['playlists']['items']
         except Exception as e:
-            logger.error(f"Error searching playlists: {str(e)}")
+            logger.error("Error searching playlists: %s", e)
             return []
             
     def follow_playlist(self, playlist_id):
@@ -963,7 +1482,7 @@ class SpotifyPlaylistManager:
             self.sp.current_user_follow_playlist(playlist_id=playlist_id)
             return True
         except Exception as e:
-            logger.error(f"Error following playlist: {str(e)}")
+            logger.error("Error following playlist: %s", e)
             return False
             
     def unfollow_playlist(self, playlist_id):
@@ -972,7 +1491,7 @@ class SpotifyPlaylistManager:
             self.sp.current_user_unfollow_playlist(playlist_id=playlist_id)
             return True
         except Exception as e:
-            logger.error(f"Error unfollowing playlist: {str(e)}")
+            logger.error("Error unfollowing playlist: %s", e)
             return False
     
     def _verify_credentials(self):
@@ -981,53 +1500,48 @@ class SpotifyPlaylistManager:
             # Try to get current user info as a simple test
             user_info = self._make_spotify_request(self.sp.current_user)
             if user_info and 'id' in user_info:
-                logger.info(f"Successfully verified Spotify credentials for user: {user_info['id']}")
+                logger.info("Successfully verified Spotify credentials for user: %s", user_info['id'])
             else:
                 logger.warning("Spotify credentials verification returned unexpected response")
         except Exception as e:
-            logger.error(f"Failed to verify Spotify credentials: {str(e)}")
+            logger.error("Failed to verify Spotify credentials: %s", e)
             # Don't raise the exception, just log it
     
     def _get_track_info_fallback(self, track_id: str) -> Dict:
         """Fallback method to get basic track information when audio_features fails.
         Uses the tracks API which has better permission access."""
+        return self._get_track_info_fallback_batch([track_id]).get(track_id, default_audio_features())
+
+    def _get_track_info_fallback_batch(self, track_ids: List[str]) -> Dict[str, Dict]:
+        """Batched fallback that derives basic features from the tracks API when audio_features fails."""
+        fallback_features = {}
         try:
-            logger.info(f"Using fallback method to get track info for {track_id}")
-            track_info = self._make_spotify_request(
-                self.sp.track,
-                track_id
-            )
-            
-            # Create a simplified audio features object with default values
-            # but include any information we can get from the track object
-            fallback_features = {
-                'energy': 0.5,  # Default mid-level values
-                'danceability': 0.5,
-                'valence': 0.5,
-                'tempo': 120.0,
-                'acousticness': 0.5,
-                'instrumentalness': 0.0,
-                'popularity': track_info.get('popularity', 50) / 100.0,  # Normalize to 0-1 range
-                'duration_ms': track_info.get('duration_ms', 0),
-                'name': track_info.get('name', 'Unknown'),
-                'artists': [artist['name'] for artist in track_info.get('artists', [])]
-            }
-            
-            logger.info(f"Successfully retrieved fallback track info for {track_id}")
-            return fallback_features
+            logger.info("Using fallback method to get track info for %s tracks", len(track_ids))
+            for track_id, track_info in self.get_tracks_batch(track_ids).items():
+                # Create a simplified audio features object with default values
+                # but include any information we can get from the track object
+                fallback_features[track_id] = {
+                    'energy': 0.5,  # Default mid-level values
+                    'danceability': 0.5,
+                    'valence': 0.5,
+                    'tempo': 120.0,
+                    'acousticness': 0.5,
+                    'instrumentalness': 0.0,
+                    'key': -1,  # Unknown, as the API reports undetected keys
+                    'mode': 0,
+                    'time_signature': 4,
+                    'popularity': track_info.get('popularity', 50) / 100.0,  # Normalize to 0-1 range
+                    'duration_ms': track_info.get('duration_ms', 0),
+                    'name': track_info.get('name', 'Unknown'),
+                    'artists': [artist['name'] for artist in track_info.get('artists', [])],
+                    'source': 'fallback'
+                }
         except Exception as e:
-            logger.error(f"Error getting fallback track info for {track_id}: {str(e)}")
-            # Return empty default values
-            return {
-                'energy': 0.5,
-                'danceability': 0.5,
-                'valence': 0.5,
-                'tempo': 120.0,
-                'acousticness': 0.5,
-                'instrumentalness': 0.0
-            }
-    
-    
+            logger.error("Error getting fallback track info for %s tracks: %s", len(track_ids), e)
         
-    
+        # Tracks the fallback could not resolve get empty default values
+        for track_id in track_ids:
+            if track_id not in fallback_features:
+                fallback_features[track_id] = default_audio_features()
         
+        return fallback_features
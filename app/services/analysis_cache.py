@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import logging
+from bisect import bisect_left
+from app.services.sqlite_store import SQLiteStore, DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, 'analysis_cache.db')
+
+class AnalysisCache(SQLiteStore):
+    """Per-track analysis rows cached by playlist and ``snapshot_id``.
+
+    Only the last analysed snapshot of each playlist is kept. Spotify changes
+    a playlist's ``snapshot_id`` whenever its contents change, so a matching
+    snapshot means the cached rows are still exact, and a different one lets
+    the manager diff the cached rows against the current track list. Rows
+    record the source of their audio features, so rows built from fallback
+    or default features can be refreshed once those expire.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS playlist_analysis ('
+        'playlist_id TEXT PRIMARY KEY, '
+        'snapshot_id TEXT NOT NULL, '
+        'playlist_name TEXT, '
+        'track_details TEXT NOT NULL, '
+        'updated_at REAL NOT NULL)',
+    )
+
+    def __init__(self, path=None):
+        super().__init__(path or os.getenv('ANALYSIS_CACHE_PATH', DEFAULT_CACHE_PATH))
+
+    def get(self, playlist_id):
+        """Return the cached entry for a playlist, or None."""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    'SELECT snapshot_id, playlist_name, track_details, updated_at FROM playlist_analysis WHERE playlist_id = ?',
+                    (playlist_id,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning("Analysis cache read failed for %s: %s", playlist_id, e)
+            return None
+
+        if not row:
+            return None
+
+        snapshot_id, playlist_name, track_details, updated_at = row
+        return {
+            'snapshot_id': snapshot_id,
+            'playlist_name': playlist_name,
+            'track_details': json.loads(track_details),
+            'updated_at': updated_at
+        }
+
+    def put(self, playlist_id, snapshot_id, playlist_name, track_details, updated_at=None):
+        """Replace the cached entry for a playlist; ``updated_at`` defaults to now."""
+        if not playlist_id or not snapshot_id:
+            return
+
+        try:
+            self._write([(
+                'INSERT OR REPLACE INTO playlist_analysis '
+                '(playlist_id, snapshot_id, playlist_name, track_details, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (playlist_id, snapshot_id, playlist_name, json.dumps(track_details), updated_at or time.time()),
+                False
+            )])
+        except Exception as e:
+            logger.warning("Analysis cache write failed for %s: %s", playlist_id, e)
+
+    def apply_removal(self, playlist_id, snapshot_id, new_snapshot_id, positions):
+        """Move a cached entry at ``snapshot_id`` to the snapshot left by removing ``positions``.
+
+        ``positions`` are sorted playlist positions in ``snapshot_id``; their
+        rows are dropped and later rows are renumbered, so the next analysis
+        is a cache hit without refetching anything. Entries at any other
+        snapshot are left to the incremental diff.
+        """
+        entry = self.get(playlist_id)
+        if not entry or entry['snapshot_id'] != snapshot_id:
+            return
+
+        removed = set(positions)
+        rows = []
+        for row in entry['track_details']:
+            position = row.get('position')
+            if position is None:
+                self.invalidate(playlist_id)
+                return
+            if position not in removed:
+                rows.append(dict(row, position=position - bisect_left(positions, position)))
+        # The rows are as old as before, so placeholder features still expire on time
+        self.put(playlist_id, new_snapshot_id, entry['playlist_name'], rows, entry['updated_at'])
+
+    def invalidate(self, playlist_id):
+        """Drop the cached entry for a playlist."""
+        try:
+            self._write([('DELETE FROM playlist_analysis WHERE playlist_id = ?', (playlist_id,), False)])
+        except Exception as e:
+            logger.warning("Analysis cache invalidation failed for %s: %s", playlist_id, e)
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from app.services.redis_client import select_backend, Lazy
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class LocalCacheBackend:
+    """In-process cache with per-entry expiry and a bounded number of keys."""
+
+    def __init__(self, max_keys=1024):
+        self.max_keys = max_keys
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self.entries[key] = (time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        """Set ``key`` only if it is absent; return whether it was set."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                return False
+            self.entries[key] = (time.time() + ttl, value)
+            return True
+
+    def release(self, key, value):
+        """Delete ``key`` only if it still holds ``value``."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] == value:
+                del self.entries[key]
+
+class RedisCacheBackend:
+    """Cache entries in Redis as JSON, shared by every gunicorn worker."""
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, client, prefix='cache'):
+        self.client = client
+        self.prefix = prefix
+        self._release = client.register_script(self.RELEASE_SCRIPT)
+
+    def get(self, key):
+        data = self.client.get(f"{self.prefix}:{key}")
+        return json.loads(data) if data else None
+
+    def set(self, key, value, ttl):
+        self.client.set(f"{self.prefix}:{key}", json.dumps(value), ex=max(1, int(ttl)))
+
+    def add(self, key, value, ttl):
+        return bool(self.client.set(f"{self.prefix}:{key}", json.dumps(value), ex=max(1, int(ttl)), nx=True))
+
+    def release(self, key, value):
+        """Delete ``key`` only if it still holds ``value``."""
+        self._release(keys=[f"{self.prefix}:{key}"], args=[json.dumps(value)])
+
+class CategoryCache:
+    """Stale-while-revalidate cache for public category browsing.
+
+    Category results are the same for every visitor. A fresh entry is served
+    as-is; once it is older than ``CATEGORY_CACHE_TTL`` it is still served
+    immediately while one background refresh per key replaces it, until
+    ``CATEGORY_CACHE_STALE_TTL``. Empty results are kept only briefly and a
+    failed refresh never replaces a non-empty entry.
+
+    Category IDs that Spotify answers with a 404 are remembered for
+    ``CATEGORY_NEGATIVE_TTL`` so the lookup goes straight to search.
+    ``CATEGORY_CACHE_BACKEND`` selects 'redis', 'memory' or 'auto'.
+    """
+
+    def __init__(self):
+        self.fresh_ttl = int(os.getenv('CATEGORY_CACHE_TTL', 900))
+        self.stale_ttl = int(os.getenv('CATEGORY_CACHE_STALE_TTL', 86400))
+        self.empty_ttl = int(os.getenv('CATEGORY_CACHE_EMPTY_TTL', 120))
+        self.negative_ttl = int(os.getenv('CATEGORY_NEGATIVE_TTL', 86400))
+        self.refresh_lock_ttl = 30
+        self.backend_name = os.getenv('CATEGORY_CACHE_BACKEND', 'auto')
+        self.local = LocalCacheBackend()
+        self._backend = Lazy(self._select_backend)
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'negative_hits': 0}
+
+    @property
+    def backend(self):
+        """Lazily selected backend, Redis when configured and reachable."""
+        return self._backend.get()
+
+    def _select_backend(self):
+        backend = select_backend(
+            self.backend_name, lambda client: RedisCacheBackend(client, prefix='category'), lambda: self.local, 'category cache'
+        )
+        return backend or self.local
+
+    def _call(self, method, *args):
+        """Run a backend operation, using the in-process cache if the shared one fails."""
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            logger.warning("Category cache backend failed, using in-process cache: %s", e)
+            return getattr(self.local, method)(*args)
+
+    def _store(self, key, value):
+        now = time.time()
+        fresh_ttl = self.fresh_ttl if value else self.empty_ttl
+        # Empty results are never served stale
+        stale_ttl = self.stale_ttl if value else fresh_ttl
+        self._call('set', f"entry:{key}", {'value': value, 'fresh_until': now + fresh_ttl}, stale_ttl)
+
+    def get(self, key, fetch):
+        """Cached value for ``key``, calling ``fetch()`` on a miss or in the background when stale."""
+        entry = self._call('get', f"entry:{key}")
+        if entry is None:
+            self.counters['misses'] += 1
+            metrics.record_cache('category_cache', 'miss')
+            value = fetch()
+            self._store(key, value)
+            return value
+
+        if entry['fresh_until'] > time.time():
+            self.counters['hits'] += 1
+            metrics.record_cache('category_cache', 'hit')
+        else:
+            self.counters['stale_hits'] += 1
+            metrics.record_cache('category_cache', 'stale')
+            # Only one worker refreshes a stale key at a time
+            owner = uuid.uuid4().hex
+            if self._call('add', f"refreshing:{key}", owner, self.refresh_lock_ttl):
+                threading.Thread(target=self._refresh, args=(key, fetch, entry, owner), daemon=True).start()
+        return entry['value']
+
+    def _refresh(self, key, fetch, entry, owner):
+        """Replace a stale entry, keeping it if the refresh comes back empty, then release the refresh lock."""
+        self.counters['refreshes'] += 1
+        try:
+            value = fetch()
+            if value or not entry['value']:
+                self._store(key, value)
+                logger.info("Refreshed category cache entry %s", key)
+            else:
+                logger.warning("Refresh of category cache entry %s returned nothing, keeping stale entry", key)
+        except Exception as e:
+            logger.warning("Background refresh of category cache entry %s failed: %s", key, e)
+        finally:
+            # Any worker may retry at once, rather than after the lock's TTL
+            self._call('release', f"refreshing:{key}", owner)
+
+    def is_missing(self, category_id):
+        """Whether Spotify recently answered 404 for this category ID."""
+        missing = bool(self._call('get', f"missing:{category_id}"))
+        metrics.record_cache('category_negative_cache', 'hit' if missing else 'miss')
+        if missing:
+            self.counters['negative_hits'] += 1
+        return missing
+
+    def mark_missing(self, category_id):
+        """Remember that this category ID 404s so it is not requested again."""
+        self._call('set', f"missing:{category_id}", 1, self.negative_ttl)
+
+    def stats(self):
+        """Hit, stale-hit, miss and refresh counts for this worker."""
+        return dict(self.counters)
+
+category_cache = CategoryCache()
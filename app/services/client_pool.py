@@ -0,0 +1,101 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from spotipy import Spotify
+from app.services.http_pool import http_pool
+
+logger = logging.getLogger(__name__)
+
+GUEST_KEY = 'guest'
+
+class PooledClient:
+    """A reusable spotipy client and the token it was last verified with."""
+
+    def __init__(self, sp, access_token):
+        self.sp = sp
+        self.access_token = access_token
+        self.verified_token = None
+
+class SpotifyClientPool:
+    """Per-worker pool of authenticated spotipy clients keyed by user ID or guest identity.
+
+    Clients keep their HTTP session between requests. When a user's access
+    token changes the existing client is re-pointed at the new token instead
+    of being rebuilt, and credentials are verified once per token rather
+    than once per request.
+    """
+
+    def __init__(self, max_clients=None):
+        self.max_clients = int(max_clients or os.getenv('SPOTIFY_CLIENT_POOL_SIZE', 256))
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build_client(self, access_token):
+        """Create a spotipy client on the worker's shared HTTP connection pool."""
+        return Spotify(
+            auth=access_token,
+            requests_session=http_pool.session,
+            requests_timeout=60
+        )
+
+    def get_client(self, key, access_token, verify=True):
+        """Return the pooled client for ``key`` authenticated with ``access_token``."""
+        if not access_token:
+            return None
+
+        with self._lock:
+            pooled = self._clients.get(key)
+            if pooled is None:
+                pooled = PooledClient(self._build_client(access_token), access_token)
+                self._clients[key] = pooled
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            elif pooled.access_token != access_token:
+                pooled.sp.set_auth(access_token)
+                pooled.access_token = access_token
+            self._clients.move_to_end(key)
+
+        if verify and pooled.verified_token != access_token:
+            self._verify(key, pooled, access_token)
+
+        return pooled.sp
+
+    def detached_client(self, access_token):
+        """A client outside the pool, for work such as background jobs that holds a token of its own.
+
+        Pooled clients are re-pointed at whichever token was seen last, so a
+        job that ran on one with the token it was submitted with would switch
+        the user's requests back to that token.
+        """
+        if not access_token:
+            return None
+        return self._build_client(access_token)
+
+    def _verify(self, key, pooled, access_token):
+        """Verify a token once by fetching the current user's profile."""
+        try:
+            user_info = pooled.sp.current_user()
+            if user_info and 'id' in user_info:
+                pooled.verified_token = access_token
+                logger.info("Verified Spotify credentials for pooled client %s", key)
+            else:
+                logger.warning("Spotify credentials verification for %s returned unexpected response", key)
+        except Exception as e:
+            logger.error("Failed to verify Spotify credentials for %s: %s", key, e)
+
+    def discard(self, key):
+        """Drop the pooled client for ``key``."""
+        with self._lock:
+            self._clients.pop(key, None)
+
+    def stats(self):
+        """Number of pooled clients and how many hold a verified token."""
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'verified': sum(1 for c in self._clients.values() if c.verified_token == c.access_token),
+                'max_clients': self.max_clients
+            }
+
+client_pool = SpotifyClientPool()
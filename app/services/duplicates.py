@@ -0,0 +1,103 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+# Title suffixes that mark another release of the same recording or song
+VARIANT_WORDS = r'remaster(?:ed)?|live|feat\.?|ft\.?|featuring|with|mono|stereo|version|edit|deluxe|anniversary|bonus'
+
+# "Song - Remastered 2011", "Song - Live at Wembley"
+_DASH_VARIANT = re.compile(rf'\s+-\s+.*\b(?:{VARIANT_WORDS})\b.*$')
+# "Song (feat. X)", "Song [Live]", "Song (2011 Remaster)"
+_BRACKET_VARIANT = re.compile(rf'\s*[(\[][^)\]]*\b(?:{VARIANT_WORDS})\b[^)\]]*[)\]]')
+# "Song feat. X" without brackets
+_TRAILING_FEATURE = re.compile(r'\s+(?:feat\.?|ft\.|featuring)\s+.*$')
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_SPACES = re.compile(r'\s+')
+
+def _fold(text: str) -> str:
+    """Lower case without accents, punctuation or repeated spaces."""
+    text = text.casefold()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return _SPACES.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+def normalise_title(title: str) -> str:
+    """A title with remaster, live, edition and featured-artist markers removed."""
+    title = title.casefold()
+    # Most titles carry no marker, so each pattern only runs when it could match
+    if '(' in title or '[' in title:
+        title = _BRACKET_VARIANT.sub('', title)
+    if ' - ' in title:
+        title = _DASH_VARIANT.sub('', title)
+    if 'f' in title:
+        title = _TRAILING_FEATURE.sub('', title)
+    return _fold(title)
+
+def song_key(row: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Normalised title and primary artist, or None when either is missing."""
+    title = normalise_title(row.get('name') or '')
+    artists = row.get('artists') or []
+    artist = _fold(artists[0]) if artists and artists[0] else ''
+    if not title or not artist:
+        return None
+    return title, artist
+
+class DuplicateDetector:
+    """Finds repeated tracks in one pass over a playlist's rows, in playlist order.
+
+    Each row is looked up in three hash maps, by track ID, by ISRC and by
+    normalised title and primary artist, so a playlist is checked in linear
+    time while its pages stream in. The first occurrence is kept; every
+    later one is reported with its position and the kind of match:
+    'exact' (same track), 'isrc' (same recording on another release) or
+    'similar' (a remaster, live or featuring variant of the same song).
+    """
+
+    def __init__(self):
+        self.duplicates = []
+        self._by_id = {}
+        self._by_isrc = {}
+        self._by_song = {}
+
+    def add(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Check one row against the rows before it; returns its duplicate entry, if any."""
+        track_id = row.get('id')
+        isrc = (row.get('isrc') or '').upper() or None
+        key = song_key(row)
+
+        match, original = None, None
+        if track_id in self._by_id:
+            match, original = 'exact', self._by_id[track_id]
+        elif isrc and isrc in self._by_isrc:
+            match, original = 'isrc', self._by_isrc[isrc]
+        elif key and key in self._by_song:
+            match, original = 'similar', self._by_song[key]
+
+        if match is None:
+            # Only kept rows are indexed, so every duplicate points at a kept row
+            self._by_id[track_id] = row
+            if isrc:
+                self._by_isrc.setdefault(isrc, row)
+            if key:
+                self._by_song.setdefault(key, row)
+            return None
+
+        entry = {
+            'id': track_id,
+            'uri': row.get('uri') or f"spotify:track:{track_id}",
+            'name': row.get('name'),
+            'artist': row['artists'][0] if row.get('artists') else 'Unknown Artist',
+            'position': row.get('position'),
+            'match': match,
+            'duplicate_of': {
+                'id': original.get('id'),
+                'name': original.get('name'),
+                'position': original.get('position')
+            }
+        }
+        self.duplicates.append(entry)
+        return entry
+
+    def add_many(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Check rows in order; returns the duplicate entries among them."""
+        return [entry for entry in map(self.add, rows) if entry is not None]
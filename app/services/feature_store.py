@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import logging
+from app.services.sqlite_store import SQLiteStore, DATA_DIR
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Higher quality sources are never overwritten by lower quality ones
+SOURCE_QUALITY = {
+    'default': 0,
+    'fallback': 1,
+    'api': 2
+}
+
+# Entries stored before these features were kept are fetched again
+REQUIRED_FIELDS = ('key', 'mode', 'time_signature')
+
+DEFAULT_STORE_PATH = os.path.join(DATA_DIR, 'audio_features.db')
+
+class AudioFeatureStore(SQLiteStore):
+    """Persistent audio-features store shared by every worker process on a node.
+
+    Features are kept in a SQLite database in WAL mode so any number of
+    gunicorn workers can read concurrently while one writes. Each entry is
+    flagged with its source: 'api' for real audio features, 'fallback' for
+    values derived from the tracks API and 'default' for placeholder values.
+    Entries from any source below 'api' are retried once they are older than
+    ``placeholder_ttl``.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS audio_features ('
+        'track_id TEXT PRIMARY KEY, '
+        'features TEXT NOT NULL, '
+        'source TEXT NOT NULL, '
+        'quality INTEGER NOT NULL, '
+        'updated_at REAL NOT NULL)',
+    )
+
+    # SQLite's default limit on host parameters is 999 on older builds
+    QUERY_CHUNK_SIZE = 500
+
+    def __init__(self, path=None, placeholder_ttl=None):
+        super().__init__(path or os.getenv('FEATURE_STORE_PATH', DEFAULT_STORE_PATH))
+        if placeholder_ttl is None:
+            placeholder_ttl = int(os.getenv('FEATURE_STORE_PLACEHOLDER_TTL', os.getenv('FEATURE_STORE_DEFAULT_TTL', 86400)))
+        self.placeholder_ttl = placeholder_ttl
+
+    def get_many(self, track_ids):
+        """Return stored features for the given track IDs, skipping expired fallback and default entries."""
+        if not track_ids:
+            return {}
+
+        results = {}
+        placeholder_cutoff = time.time() - self.placeholder_ttl
+        unique_ids = list(dict.fromkeys(track_ids))
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                for i in range(0, len(unique_ids), self.QUERY_CHUNK_SIZE):
+                    chunk = unique_ids[i:i+self.QUERY_CHUNK_SIZE]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = conn.execute(
+                        f'SELECT track_id, features, source, updated_at FROM audio_features '
+                        f'WHERE track_id IN ({placeholders})',
+                        chunk
+                    ).fetchall()
+
+                    for track_id, features, source, updated_at in rows:
+                        if SOURCE_QUALITY.get(source, 0) < SOURCE_QUALITY['api'] and updated_at < placeholder_cutoff:
+                            continue
+                        entry = json.loads(features)
+                        if not all(field in entry for field in REQUIRED_FIELDS):
+                            continue
+                        entry['source'] = source
+                        results[track_id] = entry
+        except Exception as e:
+            logger.warning("Audio feature store read failed: %s", e)
+            return {}
+
+        metrics.record_cache('feature_store', 'hit', len(results))
+        metrics.record_cache('feature_store', 'miss', len(unique_ids) - len(results))
+        return results
+
+    def put_many(self, features):
+        """Store feature dicts keyed by track ID, keeping the best known source."""
+        if not features:
+            return
+
+        now = time.time()
+        rows = []
+        for track_id, entry in features.items():
+            source = entry.get('source', 'api')
+            values = {k: v for k, v in entry.items() if k != 'source'}
+            rows.append((track_id, json.dumps(values), source, SOURCE_QUALITY.get(source, 0), now))
+
+        try:
+            self._write([(
+                'INSERT INTO audio_features (track_id, features, source, quality, updated_at) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(track_id) DO UPDATE SET '
+                'features = excluded.features, source = excluded.source, '
+                'quality = excluded.quality, updated_at = excluded.updated_at '
+                'WHERE excluded.quality >= audio_features.quality',
+                rows,
+                True
+            )])
+        except Exception as e:
+            logger.warning("Audio feature store write failed: %s", e)
+
+    def clear(self):
+        """Remove every stored entry."""
+        self._write([('DELETE FROM audio_features', (), False)])
+
+feature_store = AudioFeatureStore()
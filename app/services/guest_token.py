@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import uuid
+import base64
+import threading
+import logging
+from app.services.http_pool import http_pool
+from app.services.redis_client import select_backend, Lazy, PerProcess
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+
+def request_guest_token():
+    """Request a new client-credentials token from Spotify.
+
+    Returns ``{'access_token', 'expires_at'}`` or raises on failure.
+    """
+    client_id = os.getenv('SPOTIFY_CLIENT_ID')
+    client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
+    if not client_id or not client_secret:
+        raise RuntimeError("Missing Spotify credentials")
+
+    auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
+    response = http_pool.session.post(
+        TOKEN_URL,
+        headers={
+            "Authorization": f"Basic {auth_header}",
+            "Content-Type": "application/x-www-form-urlencoded"
+        },
+        data={"grant_type": "client_credentials"},
+        timeout=10
+    )
+    response.raise_for_status()
+    token_info = response.json()
+    return {
+        'access_token': token_info['access_token'],
+        'expires_at': time.time() + token_info['expires_in']
+    }
+
+class FileTokenStore:
+    """Guest token shared by the workers on a node through a file.
+
+    A non-blocking lock on ``<path>.lock`` elects one worker to fetch a new
+    token; the others poll for it with short sleeps, which yield under
+    gevent, rather than blocking on the lock. The token is written to a
+    temporary file and moved into place, so readers never see half of it.
+    """
+
+    def __init__(self, path, wait=5.0):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.wait = wait
+
+    def _load(self, min_valid):
+        try:
+            with open(self.path) as f:
+                token = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if token and token['expires_at'] - time.time() > min_valid:
+            return token
+        return None
+
+    def _store(self, token):
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(token, f)
+        os.chmod(temporary, 0o600)
+        os.replace(temporary, self.path)
+
+    def refresh(self, fetch, min_valid):
+        """Return the stored token if valid for ``min_valid`` seconds, otherwise fetch and store one."""
+        token = self._load(min_valid)
+        if token:
+            return token
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            deadline = time.monotonic() + self.wait
+            locked = False
+            while not locked:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning("Timed out waiting for another worker to refresh the guest token")
+                        break
+                    time.sleep(0.1)
+                    token = self._load(min_valid)
+                    if token:
+                        return token
+
+            # Another worker may have stored a token between the first check and the lock
+            token = self._load(min_valid) if locked else None
+            if token:
+                return token
+            token = fetch()
+            self._store(token)
+            return token
+        finally:
+            os.close(fd)
+
+class RedisTokenStore:
+    """Guest token shared by every worker through Redis.
+
+    A short NX lock elects one worker to fetch a new token; the others wait
+    briefly for it to appear. The lock holds a value unique to its owner,
+    which alone releases it.
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, client, key='spotify:guest_token', wait=5.0):
+        self.client = client
+        self.key = key
+        self.lock_key = f"{key}:refreshing"
+        self.wait = wait
+        self._release = client.register_script(self.RELEASE_SCRIPT)
+
+    def _load(self, min_valid):
+        data = self.client.get(self.key)
+        token = json.loads(data) if data else None
+        if token and token['expires_at'] - time.time() > min_valid:
+            return token
+        return None
+
+    def refresh(self, fetch, min_valid):
+        """Return the shared token if valid for ``min_valid`` seconds, otherwise fetch and share one."""
+        token = self._load(min_valid)
+        if token:
+            return token
+
+        owner = uuid.uuid4().hex
+        locked = bool(self.client.set(self.lock_key, owner, ex=int(self.wait) + 5, nx=True))
+        if not locked:
+            deadline = time.monotonic() + self.wait
+            while time.monotonic() < deadline:
+                time.sleep(0.1)
+                token = self._load(min_valid)
+                if token:
+                    return token
+            logger.warning("Timed out waiting for another worker to refresh the guest token")
+
+        try:
+            token = fetch()
+            ttl = int(token['expires_at'] - time.time())
+            if ttl > 0:
+                self.client.set(self.key, json.dumps(token), ex=ttl)
+            return token
+        finally:
+            if locked:
+                self._release(keys=[self.lock_key], args=[owner])
+
+class GuestTokenProvider:
+    """Client-credentials token for public endpoints, refreshed ahead of expiry.
+
+    The token is refreshed in the background ``refresh_ahead`` seconds
+    before it expires, so requests only ever wait for the very first fetch.
+    Concurrent callers that do need a token share one fetch. With a shared
+    store ('redis' or 'file', chosen by ``GUEST_TOKEN_STORE``), all workers
+    use one token and only one of them fetches it.
+    """
+
+    def __init__(self, fetch=request_guest_token):
+        self.fetch = fetch
+        self.refresh_ahead = int(os.getenv('GUEST_TOKEN_REFRESH_AHEAD', 300))
+        # A token is never handed out this close to expiry
+        self.expiry_margin = 60
+        self.store_name = os.getenv('GUEST_TOKEN_STORE', 'auto')
+        self._store = Lazy(self._select_store)
+        self._token = None
+        self._refresh_lock = threading.Lock()
+        self._ensure_refresher = PerProcess(self._start_refresher)
+        self._wakeup = threading.Event()
+
+    @property
+    def store(self):
+        """Lazily selected shared store, or None when tokens are per worker."""
+        return self._store.get()
+
+    def _select_store(self):
+        return select_backend(self.store_name, RedisTokenStore, self._file_store, 'guest token store')
+
+    def _file_store(self):
+        if fcntl is None:
+            return None
+        return FileTokenStore(os.getenv('GUEST_TOKEN_FILE', os.path.join('data', 'guest_token.json')))
+
+    def get_token(self):
+        """Current guest access token, or None if one cannot be obtained."""
+        token = self._token
+        now = time.time()
+        self._ensure_refresher()
+
+        if token and token['expires_at'] - now > self.expiry_margin:
+            if token['expires_at'] - now <= self.refresh_ahead:
+                # The background refresher is behind; nudge it but serve the current token
+                self._wakeup.set()
+            return token['access_token']
+
+        try:
+            return self._refresh()['access_token']
+        except Exception as e:
+            logger.error("Error getting guest token: %s", e)
+            return None
+
+    def _refresh(self, force=False):
+        """Fetch a new token unless another caller already has; concurrent callers share one fetch."""
+        with self._refresh_lock:
+            token = self._token
+            min_valid = self.refresh_ahead if force else self.expiry_margin
+            if token and token['expires_at'] - time.time() > min_valid:
+                return token
+
+            store = self.store
+            if store is not None:
+                try:
+                    token = store.refresh(self.fetch, self.refresh_ahead)
+                except Exception as e:
+                    logger.warning("Shared guest token store failed, fetching directly: %s", e)
+                    token = self.fetch()
+            else:
+                token = self.fetch()
+
+            self._token = token
+            logger.info("Guest token refreshed, valid for %s seconds", int(token['expires_at'] - time.time()))
+            return token
+
+    def _start_refresher(self):
+        """Start this process's background refresher; run once per process by ``_ensure_refresher``."""
+        threading.Thread(target=self._refresh_loop, name='guest-token-refresher', daemon=True).start()
+
+    def _refresh_loop(self):
+        """Refresh the token ``refresh_ahead`` seconds before it expires."""
+        retry_delay = 10
+        while True:
+            token = self._token
+            if token:
+                # At least a second between refreshes even if tokens are short-lived
+                self._wakeup.wait(max(1.0, token['expires_at'] - self.refresh_ahead - time.time()))
+            self._wakeup.clear()
+            try:
+                self._refresh(force=True)
+                retry_delay = 10
+            except Exception as e:
+                logger.error("Background guest token refresh failed, retrying in %s seconds: %s", retry_delay, e)
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, self.refresh_ahead)
+
+    def invalidate(self):
+        """Forget the cached token so the next request fetches a new one."""
+        self._token = None
+
+guest_tokens = GuestTokenProvider()
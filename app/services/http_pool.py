@@ -0,0 +1,124 @@
+import os
+import threading
+import logging
+from collections import defaultdict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+SPOTIFY_HOSTS = ('accounts.spotify.com', 'api.spotify.com')
+
+class SharedSession(requests.Session):
+    """Session shared by every Spotify client in a worker.
+
+    spotipy closes the session of any client or auth manager that is
+    garbage collected, which would drop the pooled connections for
+    everyone else, so close() is a no-op and the pool is released with
+    shutdown() instead.
+    """
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+class SpotifyHTTPPool:
+    """One tuned keep-alive connection pool per worker for all Spotify traffic.
+
+    ``pool_maxsize`` should match gunicorn's ``worker_connections`` so every
+    greenlet in a gevent worker can hold a warm connection to
+    api.spotify.com without waiting on the pool or repeating a TLS handshake.
+    """
+
+    def __init__(self, pool_maxsize=None, retries=3, backoff_factor=2):
+        self.pool_maxsize = int(pool_maxsize or os.getenv('SPOTIFY_HTTP_POOL_SIZE', 100))
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._received = defaultdict(lambda: [0, 0])  # host -> [responses, body bytes]
+
+    def _build_session(self):
+        """Create the shared session with retrying keep-alive adapters."""
+        session = SharedSession()
+        # 429s are left to the request scheduler so Retry-After is honoured once
+        retry = Retry(
+            total=self.retries,
+            connect=None,
+            read=False,
+            allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(500, 502, 503, 504)
+        )
+        adapter = HTTPAdapter(
+            pool_connections=len(SPOTIFY_HOSTS),
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.hooks['response'].append(self._record_response)
+        logger.info("Created shared Spotify HTTP pool (maxsize=%s) for worker %s", self.pool_maxsize, os.getpid())
+        return session
+
+    def _record_response(self, response, *args, **kwargs):
+        """Count response bodies per host so payload sizes can be compared."""
+        entry = self._received[urlsplit(response.url).hostname]
+        entry[0] += 1
+        entry[1] += len(response.content or b'')
+
+    @property
+    def session(self):
+        """The worker's shared session, rebuilt after a fork."""
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._build_session()
+                    self._pid = os.getpid()
+                    self._received.clear()
+        return self._session
+
+    def stats(self):
+        """Per-host connection pool usage for this worker."""
+        hosts = {}
+        if self._session is None or self._pid != os.getpid():
+            return {'pid': os.getpid(), 'pool_maxsize': self.pool_maxsize, 'hosts': hosts}
+
+        adapter = self._session.get_adapter('https://')
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened = pool.num_connections
+            served = pool.num_requests
+            hosts[pool.host] = {
+                'requests': served,
+                'connections_opened': opened,
+                'connections_reused': max(0, served - opened),
+                # Empty slots in urllib3's pool queue are held as None
+                'idle_connections': sum(1 for conn in pool.pool.queue if conn is not None) if pool.pool is not None else 0
+            }
+
+        for host, (responses, received) in list(self._received.items()):
+            hosts.setdefault(host, {}).update({
+                'bytes_received': received,
+                'average_response_bytes': received // responses if responses else 0
+            })
+
+        return {'pid': os.getpid(), 'pool_maxsize': self.pool_maxsize, 'hosts': hosts}
+
+    def shutdown(self):
+        """Close every pooled connection."""
+        with self._lock:
+            if self._session is not None:
+                self._session.shutdown()
+                self._session = None
+
+http_pool = SpotifyHTTPPool()
@@ -0,0 +1,456 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+import logging
+from app.services.redis_client import select_backend, PerProcess
+from app.services.sqlite_store import SQLiteStore, DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Job fields returned to clients; everything else (owner, params) stays internal
+PUBLIC_FIELDS = (
+    'id',
+    'kind',
+    'playlist_id',
+    'criteria',
+    'status',
+    'progress',
+    'result',
+    'error',
+    'created_at',
+    'started_at',
+    'finished_at'
+)
+
+DEFAULT_JOBS_PATH = os.path.join(DATA_DIR, 'jobs.db')
+
+# Error recorded on a job that must not run twice when its worker stopped renewing its lease
+LEASE_LAPSED_ERROR = 'The job stopped responding and was not restarted; check the playlist before retrying'
+
+def dedup_key(kind, playlist_id, criteria, owner):
+    """Key shared by identical submissions from the same user."""
+    payload = json.dumps([kind, playlist_id, criteria, owner], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class SQLiteJobBackend(SQLiteStore):
+    """Job queue shared by every worker process on a node through SQLite.
+
+    Any process can answer a status request or absorb an identical
+    submission, and any job worker can run a queued job. A claimed job is
+    leased for ``visibility_timeout`` seconds and the lease is renewed while
+    it runs. Once a lease lapses the job is claimed again if its record is
+    ``retryable``, and marked failed otherwise, so jobs that change a
+    playlist never run twice. Handler parameters, which carry credentials,
+    live in their own table and are deleted when the job finishes.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS jobs ('
+        'id TEXT PRIMARY KEY, '
+        'state TEXT NOT NULL, '
+        'lease_until REAL, '
+        'record TEXT NOT NULL, '
+        'created_at REAL NOT NULL, '
+        'expires_at REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)',
+        'CREATE TABLE IF NOT EXISTS job_dedup (key TEXT PRIMARY KEY, job_id TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS job_params (job_id TEXT PRIMARY KEY, params TEXT NOT NULL)',
+    )
+
+    def __init__(self, ttl, visibility_timeout, path=None):
+        super().__init__(path or os.getenv('JOBS_DB_PATH', DEFAULT_JOBS_PATH))
+        self.ttl = ttl
+        self.visibility_timeout = visibility_timeout
+
+    def submit(self, job, key, params):
+        """Enqueue ``job`` unless an identical one is queued or running; return the job ID to report."""
+        def run(conn):
+            now = time.time()
+            expired = "SELECT id FROM jobs WHERE state = 'finished' AND expires_at < ?"
+            conn.execute(f'DELETE FROM job_params WHERE job_id IN ({expired})', (now,))
+            conn.execute(f'DELETE FROM job_dedup WHERE job_id IN ({expired})', (now,))
+            conn.execute(f'DELETE FROM jobs WHERE id IN ({expired})', (now,))
+            existing = conn.execute(
+                "SELECT jobs.id FROM job_dedup JOIN jobs ON jobs.id = job_dedup.job_id "
+                "WHERE job_dedup.key = ? AND jobs.state != 'finished'",
+                (key,)
+            ).fetchone()
+            if existing:
+                return existing[0]
+            conn.execute(
+                "INSERT INTO jobs (id, state, lease_until, record, created_at, expires_at) VALUES (?, 'queued', NULL, ?, ?, ?)",
+                (job['id'], json.dumps(job), now, now + self.ttl)
+            )
+            conn.execute('INSERT OR REPLACE INTO job_dedup (key, job_id) VALUES (?, ?)', (key, job['id']))
+            conn.execute('INSERT OR REPLACE INTO job_params (job_id, params) VALUES (?, ?)', (job['id'], json.dumps(params)))
+            return job['id']
+        return self._transaction(run)
+
+    def pop(self, timeout):
+        """Claim the oldest queued job, or a retryable one whose lease lapsed; None if there is none."""
+        def run(conn):
+            now = time.time()
+            while True:
+                row = conn.execute(
+                    "SELECT id, state, record FROM jobs WHERE state = 'queued' OR (state = 'running' AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if not row:
+                    return None
+                job = json.loads(row[2])
+                if row[1] == 'queued' or job.get('retryable', True):
+                    break
+                job.update(status='failed', error=LEASE_LAPSED_ERROR, finished_at=now)
+                conn.execute(
+                    "UPDATE jobs SET state = 'finished', lease_until = NULL, record = ?, expires_at = ? WHERE id = ?",
+                    (json.dumps(job), now + self.ttl, row[0])
+                )
+                conn.execute('DELETE FROM job_params WHERE job_id = ?', (row[0],))
+                conn.execute('DELETE FROM job_dedup WHERE job_id = ?', (row[0],))
+                logger.warning("Lease of %s job %s lapsed, marked it failed", job.get('kind'), row[0])
+            conn.execute(
+                "UPDATE jobs SET state = 'running', lease_until = ? WHERE id = ?",
+                (now + self.visibility_timeout, row[0])
+            )
+            return row[0]
+        return self._transaction(run)
+
+    def load(self, job_id):
+        with self._lock:
+            row = self._connect().execute('SELECT record FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def params(self, job_id):
+        with self._lock:
+            row = self._connect().execute('SELECT params FROM job_params WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save(self, job):
+        self._write([('UPDATE jobs SET record = ? WHERE id = ?', (json.dumps(job), job['id']), False)])
+
+    def touch(self, job, key):
+        """Renew the lease and expiry of a running job."""
+        now = time.time()
+        self._write([(
+            "UPDATE jobs SET lease_until = ?, expires_at = ? WHERE id = ? AND state = 'running'",
+            (now + self.visibility_timeout, now + self.ttl, job['id']),
+            False
+        )])
+
+    def finish(self, job, key):
+        """Store the final state, drop the job's parameters and allow identical submissions again."""
+        self._write([
+            (
+                "UPDATE jobs SET state = 'finished', lease_until = NULL, record = ?, expires_at = ? WHERE id = ?",
+                (json.dumps(job), time.time() + self.ttl, job['id']),
+                False
+            ),
+            ('DELETE FROM job_params WHERE job_id = ?', (job['id'],), False),
+            ('DELETE FROM job_dedup WHERE key = ? AND job_id = ?', (key, job['id']), False)
+        ])
+
+class RedisJobBackend:
+    """Job queue in Redis, consumed by the job workers of every gunicorn process.
+
+    Job records are JSON strings that expire after the result TTL. The
+    dedup check, the record write and the enqueue run atomically in a Lua
+    script so identical concurrent submissions get the same job. A claimed
+    job is leased in a sorted set until ``visibility_timeout`` from now;
+    running jobs renew the lease, record, params and dedup key. At the next
+    claim a job whose lease lapsed goes back on the queue if its record is
+    ``retryable`` and is marked failed otherwise. Handler parameters are
+    kept under their own key, never in the job record.
+    """
+
+    SUBMIT_SCRIPT = """
+    local existing = redis.call('GET', KEYS[1])
+    if existing and redis.call('EXISTS', ARGV[3] .. existing) == 1 then
+        return existing
+    end
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[4])
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[4])
+    redis.call('SET', KEYS[4], ARGV[5], 'EX', ARGV[4])
+    redis.call('RPUSH', KEYS[3], ARGV[1])
+    return ARGV[1]
+    """
+
+    POP_SCRIPT = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+    for _, job_id in ipairs(expired) do
+        redis.call('ZREM', KEYS[2], job_id)
+        local data = redis.call('GET', ARGV[3] .. job_id)
+        if data then
+            local job = cjson.decode(data)
+            if job['retryable'] == false then
+                job['status'] = 'failed'
+                job['error'] = ARGV[5]
+                job['finished_at'] = tonumber(ARGV[1])
+                redis.call('SET', ARGV[3] .. job_id, cjson.encode(job), 'EX', ARGV[6])
+                redis.call('DEL', ARGV[4] .. job_id)
+                if job['dedup_key'] and redis.call('GET', ARGV[7] .. job['dedup_key']) == job_id then
+                    redis.call('DEL', ARGV[7] .. job['dedup_key'])
+                end
+            else
+                redis.call('RPUSH', KEYS[1], job_id)
+            end
+        end
+    end
+    local job_id = redis.call('LPOP', KEYS[1])
+    if job_id then
+        redis.call('ZADD', KEYS[2], ARGV[2], job_id)
+    end
+    return job_id
+    """
+
+    FINISH_SCRIPT = """
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    redis.call('DEL', KEYS[4])
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+    end
+    return 1
+    """
+
+    def __init__(self, client, ttl, visibility_timeout, prefix='jobs'):
+        self.client = client
+        self.ttl = ttl
+        self.visibility_timeout = visibility_timeout
+        # The hash tag keeps every job key on the same cluster slot for the scripts
+        self.prefix = f"{prefix}:{{queue}}"
+        self.queue_key = f"{self.prefix}:pending"
+        self.leases_key = f"{self.prefix}:leases"
+        self._submit = client.register_script(self.SUBMIT_SCRIPT)
+        self._pop = client.register_script(self.POP_SCRIPT)
+        self._finish = client.register_script(self.FINISH_SCRIPT)
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}:job:{job_id}"
+
+    def _params_key(self, job_id):
+        return f"{self.prefix}:params:{job_id}"
+
+    def _dedup_key(self, key):
+        return f"{self.prefix}:dedup:{key}"
+
+    def submit(self, job, key, params):
+        job_id = self._submit(
+            keys=[self._dedup_key(key), self._job_key(job['id']), self.queue_key, self._params_key(job['id'])],
+            args=[job['id'], json.dumps(job), f"{self.prefix}:job:", self.ttl, json.dumps(params)]
+        )
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+    def pop(self, timeout):
+        # A script rather than BLPOP: the shared client uses short socket timeouts
+        now = time.time()
+        job_id = self._pop(
+            keys=[self.queue_key, self.leases_key],
+            args=[
+                now, now + self.visibility_timeout, f"{self.prefix}:job:", f"{self.prefix}:params:",
+                LEASE_LAPSED_ERROR, self.ttl, f"{self.prefix}:dedup:"
+            ]
+        )
+        return job_id.decode() if job_id else None
+
+    def load(self, job_id):
+        data = self.client.get(self._job_key(job_id))
+        return json.loads(data) if data else None
+
+    def params(self, job_id):
+        data = self.client.get(self._params_key(job_id))
+        return json.loads(data) if data else {}
+
+    def save(self, job):
+        self.client.set(self._job_key(job['id']), json.dumps(job), ex=self.ttl)
+
+    def touch(self, job, key):
+        """Renew the lease of a running job and the expiry of its record, params and dedup key."""
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.zadd(self.leases_key, {job['id']: time.time() + self.visibility_timeout}, xx=True)
+        pipeline.expire(self._job_key(job['id']), self.ttl)
+        pipeline.expire(self._dedup_key(key), self.ttl)
+        pipeline.expire(self._params_key(job['id']), self.ttl)
+        pipeline.execute()
+
+    def finish(self, job, key):
+        self._finish(
+            keys=[self._dedup_key(key), self._job_key(job['id']), self.leases_key, self._params_key(job['id'])],
+            args=[job['id'], json.dumps(job), self.ttl]
+        )
+
+class JobQueue:
+    """Background jobs for long playlist operations, with pollable status.
+
+    Handlers are registered per job kind and run on worker threads (greenlets
+    under gevent). Every gunicorn worker starts them once its app is loaded,
+    so each process drains the shared queue, including jobs left by a
+    process that died; elsewhere they start with the first submission.
+    ``JOBS_BACKEND`` selects 'redis', shared by every node, or 'sqlite',
+    shared by every worker process on this node; the SQLite backend is also
+    used whenever Redis fails. Running jobs renew their lease every third of
+    ``JOBS_VISIBILITY_TIMEOUT`` seconds; a job whose lease lapses runs
+    again only if its handler was registered as ``retryable``.
+    """
+
+    def __init__(self):
+        self.workers = int(os.getenv('JOBS_WORKERS', 2))
+        self.result_ttl = int(os.getenv('JOBS_RESULT_TTL', 3600))
+        self.poll_interval = float(os.getenv('JOBS_POLL_INTERVAL', 0.5))
+        self.visibility_timeout = float(os.getenv('JOBS_VISIBILITY_TIMEOUT', 120))
+        self.local = SQLiteJobBackend(self.result_ttl, self.visibility_timeout)
+        self.backend = self.local
+        self.handlers = {}
+        self.retryable = {}
+        self._ensure_workers = PerProcess(self._start_workers)
+
+    def init_app(self, app):
+        """Select the backend from JOBS_* settings in ``app.config``."""
+        self.backend = select_backend(
+            app.config.get('JOBS_BACKEND', 'sqlite'),
+            lambda client: RedisJobBackend(client, self.result_ttl, self.visibility_timeout),
+            lambda: self.local,
+            'job queue',
+            app.config.get('JOBS_REDIS_URL')
+        ) or self.local
+
+        logger.info("Job queue using %s with %s workers per process", type(self.backend).__name__, self.workers)
+
+    def start(self):
+        """Start this process's worker threads unless they are running; call once every handler is registered."""
+        self._ensure_workers()
+
+    def handler(self, kind, retryable=True):
+        """Register ``func(job, params, report)`` as the handler for ``kind`` jobs.
+
+        Jobs of a kind that is not ``retryable`` are marked failed, not run
+        again, if their worker stops renewing the lease.
+        """
+        def decorator(func):
+            self.handlers[kind] = func
+            self.retryable[kind] = retryable
+            return func
+        return decorator
+
+    def submit(self, kind, playlist_id, criteria, owner, params=None):
+        """Queue a job, or return the identical job already queued or running for this user.
+
+        ``params`` reach the handler but are stored apart from the job
+        record, so credentials never appear in it.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'playlist_id': playlist_id,
+            'criteria': criteria,
+            'owner': owner,
+            'status': 'queued',
+            'progress': None,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+        key = dedup_key(kind, playlist_id, criteria, owner)
+        job.update(retryable=self.retryable[kind], dedup_key=key)
+
+        self._ensure_workers()
+        try:
+            job_id = self.backend.submit(job, key, params or {})
+            backend = self.backend
+        except Exception as e:
+            logger.warning("Job queue backend failed, queueing on this node: %s", e)
+            job_id = self.local.submit(job, key, params or {})
+            backend = self.local
+
+        if job_id != job['id']:
+            logger.info("Deduplicated %s job for playlist %s onto job %s", kind, playlist_id, job_id)
+        return backend.load(job_id) or job
+
+    def get(self, job_id):
+        """Full job record, or None if it does not exist or has expired."""
+        job = None
+        if self.backend is not self.local:
+            try:
+                job = self.backend.load(job_id)
+            except Exception as e:
+                logger.warning("Job queue backend failed reading job %s: %s", job_id, e)
+        return job or self.local.load(job_id)
+
+    @staticmethod
+    def public(job):
+        """The client-visible fields of a job."""
+        return {field: job.get(field) for field in PUBLIC_FIELDS}
+
+    def _start_workers(self):
+        """Start this process's worker threads; run once per process by ``_ensure_workers``."""
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True).start()
+
+    def _work(self):
+        """Worker loop: claim jobs from the shared backend, then this node's fallback queue."""
+        while True:
+            backends = [self.backend] if self.backend is self.local else [self.backend, self.local]
+            ran = False
+            for backend in backends:
+                try:
+                    job_id = backend.pop(0)
+                    job = backend.load(job_id) if job_id else None
+                except Exception as e:
+                    logger.warning("Job queue backend failed polling for jobs: %s", e)
+                    continue
+                if job:
+                    self._run(backend, job)
+                    ran = True
+            if not ran:
+                time.sleep(self.poll_interval)
+
+    def _heartbeat(self, backend, job, key, done):
+        """Renew the job's lease until ``done`` is set."""
+        while not done.wait(self.visibility_timeout / 3):
+            try:
+                backend.touch(job, key)
+            except Exception as e:
+                logger.warning("Failed to renew lease of job %s: %s", job['id'], e)
+
+    def _run(self, backend, job):
+        """Run one job, recording its progress, result or error."""
+        key = dedup_key(job['kind'], job['playlist_id'], job['criteria'], job['owner'])
+        params = backend.params(job['id'])
+        job.update(status='running', started_at=time.time())
+        backend.save(job)
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(backend, job, key, done), daemon=True).start()
+
+        def report(progress):
+            job['progress'] = progress
+            try:
+                backend.save(job)
+            except Exception as e:
+                logger.warning("Failed to record progress of job %s: %s", job['id'], e)
+
+        try:
+            logger.info("Running %s job %s for playlist %s", job['kind'], job['id'], job['playlist_id'])
+            job['result'] = self.handlers[job['kind']](job, params, report)
+            job['status'] = 'succeeded'
+        except Exception as e:
+            logger.error("Job %s failed: %s", job['id'], e, exc_info=True)
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        finally:
+            done.set()
+
+        job['finished_at'] = time.time()
+        try:
+            backend.finish(job, key)
+        except Exception as e:
+            logger.error("Failed to store result of job %s: %s", job['id'], e)
+
+job_queue = JobQueue()
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import logging
+import threading
+from app.services.sqlite_store import SQLiteStore, DATA_DIR
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, 'library_index.db')
+
+# Page size of the current_user_playlists endpoint
+PAGE_SIZE = 50
+
+def summarise(playlist):
+    """The fields of a simplified playlist object that the dashboard renders."""
+    owner = playlist.get('owner') or {}
+    return {
+        'id': playlist['id'],
+        'name': playlist.get('name') or '',
+        'images': (playlist.get('images') or [])[:1],
+        'owner': {'id': owner.get('id'), 'display_name': owner.get('display_name')},
+        'tracks': {'total': (playlist.get('tracks') or {}).get('total', 0)},
+        'snapshot_id': playlist.get('snapshot_id')
+    }
+
+class LibraryIndex(SQLiteStore):
+    """Per-user index of the playlists in a Spotify library, with each one's ``snapshot_id``.
+
+    The dashboard renders one page of the index per request with one
+    query, so its cost does not grow with the library. A sync pages
+    ``current_user_playlists`` from the top, where new playlists appear,
+    and stops at the first page whose entries are all unchanged once the
+    rest of the stored list accounts for the remaining total. Playlists
+    this app has just changed are marked stale, so a sync does not stop
+    before it reaches them. Every ``LIBRARY_FULL_SYNC_SECONDS`` a sync
+    pages the whole library to catch edits further down the list.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS library_playlists ('
+        'user_key TEXT NOT NULL, '
+        'playlist_id TEXT NOT NULL, '
+        'position INTEGER NOT NULL, '
+        'snapshot_id TEXT, '
+        'playlist TEXT NOT NULL, '
+        'PRIMARY KEY (user_key, playlist_id))',
+        'CREATE INDEX IF NOT EXISTS library_playlists_position ON library_playlists (user_key, position)',
+        'CREATE TABLE IF NOT EXISTS library_syncs ('
+        'user_key TEXT PRIMARY KEY, '
+        'total INTEGER NOT NULL, '
+        'synced_at REAL NOT NULL, '
+        'full_synced_at REAL NOT NULL)',
+    )
+
+    def __init__(self, path=None):
+        super().__init__(path or os.getenv('LIBRARY_INDEX_PATH', DEFAULT_INDEX_PATH))
+        self.sync_interval = float(os.getenv('LIBRARY_SYNC_INTERVAL', 60))
+        self.full_sync_interval = float(os.getenv('LIBRARY_FULL_SYNC_SECONDS', 3600))
+        self._syncing = set()
+        self._syncing_lock = threading.Lock()
+
+    def _read(self, sql, params):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def playlists(self, user_key, limit=None, offset=0):
+        """Up to ``limit`` of the user's indexed playlists from ``offset`` in library order, or None if never synced."""
+        try:
+            if not self._read('SELECT 1 FROM library_syncs WHERE user_key = ?', (user_key,)):
+                return None
+            # A negative LIMIT is no limit in SQLite
+            rows = self._read(
+                'SELECT playlist FROM library_playlists WHERE user_key = ? ORDER BY position LIMIT ? OFFSET ?',
+                (user_key, -1 if limit is None else limit, offset)
+            )
+        except Exception as e:
+            logger.warning("Library index read failed for %s: %s", user_key, e)
+            return None
+        return [json.loads(playlist) for playlist, in rows]
+
+    def sync_state(self, user_key):
+        """``(total, synced_at, full_synced_at)`` of the user's last sync, or None."""
+        try:
+            rows = self._read('SELECT total, synced_at, full_synced_at FROM library_syncs WHERE user_key = ?', (user_key,))
+        except Exception as e:
+            logger.warning("Library index read failed for %s: %s", user_key, e)
+            return None
+        return rows[0] if rows else None
+
+    def count(self, user_key):
+        """Number of playlists in the user's indexed library."""
+        state = self.sync_state(user_key)
+        return state[0] if state else 0
+
+    def get(self, user_key, manager, limit=None, offset=0):
+        """Up to ``limit`` of the user's playlists from ``offset``, syncing first only if the index is empty.
+
+        A stale index is still served as is and refreshed in the background.
+        ``manager`` is a ``SpotifyPlaylistManager`` on the user's client, so
+        every page goes through its governed request path.
+        """
+        playlists = self.playlists(user_key, limit, offset)
+        if playlists is None:
+            metrics.record_cache('library_index', 'miss')
+            playlists = self.sync(user_key, manager)
+            return playlists[offset:] if limit is None else playlists[offset:offset + limit]
+
+        state = self.sync_state(user_key)
+        if state and time.time() - state[1] < self.sync_interval:
+            metrics.record_cache('library_index', 'hit')
+        else:
+            metrics.record_cache('library_index', 'stale')
+            self.sync_in_background(user_key, manager)
+        return playlists
+
+    def sync_in_background(self, user_key, manager):
+        """Start a sync for the user unless this process is already running one."""
+        with self._syncing_lock:
+            if user_key in self._syncing:
+                return
+            self._syncing.add(user_key)
+        threading.Thread(target=self._background_sync, args=(user_key, manager), daemon=True).start()
+
+    def _background_sync(self, user_key, manager):
+        try:
+            self.sync(user_key, manager)
+        except Exception as e:
+            logger.warning("Background library sync for %s failed: %s", user_key, e)
+        finally:
+            with self._syncing_lock:
+                self._syncing.discard(user_key)
+
+    def sync(self, user_key, manager):
+        """Bring the user's index up to date with as few pages as possible; returns the playlists."""
+        stored = []
+        stale = set()
+        state = self.sync_state(user_key)
+        full = state is None or time.time() - state[2] >= self.full_sync_interval
+        if not full:
+            for playlist_id, snapshot_id, playlist in self._read(
+                'SELECT playlist_id, snapshot_id, playlist FROM library_playlists WHERE user_key = ? ORDER BY position',
+                (user_key,)
+            ):
+                stored.append((playlist_id, snapshot_id, playlist))
+                if snapshot_id is None:
+                    stale.add(playlist_id)
+        stored_index = {entry[0]: index for index, entry in enumerate(stored)}
+
+        fetched = []
+        fetched_ids = set()
+        changed = 0
+        tail = []
+        offset = 0
+        pages = 0
+        while True:
+            page = manager.get_user_playlists_page(offset, PAGE_SIZE)
+            pages += 1
+            items = [item for item in (page or {}).get('items', []) if item and item.get('id')]
+            total = (page or {}).get('total', 0)
+            page_unchanged = bool(items)
+            for item in items:
+                if item['id'] in fetched_ids:
+                    continue
+                index = stored_index.get(item['id'])
+                if index is None or stored[index][1] != item.get('snapshot_id'):
+                    page_unchanged = False
+                    changed += 1
+                fetched.append(summarise(item))
+                fetched_ids.add(item['id'])
+            offset += len((page or {}).get('items', []))
+
+            if not page or not page.get('next'):
+                break
+            if page_unchanged:
+                # The rest of the stored list must fill the remaining total and hold nothing stale
+                rest = stored[stored_index[items[-1]['id']] + 1:]
+                if (len(rest) == total - offset
+                        and not any(entry[0] in fetched_ids or entry[0] in stale for entry in rest)):
+                    tail = [json.loads(entry[2]) for entry in rest]
+                    break
+
+        playlists = fetched + tail
+        now = time.time()
+        self._write([
+            ('DELETE FROM library_playlists WHERE user_key = ?', (user_key,), False),
+            (
+                'INSERT INTO library_playlists (user_key, playlist_id, position, snapshot_id, playlist) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (user_key, playlist['id'], position, playlist['snapshot_id'], json.dumps(playlist))
+                    for position, playlist in enumerate(playlists)
+                ],
+                True
+            ),
+            (
+                'INSERT OR REPLACE INTO library_syncs (user_key, total, synced_at, full_synced_at) VALUES (?, ?, ?, ?)',
+                (user_key, len(playlists), now, now if full or not tail else state[2]),
+                False
+            )
+        ])
+        logger.info("Synced library of %s: %s playlists, %s changed, %s pages fetched", user_key, len(playlists), changed, pages)
+        return playlists
+
+    def mark_stale(self, user_key, playlist_id, tracks_added=0):
+        """Note that this app changed a playlist, so the next sync refetches it.
+
+        ``tracks_added`` (negative for removals) keeps the indexed track
+        count right until then.
+        """
+        if not user_key or not playlist_id:
+            return
+        try:
+            rows = self._read(
+                'SELECT playlist FROM library_playlists WHERE user_key = ? AND playlist_id = ?',
+                (user_key, playlist_id)
+            )
+            if not rows:
+                return
+            playlist = json.loads(rows[0][0])
+            playlist['tracks']['total'] = max(0, playlist['tracks']['total'] + tracks_added)
+            self._write([(
+                'UPDATE library_playlists SET snapshot_id = NULL, playlist = ? WHERE user_key = ? AND playlist_id = ?',
+                (json.dumps(playlist), user_key, playlist_id),
+                False
+            )])
+        except Exception as e:
+            logger.warning("Library index update failed for %s: %s", playlist_id, e)
+
+library_index = LibraryIndex()
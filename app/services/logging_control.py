@@ -0,0 +1,215 @@
+import os
+import sys
+import atexit
+import _queue
+import itertools
+import threading
+import logging
+from logging.handlers import QueueHandler
+from app.services.metrics import metrics
+from app.services.redis_client import PerProcess
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Per-call Spotify request logs, sampled in production mode
+UPSTREAM_LOGGER = 'app.upstream'
+
+# Loggers whose handlers are moved behind the queue; None is the root logger
+QUEUED_LOGGERS = (None, 'gunicorn.error', 'gunicorn.access')
+
+MODES = {
+    'debug': {'level': logging.DEBUG, 'sample_upstream': False, 'access_log': True},
+    'verbose': {'level': logging.INFO, 'sample_upstream': False, 'access_log': True},
+    'production': {'level': logging.INFO, 'sample_upstream': True, 'access_log': True},
+    'quiet': {'level': logging.WARNING, 'sample_upstream': True, 'access_log': False}
+}
+
+def _native(module, name):
+    """The unpatched ``module.name`` when gevent has monkey-patched it, so log I/O runs on a real OS thread."""
+    try:
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    except ImportError:
+        return getattr(__import__(module), name)
+
+class SamplingFilter(logging.Filter):
+    """Passes one in every ``interval`` records below WARNING; warnings and errors always pass."""
+
+    def __init__(self):
+        super().__init__()
+        self.interval = 1
+        self._counter = itertools.count()
+
+    def set_rate(self, rate):
+        self.interval = max(1, round(1 / rate)) if rate > 0 else 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.interval == 1:
+            return True
+        return bool(self.interval) and next(self._counter) % self.interval == 0
+
+class AsyncQueueHandler(QueueHandler):
+    """Hands records to a listener thread without formatting them in the caller.
+
+    Messages are formatted by the listener, so arguments are rendered when
+    the record is written rather than when it is logged. When ``max_size``
+    records are waiting, new ones are dropped and counted rather than
+    blocking the caller.
+    """
+
+    def __init__(self, queue, max_size):
+        super().__init__(queue)
+        self.max_size = max_size
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            metrics.inc('log_records_dropped_total')
+            return
+        self.queue.put_nowait(record)
+
+class QueueWriter:
+    """Writes queued records to the original handlers on a native thread."""
+
+    def __init__(self, handlers):
+        # The C SimpleQueue uses native locks, so greenlets and the OS thread can share it
+        self.queue = _queue.SimpleQueue()
+        self.handlers = handlers
+        self._done = _native('_thread', 'allocate_lock')()
+
+    def start(self):
+        self._done.acquire()
+        _native('_thread', 'start_new_thread')(self._run, ())
+
+    def _run(self):
+        try:
+            while True:
+                record = self.queue.get()
+                if record is None:
+                    return
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+        finally:
+            self._done.release()
+
+    def stop(self, timeout=5.0):
+        """Write what is queued and stop the thread."""
+        self.queue.put(None)
+        if self._done.acquire(timeout=timeout):
+            self._done.release()
+
+class LoggingControl:
+    """Process logging: queued output, a runtime-switchable mode and upstream log sampling.
+
+    Handlers of the root and gunicorn loggers are moved behind a queue that
+    a native thread drains, so request greenlets never wait on log I/O.
+    The mode is read from ``LOG_MODE_FILE`` every ``LOG_MODE_POLL_INTERVAL``
+    seconds, falling back to ``LOG_MODE``; writing 'debug', 'verbose',
+    'production' or 'quiet' to that file switches every worker without a
+    restart. Production mode keeps one in ``1/LOG_UPSTREAM_SAMPLE_RATE``
+    per-call upstream log lines.
+    """
+
+    def __init__(self):
+        self.default_mode = os.getenv('LOG_MODE', 'verbose')
+        self.mode_file = os.getenv('LOG_MODE_FILE', os.path.join('data', 'log_mode'))
+        self.poll_interval = float(os.getenv('LOG_MODE_POLL_INTERVAL', 5))
+        self.queue_size = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+        self.sample_rate = float(os.getenv('LOG_UPSTREAM_SAMPLE_RATE', 0.01))
+        self.mode = None
+        self.sampler = SamplingFilter()
+        self.writers = []
+        self._handlers = {}
+        self._configured = PerProcess(self._configure)
+        self._mode_mtime = None
+        self._stopped = threading.Event()
+
+    def configure(self):
+        """Queue this process's log output and apply the current mode, once per process."""
+        self._configured()
+
+    def _configure(self):
+        """Move log handlers behind queues and start the mode watcher; run once per process by ``configure``."""
+        root = logging.getLogger()
+        if not root.handlers and None not in self._handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            root.addHandler(handler)
+
+        # Writer threads do not survive a fork, so each process starts its own
+        self.writers = []
+        for name in QUEUED_LOGGERS:
+            target = logging.getLogger(name)
+            handlers = self._handlers.get(name)
+            if handlers is None:
+                handlers = self._handlers[name] = [
+                    handler for handler in target.handlers if not isinstance(handler, AsyncQueueHandler)
+                ]
+            if not handlers:
+                continue
+            writer = QueueWriter(handlers)
+            writer.start()
+            self.writers.append(writer)
+            target.handlers = [AsyncQueueHandler(writer.queue, self.queue_size)]
+
+        upstream = logging.getLogger(UPSTREAM_LOGGER)
+        if self.sampler not in upstream.filters:
+            upstream.addFilter(self.sampler)
+
+        self._mode_mtime = None
+        self.refresh()
+        threading.Thread(target=self._watch, name='log-mode-watcher', daemon=True).start()
+        if self._configured.pid is None:
+            atexit.register(self.stop)
+
+    def apply(self, mode):
+        """Switch this process to ``mode``."""
+        settings = MODES.get(mode)
+        if settings is None:
+            logger.warning("Unknown log mode %r, using %s", mode, self.default_mode)
+            mode = self.default_mode if self.default_mode in MODES else 'verbose'
+            settings = MODES[mode]
+
+        logging.getLogger().setLevel(settings['level'])
+        self.sampler.set_rate(self.sample_rate if settings['sample_upstream'] else 1.0)
+        logging.getLogger('gunicorn.access').setLevel(logging.INFO if settings['access_log'] else logging.WARNING)
+        if mode != self.mode:
+            logger.warning("Log mode set to %s", mode)
+        self.mode = mode
+
+    def refresh(self):
+        """Apply the mode file if it changed since it was last read."""
+        try:
+            mtime = os.stat(self.mode_file).st_mtime
+        except OSError:
+            mtime = None
+
+        if mtime == self._mode_mtime and self.mode is not None:
+            return
+        self._mode_mtime = mtime
+
+        mode = self.default_mode
+        if mtime is not None:
+            try:
+                with open(self.mode_file) as f:
+                    mode = f.read().strip().lower() or self.default_mode
+            except OSError as e:
+                logger.warning("Could not read log mode file %s: %s", self.mode_file, e)
+        self.apply(mode)
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            self.refresh()
+
+    def stop(self):
+        """Flush queued records; called at exit."""
+        self._stopped.set()
+        for writer in self.writers:
+            writer.stop()
+
+log_control = LoggingControl()
@@ -0,0 +1,281 @@
+import os
+import json
+import math
+import threading
+import logging
+from bisect import bisect_left
+from app.services.redis_client import select_backend, Lazy, PerProcess
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Every metric the app records: name -> (type, help)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Time to produce a response, by route, method and status.'),
+    'spotify_requests_total': ('counter', 'Spotify API calls by spotipy method and HTTP status.'),
+    'spotify_request_duration_seconds': ('histogram', 'Spotify API call latency by spotipy method and HTTP status.'),
+    'spotify_retries_total': ('counter', 'Spotify API calls retried, by spotipy method and reason.'),
+    'spotify_rate_limited_total': ('counter', 'Spotify 429 responses.'),
+    'spotify_wait_seconds_total': ('counter', 'Seconds slept before or between Spotify API calls, by reason.'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result.'),
+    'rate_limiter_rejections_total': ('counter', 'Requests rejected by the API rate limiter, by endpoint.'),
+    'log_records_dropped_total': ('counter', 'Log records dropped because the log queue was full.')
+}
+
+# Cache results that count as served from the cache
+HIT_RESULTS = ('hit', 'stale', 'coalesced')
+
+def _series_key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+def merge_snapshots(snapshots):
+    """Sum per-worker snapshots; every series is a counter or histogram, so they add up."""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for key, value in snapshot.get('counters', {}).items():
+            counters[key] = counters.get(key, 0.0) + value
+        for key, values in snapshot.get('histograms', {}).items():
+            total = histograms.get(key)
+            histograms[key] = list(values) if total is None else [a + b for a, b in zip(total, values)]
+    return {'counters': counters, 'histograms': histograms}
+
+class FileMetricsStore:
+    """Per-worker snapshots in a directory shared by the workers on a node.
+
+    Each worker replaces its own ``<pid>.json``; a scrape sums every file,
+    including those of workers that have exited so counters never go back.
+    The directory is cleared when the gunicorn master starts.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def publish(self, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        snapshots = []
+        if not os.path.isdir(self.directory):
+            return snapshots
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable metrics file %s: %s", filename, e)
+        return snapshots
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json') or filename.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, filename))
+
+class RedisMetricsStore:
+    """Totals across every worker on every node, kept in one Redis hash.
+
+    Workers add what they recorded since their last publish with
+    HINCRBYFLOAT, so any worker can serve a scrape of the cluster totals.
+    """
+
+    def __init__(self, client, key='metrics'):
+        self.client = client
+        self.key = key
+        self._published = {'counters': {}, 'histograms': {}}
+
+    def publish(self, snapshot):
+        pipeline = self.client.pipeline(transaction=False)
+        pending = False
+        for key, value in snapshot['counters'].items():
+            delta = value - self._published['counters'].get(key, 0.0)
+            if delta:
+                pipeline.hincrbyfloat(self.key, f"c{key}", delta)
+                pending = True
+        for key, values in snapshot['histograms'].items():
+            previous = self._published['histograms'].get(key) or [0.0] * len(values)
+            for index, (value, before) in enumerate(zip(values, previous)):
+                if value != before:
+                    pipeline.hincrbyfloat(self.key, f"h{index}:{key}", value - before)
+                    pending = True
+        if pending:
+            pipeline.execute()
+        self._published = snapshot
+
+    def collect(self):
+        counters, histograms = {}, {}
+        for field, value in self.client.hgetall(self.key).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field.startswith('c'):
+                counters[field[1:]] = float(value)
+            else:
+                index, key = field[1:].split(':', 1)
+                values = histograms.setdefault(key, [0.0] * (len(DEFAULT_BUCKETS) + 2))
+                values[int(index)] = float(value)
+        return [{'counters': counters, 'histograms': histograms}]
+
+    def clear(self):
+        self.client.delete(self.key)
+
+class Metrics:
+    """Counters and latency histograms exposed in the Prometheus text format.
+
+    Recording only touches this worker's memory. A background publisher
+    shares the totals every ``METRICS_PUBLISH_INTERVAL`` seconds, and again
+    on each scrape, through the store chosen by ``METRICS_BACKEND``: 'file'
+    (per-worker snapshots in ``METRICS_DIR``, summed across the node),
+    'redis' (cluster-wide totals) or 'none' (this worker only).
+    """
+
+    def __init__(self):
+        self.backend_name = os.getenv('METRICS_BACKEND', 'file')
+        self.directory = os.getenv('METRICS_DIR', os.path.join('data', 'metrics'))
+        self.publish_interval = float(os.getenv('METRICS_PUBLISH_INTERVAL', 10))
+        self.counters = {}
+        self.histograms = {}
+        self._store = Lazy(self._select_store)
+        self._ensure_publisher = PerProcess(self._start_publisher)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def store(self):
+        """Lazily selected shared store, or None when metrics are per worker."""
+        return self._store.get()
+
+    def _select_store(self):
+        return select_backend(self.backend_name, RedisMetricsStore, lambda: FileMetricsStore(self.directory), 'metrics store')
+
+    def inc(self, name, amount=1.0, **labels):
+        """Add ``amount`` to a counter."""
+        key = _series_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + amount
+        self._ensure_publisher()
+
+    def observe(self, name, seconds, **labels):
+        """Record one observation in a latency histogram."""
+        key = _series_key(name, labels)
+        bucket = bisect_left(DEFAULT_BUCKETS, seconds)
+        with self._lock:
+            values = self.histograms.get(key)
+            if values is None:
+                # One count per bucket plus +Inf, then the sum
+                values = self.histograms[key] = [0.0] * (len(DEFAULT_BUCKETS) + 2)
+            values[bucket] += 1
+            values[-1] += seconds
+        self._ensure_publisher()
+
+    def record_upstream(self, method, status, seconds):
+        """Count one Spotify API call and its latency."""
+        self.inc('spotify_requests_total', method=method, status=status)
+        self.observe('spotify_request_duration_seconds', seconds, method=method, status=status)
+
+    def record_cache(self, cache, result, count=1):
+        """Count ``count`` lookups of ``cache`` with the given result."""
+        if count:
+            self.inc('cache_requests_total', count, cache=cache, result=result)
+
+    def snapshot(self):
+        """This worker's totals."""
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {key: list(values) for key, values in self.histograms.items()}
+            }
+
+    def publish(self):
+        """Share this worker's totals through the store."""
+        store = self.store
+        if store is None:
+            return
+        try:
+            store.publish(self.snapshot())
+        except Exception as e:
+            logger.warning("Failed to publish metrics: %s", e)
+
+    def collect(self):
+        """Totals across every worker sharing the store."""
+        store = self.store
+        if store is None:
+            return self.snapshot()
+        self.publish()
+        try:
+            return merge_snapshots(store.collect())
+        except Exception as e:
+            logger.warning("Failed to collect metrics from other workers, reporting this worker only: %s", e)
+            return self.snapshot()
+
+    def clear(self):
+        """Remove shared totals; called once when the server starts."""
+        store = self.store
+        if store is not None:
+            store.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        totals = self.collect()
+        series = {}
+        for kind in ('counters', 'histograms'):
+            for key, value in totals[kind].items():
+                name, labels = json.loads(key)
+                series.setdefault(name, []).append(([tuple(pair) for pair in labels], value))
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series.get(name, [])):
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(DEFAULT_BUCKETS + (math.inf,), value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+
+        lines.append("# HELP cache_hit_ratio Share of cache lookups served from the cache.")
+        lines.append("# TYPE cache_hit_ratio gauge")
+        lookups = {}
+        for labels, value in series.get('cache_requests_total', []):
+            labels = dict(labels)
+            hits, total = lookups.get(labels.get('cache'), (0.0, 0.0))
+            lookups[labels.get('cache')] = (hits + (value if labels.get('result') in HIT_RESULTS else 0.0), total + value)
+        for cache, (hits, total) in sorted(lookups.items()):
+            lines.append(f"cache_hit_ratio{_format_labels([('cache', cache)])} {_format_value(hits / total if total else 0.0)}")
+        return '\n'.join(lines) + '\n'
+
+    def _start_publisher(self):
+        """Start this process's background publisher; run once per process by ``_ensure_publisher``."""
+        threading.Thread(target=self._publish_loop, name='metrics-publisher', daemon=True).start()
+
+    def _publish_loop(self):
+        while not self._stopped.wait(self.publish_interval):
+            self.publish()
+
+metrics = Metrics()
@@ -0,0 +1,39 @@
+# Field projections for Spotify requests. Each consumer names the fields it
+# reads here, so every ``playlist`` and ``playlist_tracks`` request asks for
+# the smallest payload that serves it. The ``tracks`` and ``audio-features``
+# endpoints take no ``fields`` parameter, so they cannot be narrowed.
+
+# Track fields read by each consumer of playlist items
+TRACK_FIELDS = {
+    # Track IDs only, e.g. to diff a playlist against cached analysis rows
+    'id': 'id',
+    # Removal criteria evaluated against popularity and audio features
+    'evaluation': 'id,name,popularity,artists(name)',
+    # Per-track analysis rows
+    'analysis': 'id,name,uri,popularity,duration_ms,explicit,preview_url,external_ids(isrc),artists(name),album(name,release_date,album_type)',
+    # Public track listing
+    'listing': 'id,name,artists(name),album(name,images),duration_ms,preview_url'
+}
+
+# Playlist object fields read by each consumer
+PLAYLIST_FIELDS = {
+    'snapshot': 'name,snapshot_id',
+    'verify': 'id',
+    'info': 'id,name,owner(id,display_name),images,tracks.total,description,public,collaborative',
+    'details': 'id,name,description,images,owner(id,display_name),followers.total,tracks.total'
+}
+
+# Paging fields the page fetcher relies on
+PAGING_FIELDS = 'total,next'
+
+def playlist_items(projection, added_at=False, paging=True):
+    """``fields`` value for playlist item pages carrying the named track projection."""
+    item_fields = f"track({TRACK_FIELDS[projection]})"
+    if added_at:
+        item_fields = f"added_at,{item_fields}"
+    fields = f"items({item_fields})"
+    return f"{fields},{PAGING_FIELDS}" if paging else fields
+
+def playlist(projection):
+    """``fields`` value for a playlist object request."""
+    return PLAYLIST_FIELDS[projection]
@@ -0,0 +1,201 @@
+import os
+import struct
+import threading
+import time
+import logging
+from app.services.redis_client import select_backend, Lazy
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class RedisQuotaGovernor:
+    """Cluster-wide token bucket for upstream Spotify calls, kept in Redis.
+
+    Every worker on every node takes its tokens from the same bucket, and a
+    429 seen by any worker pauses all of them until the largest Retry-After
+    reported so far has passed. Redis server time is used so worker clocks
+    do not need to agree.
+    """
+
+    ACQUIRE_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local blocked = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if now < blocked then
+        return tostring(blocked - now)
+    end
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens < 1 then
+        wait = (1 - tokens) / rate
+    else
+        tokens = tokens - 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], 300)
+    return tostring(wait)
+    """
+
+    THROTTLE_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local blocked_until = now + tonumber(ARGV[1])
+    local blocked = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if blocked_until > blocked then
+        redis.call('SET', KEYS[1], tostring(blocked_until), 'EX', math.ceil(tonumber(ARGV[1])) + 1)
+    end
+    return tostring(math.max(blocked_until, blocked) - now)
+    """
+
+    def __init__(self, client, rate, burst, prefix='spotify:quota'):
+        self.rate = rate
+        self.burst = burst
+        self.keys = [f"{prefix}:{{bucket}}", f"{prefix}:{{bucket}}:blocked_until"]
+        self._acquire = client.register_script(self.ACQUIRE_SCRIPT)
+        self._throttle = client.register_script(self.THROTTLE_SCRIPT)
+
+    def try_acquire(self):
+        """Take a token if one is available, otherwise return the seconds to wait."""
+        return float(self._acquire(keys=self.keys, args=[self.rate, self.burst]))
+
+    def report_throttle(self, retry_after):
+        """Pause every worker until at least ``retry_after`` seconds from now."""
+        return float(self._throttle(keys=self.keys[1:], args=[retry_after]))
+
+class FileQuotaGovernor:
+    """Node-local stand-in for the Redis governor using a file lock.
+
+    The bucket state (tokens, last refill, paused-until) is three doubles in
+    a small file that every worker on the node updates under ``flock``.
+    Threads of one worker share its descriptor, which ``flock`` does not
+    tell apart, so they also take a process-local lock first.
+    """
+
+    STATE = struct.Struct('ddd')
+
+    def __init__(self, path, rate, burst):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _file(self):
+        """Return this process's descriptor for the state file, reopening it after a fork."""
+        if self._fd is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    def _update(self, update):
+        """Apply ``update(now, tokens, ts, blocked)`` to the shared state under an exclusive lock."""
+        with self._lock:
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                data = os.pread(fd, self.STATE.size, 0)
+                if len(data) == self.STATE.size:
+                    tokens, ts, blocked = self.STATE.unpack(data)
+                else:
+                    tokens, ts, blocked = self.burst, now, 0.0
+                result, state = update(now, tokens, ts, blocked)
+                os.pwrite(fd, self.STATE.pack(*state), 0)
+                return result
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def try_acquire(self):
+        """Take a token if one is available, otherwise return the seconds to wait."""
+        def update(now, tokens, ts, blocked):
+            if now < blocked:
+                return blocked - now, (tokens, ts, blocked)
+            tokens = min(self.burst, tokens + max(0.0, now - ts) * self.rate)
+            if tokens < 1:
+                return (1 - tokens) / self.rate, (tokens, now, blocked)
+            return 0.0, (tokens - 1, now, blocked)
+        return self._update(update)
+
+    def report_throttle(self, retry_after):
+        """Pause every worker on the node until at least ``retry_after`` seconds from now."""
+        def update(now, tokens, ts, blocked):
+            blocked = max(blocked, now + retry_after)
+            return blocked - now, (tokens, ts, blocked)
+        return self._update(update)
+
+class QuotaGovernor:
+    """Outbound Spotify quota shared by all gunicorn workers.
+
+    ``SPOTIFY_QUOTA_BACKEND`` selects 'redis' (cluster-wide), 'file'
+    (node-wide) or 'none'. The default uses Redis when ``REDIS_URL`` is
+    reachable and the file lock otherwise. ``SPOTIFY_CLUSTER_RPS`` is the
+    steady request rate allowed across all workers together.
+    """
+
+    def __init__(self):
+        self.rate = float(os.getenv('SPOTIFY_CLUSTER_RPS', 25))
+        self.burst = float(os.getenv('SPOTIFY_CLUSTER_BURST', self.rate))
+        self.backend_name = os.getenv('SPOTIFY_QUOTA_BACKEND', 'auto')
+        self._backend = Lazy(self._select_backend)
+
+    @property
+    def backend(self):
+        """Lazily selected backend, or None when the governor is disabled."""
+        return self._backend.get()
+
+    def _select_backend(self):
+        return select_backend(self.backend_name, self._redis_backend, self._file_backend, 'quota governor')
+
+    def _redis_backend(self, client):
+        logger.info("Using Redis quota governor at %s requests/s", self.rate)
+        return RedisQuotaGovernor(client, self.rate, self.burst)
+
+    def _file_backend(self):
+        if fcntl is None:
+            logger.warning("File quota governor unavailable on this platform, outbound quota is per worker")
+            return None
+
+        path = os.getenv('SPOTIFY_QUOTA_FILE', os.path.join('data', 'spotify_quota.state'))
+        logger.info("Using file quota governor at %s requests/s", self.rate)
+        return FileQuotaGovernor(path, self.rate, self.burst)
+
+    def acquire(self):
+        """Block until the shared quota allows a request and return the time spent waiting."""
+        backend = self.backend
+        waited = 0.0
+        while backend is not None:
+            try:
+                delay = backend.try_acquire()
+            except Exception as e:
+                logger.warning("Quota governor unavailable, proceeding without it: %s", e)
+                break
+            if delay <= 0:
+                break
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    def report_throttle(self, retry_after):
+        """Share a 429's Retry-After with every other worker."""
+        backend = self.backend
+        if backend is None:
+            return
+        try:
+            backend.report_throttle(retry_after)
+        except Exception as e:
+            logger.warning("Failed to share rate limit with other workers: %s", e)
+
+quota_governor = QuotaGovernor()
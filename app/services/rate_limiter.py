@@ -1,32 +1,139 @@
-from datetime import datetime, timedelta
+import os
+import time
+import threading
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
 import logging
+from app.services.redis_client import get_redis
+from app.services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+class LocalRateLimiter:
+    """In-process sliding-window counter with fixed-size state per key.
+
+    Each key keeps only the current and previous window counts; the
+    previous count is weighted by how much of it still overlaps the
+    sliding window. Keys are kept in least-recently-used order so idle
+    ones are evicted from the front in amortised O(1).
+    """
+
+    def __init__(self, max_requests, window_seconds, max_keys=100000):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.counters = OrderedDict()  # key -> [window index, current count, previous count]
+        self._lock = threading.Lock()
+
+    def is_rate_limited(self, key):
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed = (now % self.window_seconds) / self.window_seconds
+
+        with self._lock:
+            entry = self.counters.get(key)
+            if entry is None:
+                entry = [window, 0, 0]
+                self.counters[key] = entry
+            else:
+                if entry[0] != window:
+                    entry[2] = entry[1] if entry[0] == window - 1 else 0
+                    entry[1] = 0
+                    entry[0] = window
+                self.counters.move_to_end(key)
+
+            self._evict_idle(window)
+
+            if entry[2] * (1 - elapsed) + entry[1] >= self.max_requests:
+                return True
+
+            entry[1] += 1
+            return False
+
+    def _evict_idle(self, window):
+        """Drop keys with no requests in the last two windows, plus any over the size cap."""
+        while self.counters:
+            oldest = next(iter(self.counters.values()))
+            if oldest[0] >= window - 1 and len(self.counters) <= self.max_keys:
+                break
+            self.counters.popitem(last=False)
+
+class RedisRateLimiter:
+    """Sliding-window counter in Redis, shared by every gunicorn worker.
+
+    Each key uses two integer counters (current and previous window) that
+    expire on their own, so memory per key is O(1). The check and the
+    increment run atomically in a Lua script.
+    """
+
+    SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if previous * tonumber(ARGV[2]) + current >= tonumber(ARGV[1]) then
+        return 1
+    end
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 0
+    """
+
+    def __init__(self, client, max_requests, window_seconds, prefix='ratelimit'):
+        self.client = client
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    def is_rate_limited(self, key):
+        now = time.time()
+        window = int(now // self.window_seconds)
+        weight = 1 - (now % self.window_seconds) / self.window_seconds
+        # The hash tag keeps both windows of a key on the same cluster slot
+        current_key = f"{self.prefix}:{{{key}}}:{window}"
+        previous_key = f"{self.prefix}:{{{key}}}:{window - 1}"
+        limited = self._script(
+            keys=[current_key, previous_key],
+            args=[self.max_requests, weight, self.window_seconds * 2]
+        )
+        return bool(limited)
+
 class RateLimiter:
+    """Rate limiter whose backend ('memory' or 'redis') is selected from app config.
+
+    The Redis backend enforces one limit across all workers. If Redis is not
+    configured, unreachable or fails mid-request, the in-process backend is
+    used so requests are still limited per worker.
+    """
+
     def __init__(self):
-        self.requests = {}
-        self.WINDOW_SIZE = timedelta(minutes=1)
-        self.MAX_REQUESTS = 100  # Adjust based on Spotify API limits
+        self.WINDOW_SIZE = int(os.getenv('RATE_LIMIT_WINDOW_SECONDS', 60))
+        self.MAX_REQUESTS = int(os.getenv('RATE_LIMIT_MAX_REQUESTS', 100))  # Adjust based on Spotify API limits
+        self.local = LocalRateLimiter(self.MAX_REQUESTS, self.WINDOW_SIZE)
+        self.backend = self.local
+
+    def init_app(self, app):
+        """Configure limits and backend from RATE_LIMIT_* settings in ``app.config``."""
+        self.WINDOW_SIZE = int(app.config.get('RATE_LIMIT_WINDOW_SECONDS', self.WINDOW_SIZE))
+        self.MAX_REQUESTS = int(app.config.get('RATE_LIMIT_MAX_REQUESTS', self.MAX_REQUESTS))
+        self.local = LocalRateLimiter(self.MAX_REQUESTS, self.WINDOW_SIZE)
+        self.backend = self.local
+
+        if app.config.get('RATE_LIMIT_BACKEND', 'memory') == 'redis':
+            client = get_redis(app.config.get('RATE_LIMIT_REDIS_URL'))
+            if client is not None:
+                self.backend = RedisRateLimiter(client, self.MAX_REQUESTS, self.WINDOW_SIZE)
+            else:
+                logger.warning("Redis rate limiter requested but Redis is unavailable, using in-process limiter")
+
+        logger.info("Rate limiter using %s (%s requests per %ss)", type(self.backend).__name__, self.MAX_REQUESTS, self.WINDOW_SIZE)
 
     def is_rate_limited(self, key):
-        now = datetime.now()
-        if key not in self.requests:
-            self.requests[key] = []
-        
-       
-        self.requests[key] = [time for time in self.requests[key] 
-                            if now - time < self.WINDOW_SIZE]
-        
-        
-        if len(self.requests[key]) >= self.MAX_REQUESTS:
-            return True
-        
-       
-        self.requests[key].append(now)
-        return False
+        try:
+            return self.backend.is_rate_limited(key)
+        except Exception as e:
+            logger.warning("Rate limiter backend failed, using in-process limiter: %s", e)
+            return self.local.is_rate_limited(key)
 
 rate_limiter = RateLimiter()
 
@@ -34,10 +141,11 @@ def rate_limit(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if rate_limiter.is_rate_limited(request.remote_addr):
-            logger.warning(f"Rate limit exceeded for IP {request.remote_addr}")
+            logger.warning("Rate limit exceeded for IP %s", request.remote_addr)
+            metrics.inc('rate_limiter_rejections_total', endpoint=request.endpoint or 'unknown')
             return jsonify({
                 'error': 'Rate limit exceeded. Please try again later.',
-                'retry_after': 60
+                'retry_after': rate_limiter.WINDOW_SIZE
             }), 429
         return f(*args, **kwargs)
     return decorated_function
@@ -0,0 +1,81 @@
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_lock = threading.Lock()
+
+def get_redis(url=None):
+    """Return a shared Redis client for ``url`` (default ``REDIS_URL``), or None if unavailable."""
+    url = url or os.getenv('REDIS_URL')
+    if not url:
+        return None
+
+    with _lock:
+        if url in _clients:
+            return _clients[url]
+
+        try:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            client.ping()
+            logger.info("Connected to Redis")
+        except Exception as e:
+            logger.warning("Redis unavailable, using in-process fallbacks: %s", e)
+            client = None
+
+        _clients[url] = client
+        return client
+
+def select_backend(name, build, fallback, description, url=None):
+    """Backend chosen by a ``*_BACKEND`` setting shared by the coordination services.
+
+    'auto' and 'redis' give ``build(client)`` when Redis is reachable, any
+    other name gives ``fallback()``, and 'none' gives None. Asking for
+    'redis' explicitly logs a warning when it has to fall back.
+    """
+    if name == 'none':
+        return None
+
+    if name in ('auto', 'redis'):
+        client = get_redis(url)
+        if client is not None:
+            return build(client)
+        if name == 'redis':
+            logger.warning("Redis %s requested but Redis is unavailable, using the node-local fallback", description)
+    return fallback()
+
+_UNSET = object()
+
+class Lazy:
+    """Value built by ``factory()`` on first use, once, however many threads ask at the same time."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = _UNSET
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    self._value = self.factory()
+        return self._value
+
+class PerProcess:
+    """Calls ``start()`` once per process, so background threads are started again after a fork."""
+
+    def __init__(self, start):
+        self.start = start
+        self.pid = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if self.pid == os.getpid():
+            return
+        with self._lock:
+            if self.pid != os.getpid():
+                self.start()
+                self.pid = os.getpid()
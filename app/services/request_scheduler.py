@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+import logging
+from app.services.quota_governor import quota_governor
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of IDs Spotify accepts per request for each batched endpoint
+MAX_BATCH_SIZES = {
+    'audio_features': 100,
+    'tracks': 50,
+    'playlist_items': 100
+}
+
+class RequestScheduler:
+    """Adaptive token bucket shared by every outbound Spotify API call in a worker.
+
+    Requests go out at ``max_rate`` until Spotify answers with a 429. Each
+    throttle halves the refill rate and the batch sizes and pauses the bucket
+    for the ``Retry-After`` period; every successful call then grows them back
+    additively until they reach the configured rate and the API maximums.
+
+    Every request also takes a token from the shared quota governor, and
+    throttles are reported to it so all workers pause together.
+    """
+
+    def __init__(self, max_rate=None, burst=None, min_rate=0.5):
+        self.max_rate = float(max_rate or os.getenv('SPOTIFY_MAX_RPS', 20))
+        self.burst = float(burst or os.getenv('SPOTIFY_BURST', self.max_rate))
+        self.min_rate = min_rate
+        self.rate = self.max_rate
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.default_backoff = 1.0
+        self.batch_sizes = dict(MAX_BATCH_SIZES)
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Add the tokens accrued since the last refill."""
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+
+    def acquire(self):
+        """Block until a request may be sent and return the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                    reason = 'throttled'
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    delay = (1 - self.tokens) / self.rate
+                    reason = 'pacing'
+            time.sleep(delay)
+            metrics.inc('spotify_wait_seconds_total', delay, reason=reason)
+            waited += delay
+
+        quota_waited = quota_governor.acquire()
+        if quota_waited:
+            metrics.inc('spotify_wait_seconds_total', quota_waited, reason='quota')
+        return waited + quota_waited
+
+    def record_success(self):
+        """Grow the rate and batch sizes back towards their maximums."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+            self.default_backoff = 1.0
+            for kind, maximum in MAX_BATCH_SIZES.items():
+                if self.batch_sizes[kind] < maximum:
+                    self.batch_sizes[kind] = min(maximum, self.batch_sizes[kind] + max(1, maximum // 10))
+
+    def record_throttle(self, retry_after=None):
+        """Back off after a 429, honouring the Retry-After header when present."""
+        metrics.inc('spotify_rate_limited_total')
+        with self._lock:
+            if retry_after is None:
+                retry_after = self.default_backoff
+                self.default_backoff = min(self.default_backoff * 2, 32)
+
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + retry_after)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.last_refill = self.paused_until
+            for kind, maximum in MAX_BATCH_SIZES.items():
+                self.batch_sizes[kind] = max(maximum // 10, self.batch_sizes[kind] // 2)
+
+        quota_governor.report_throttle(retry_after)
+        logger.warning("Spotify rate limit hit, pausing outbound requests for %s seconds (rate now %.1f/s)", retry_after, self.rate)
+
+    def batch_size(self, kind):
+        """Current batch size for a batched endpoint."""
+        return self.batch_sizes.get(kind, MAX_BATCH_SIZES.get(kind, 50))
+
+    def stats(self):
+        """Snapshot of the scheduler state."""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'max_rate': self.max_rate,
+                'tokens': self.tokens,
+                'paused_for': max(0.0, self.paused_until - time.monotonic()),
+                'batch_sizes': dict(self.batch_sizes)
+            }
+
+request_scheduler = RequestScheduler()
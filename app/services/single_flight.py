@@ -0,0 +1,101 @@
+import copy
+import threading
+import logging
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# spotipy methods that only read, so identical concurrent calls can share one response
+COALESCED_METHODS = frozenset([
+    'playlist',
+    'playlist_tracks',
+    'playlist_items',
+    'track',
+    'tracks',
+    'audio_features',
+    'artist',
+    'artists',
+    'categories',
+    'category_playlists',
+    'search',
+    'recommendations',
+    'current_user',
+    'current_user_playlists',
+    'current_user_recently_played',
+    'user_playlists'
+])
+
+class _Call:
+    """One in-flight call and the outcome shared with its waiters."""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Merges identical concurrent calls into one execution.
+
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait for it and receive their own copy of its result, or the
+    same exception. Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+
+    def do(self, key, fn):
+        """Return ``fn()``, sharing the execution with identical in-flight calls for ``key``."""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                call.waiters += 1
+
+        metrics.record_cache('coalescing', 'executed' if leader else 'coalesced')
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn()
+            call.result = result
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            if waiters and call.error is None:
+                # Waiters copy from a snapshot the leader's caller cannot mutate
+                call.result = copy.deepcopy(call.result)
+            call.event.set()
+
+    def stats(self):
+        """Calls made, upstream executions and the share of calls that were coalesced."""
+        calls = self.calls
+        coalesced = calls - self.executions
+        return {
+            'calls': calls,
+            'executions': self.executions,
+            'coalesced': coalesced,
+            'coalescing_ratio': coalesced / calls if calls else 0.0,
+            'in_flight': len(self._calls)
+        }
+
+upstream_requests = SingleFlight()
@@ -1,13 +1,15 @@
 import os
-from spotipy import Spotify, SpotifyException
+from spotipy import SpotifyException
 from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
 from flask import session, redirect, url_for
 from functools import wraps
 import logging
 from datetime import datetime
-import requests
-import base64
+import hashlib
 import json
+from app.services.client_pool import client_pool, GUEST_KEY
+from app.services.http_pool import http_pool
+from app.services.guest_token import guest_tokens, request_guest_token
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +35,6 @@ class SpotifyService:
         )
         self._oauth = None  # Cache the OAuth instance
         self._client_credentials = None  # Cache client credentials
-        self._guest_token = None  # Cache guest token
-        self._guest_token_expiry = None  # Track guest token expiry
 
     def create_oauth(self):
         """Create SpotifyOAuth instance with caching."""
@@ -52,11 +52,12 @@ class SpotifyService:
                 scope=self.scope,
                 cache_handler=None,
                 open_browser=False,
-                show_dialog=True
+                show_dialog=True,
+                requests_session=http_pool.session
             )
             return self._oauth
         except Exception as e:
-            logger.error(f"Error creating OAuth: {str(e)}")
+            logger.error("Error creating OAuth: %s", e)
             raise SpotifyAuthError("Failed to initialize Spotify OAuth")
             
     def create_client_credentials(self):
@@ -70,72 +71,38 @@ class SpotifyService:
         try:
             self._client_credentials = SpotifyClientCredentials(
                 client_id=self.client_id,
-                client_secret=self.client_secret
+                client_secret=self.client_secret,
+                requests_session=http_pool.session
             )
             return self._client_credentials
         except Exception as e:
-            logger.error(f"Error creating Client Credentials: {str(e)}")
+            logger.error("Error creating Client Credentials: %s", e)
             raise SpotifyAuthError("Failed to initialize Spotify Client Credentials")
             
     def get_guest_token(self):
         """Get a client credentials token for public access without user authentication."""
-        # Check if we already have a valid cached token
-        now = datetime.now().timestamp()
-        if self._guest_token and self._guest_token_expiry and now < self._guest_token_expiry:
-            return self._guest_token
-            
-        try:
-            # Get token using Client Credentials Flow
-            credentials_manager = self.create_client_credentials()
-            token_info = credentials_manager.get_access_token()
-            
-            if token_info:
-                self._guest_token = token_info
-                # Set expiry time (subtract 60 seconds for safety margin)
-                self._guest_token_expiry = now + token_info['expires_in'] - 60
-                return self._guest_token
-            return None
-        except Exception as e:
-            logger.error(f"Error getting guest token: {str(e)}")
-            return None
+        return guest_tokens.get_token()
     
-    # Alternative implementation using direct API call if spotipy's implementation has issues
+    # Bypasses the shared guest token, e.g. to check the credentials directly
     def get_guest_token_direct(self):
         """Get a client credentials token by directly calling the Spotify API."""
-        now = datetime.now().timestamp()
-        if self._guest_token and self._guest_token_expiry and now < self._guest_token_expiry:
-            return self._guest_token
-            
         try:
-            auth_header = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
-            headers = {
-                "Authorization": f"Basic {auth_header}",
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
-            data = {"grant_type": "client_credentials"}
-            
-            response = requests.post("https://accounts.spotify.com/api/token", headers=headers, data=data)
-            
-            if response.status_code == 200:
-                token_info = response.json()
-                self._guest_token = token_info["access_token"]
-                self._guest_token_expiry = now + token_info["expires_in"] - 60
-                return self._guest_token
-            return None
+            return request_guest_token()['access_token']
         except Exception as e:
-            logger.error(f"Error getting guest token directly: {str(e)}")
+            logger.error("Error getting guest token directly: %s", e)
             return None
             
     def get_public_client(self):
-        """Get a Spotify client for public access (no user auth)."""
+        """Get the pooled Spotify client for public access (no user auth)."""
         token = self.get_guest_token()
         if not token:
             return None
             
         try:
-            return Spotify(auth=token)
+            # Client-credentials tokens cannot read a user profile, so skip verification
+            return client_pool.get_client(GUEST_KEY, token, verify=False)
         except Exception as e:
-            logger.error(f"Error creating public Spotify client: {str(e)}")
+            logger.error("Error creating public Spotify client: %s", e)
             return None
 
     def get_auth_url(self):
@@ -144,10 +111,10 @@ class SpotifyService:
             oauth = self.create_oauth()
             auth_url = oauth.get_authorize_url()
             session['oauth_state'] = oauth.state
-            logger.info(f"Generated auth URL with state: {oauth.state}")
+            logger.info("Generated auth URL with state: %s", oauth.state)
             return auth_url
         except Exception as e:
-            logger.error(f"Error getting auth URL: {str(e)}")
+            logger.error("Error getting auth URL: %s", e)
             raise SpotifyAuthError("Failed to generate authorization URL")
 
     def get_token(self, code):
@@ -169,7 +136,7 @@ class SpotifyService:
             logger.info("Successfully obtained token information")
             return token_info
         except Exception as e:
-            logger.error(f"Error getting token: {str(e)}")
+            logger.error("Error getting token: %s", e)
             raise SpotifyAuthError(f"Failed to get access token: {str(e)}")
 
     def refresh_token(self, token_info):
@@ -193,10 +160,10 @@ class SpotifyService:
             logger.info("Token refreshed successfully.")
             return session['token_info']
         except SpotifyAuthError as e:
-            logger.error(f"Authentication error refreshing token: {str(e)}")
+            logger.error("Authentication error refreshing token: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error refreshing token: {str(e)}")
+            logger.error("Unexpected error refreshing token: %s", e)
             return None
 
     def get_spotify_client(self):
@@ -226,31 +193,46 @@ class SpotifyService:
     
             # Reset refresh attempts counter on successful access
             session.pop('refresh_attempts', None)
-            return Spotify(auth=token_info['access_token'])
+            return client_pool.get_client(self._client_key(token_info), token_info['access_token'])
         except Exception as e:
-            logger.error(f"Error getting Spotify client: {str(e)}")
+            logger.error("Error getting Spotify client: %s", e)
             return None
 
+    def current_client_key(self):
+        """Client pool key of the signed-in user, or None without a session token."""
+        token_info = session.get('token_info')
+        return self._client_key(token_info) if token_info else None
+
+    def _client_key(self, token_info):
+        """Key identifying the current user in the client pool."""
+        user_info = session.get('user_info') or {}
+        if user_info.get('id'):
+            return f"user:{user_info['id']}"
+        # Before the profile is known (e.g. during the OAuth callback) key by refresh token
+        refresh_token = token_info.get('refresh_token') or token_info['access_token']
+        return f"token:{hashlib.sha256(refresh_token.encode()).hexdigest()[:16]}"
+
     def is_token_expired(self, token_info):
         """Check if the token is expired."""
         try:
             now = int(datetime.now().timestamp())
             return token_info['expires_at'] - now < 60
         except Exception as e:
-            logger.error(f"Error checking token expiration: {str(e)}")
+            logger.error("Error checking token expiration: %s", e)
             return True
 
     def clear_auth(self):
         """Clear all authentication data."""
         try:
+            token_info = session.get('token_info')
+            if token_info:
+                client_pool.discard(self._client_key(token_info))
             session.clear()
             self._oauth = None
             self._client_credentials = None
-            self._guest_token = None
-            self._guest_token_expiry = None
             logger.info("Successfully cleared authentication data")
         except Exception as e:
-            logger.error(f"Error clearing auth: {str(e)}")
+            logger.error("Error clearing auth: %s", e)
             raise
 
     @staticmethod
@@ -271,7 +253,7 @@ class SpotifyService:
                 raise SpotifyAuthError("No valid Spotify client")
             return sp.current_user()
         except Exception as e:
-            logger.error(f"Error getting current user: {str(e)}")
+            logger.error("Error getting current user: %s", e)
             raise
 
     def get_user_playlists(self, limit=50):
@@ -293,5 +275,5 @@ class SpotifyService:
 
             return playlists
         except Exception as e:
-            logger.error(f"Error getting user playlists: {str(e)}")
+            logger.error("Error getting user playlists: %s", e)
             raise
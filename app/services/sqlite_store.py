@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+
+DATA_DIR = 'data'
+
+class SQLiteStore:
+    """Base for node-local stores shared by every worker process through SQLite.
+
+    The database runs in WAL mode so readers never block the single writer.
+    Each process opens its own connection lazily (and again after a fork),
+    guarded by a lock so greenlets and threads can share it.
+    """
+
+    SCHEMA = ()
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        """Return this process's connection, reopening it after a fork."""
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def _transaction(self, func):
+        """Run ``func(conn)`` in one immediate transaction and return its result."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return result
+
+    def _write(self, statements):
+        """Run ``(sql, params, many)`` statements in one immediate transaction."""
+        def run(conn):
+            for sql, params, many in statements:
+                if many:
+                    conn.executemany(sql, params)
+                else:
+                    conn.execute(sql, params)
+        self._transaction(run)
@@ -0,0 +1,130 @@
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+# Numeric per-track fields held as one array each
+NUMERIC_FIELDS = (
+    'popularity',
+    'duration_ms',
+    'energy',
+    'tempo',
+    'danceability',
+    'valence',
+    'instrumentalness',
+    'key',
+    'mode',
+    'time_signature'
+)
+
+INTEGER_FIELDS = ('popularity', 'duration_ms', 'key', 'mode', 'time_signature')
+
+PERCENTILE_FIELDS = ('popularity', 'energy', 'tempo', 'danceability', 'valence', 'duration_ms')
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Width of each histogram bin in the units of its field
+TEMPO_BIN_WIDTH = 10
+
+def _counts(values: np.ndarray) -> Dict[Any, int]:
+    """Histogram of the distinct values in an array, as plain Python types."""
+    if values.size == 0:
+        return {}
+    keys, counts = np.unique(values, return_counts=True)
+    return dict(zip(keys.tolist(), counts.tolist()))
+
+class TrackColumns:
+    """Columnar view of per-track analysis rows with one NumPy array per feature.
+
+    Rows are read once into a float matrix whose columns become the feature
+    arrays, so aggregates, histograms and threshold masks are all computed
+    vectorized instead of one dict update per track.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.size = len(rows)
+        fields = NUMERIC_FIELDS + ('explicit', 'preview_url', 'last_played', 'release_date')
+
+        if rows:
+            values = list(zip(*map(itemgetter(*fields), rows)))
+        else:
+            values = [()] * len(fields)
+        columns = dict(zip(fields, values))
+
+        self.columns = {}
+        for field in NUMERIC_FIELDS:
+            column = np.nan_to_num(np.array(columns[field], dtype=np.float64))
+            self.columns[field] = column.astype(np.int64) if field in INTEGER_FIELDS else column
+
+        self.explicit = np.fromiter(map(bool, columns['explicit']), dtype=bool, count=self.size)
+        self.has_preview = np.fromiter(map(bool, columns['preview_url']), dtype=bool, count=self.size)
+        self.played = np.not_equal(np.array(columns['last_played'], dtype=object), None)
+
+        # Only the first four characters of a release date are the year
+        dates = np.array(columns['release_date'], dtype='U4')
+        valid = (np.char.str_len(dates) == 4) & np.char.isdigit(dates)
+        self.release_year = np.full(self.size, -1, dtype=np.int64)
+        self.release_year[valid] = dates[valid].astype(np.int64)
+
+        self.artists = Counter(chain.from_iterable(map(itemgetter('artists'), rows)))
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def mean(self, field: str) -> float:
+        """Mean of a feature, or 0 for an empty playlist."""
+        return float(self.columns[field].mean()) if self.size else 0
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """10th to 90th percentiles of the main features."""
+        if not self.size:
+            return {}
+        return {
+            field: {
+                f"p{q}": float(value)
+                for q, value in zip(PERCENTILES, np.percentile(self.columns[field], PERCENTILES))
+            }
+            for field in PERCENTILE_FIELDS
+        }
+
+    def distributions(self) -> Dict[str, Dict[Any, int]]:
+        """Histograms keyed by bin, using the same bins as the per-track analysis."""
+        years = self.release_year[self.release_year >= 0]
+        return {
+            'artist_distribution': dict(self.artists),
+            'popularity_distribution': _counts(self.columns['popularity'] // 10 * 10),
+            'energy_ranges': _counts((self.columns['energy'] * 10).astype(np.int64) * 10),
+            'tempo_distribution': _counts((self.columns['tempo'] // TEMPO_BIN_WIDTH * TEMPO_BIN_WIDTH).astype(np.int64)),
+            'decade_distribution': _counts(years // 10 * 10),
+            'key_distribution': _counts(self.columns['key']),
+            'mode_distribution': _counts(self.columns['mode']),
+            'time_signature_distribution': _counts(self.columns['time_signature'])
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals, averages, percentages, percentiles and histograms for the analysis."""
+        size = self.size
+        explicit_tracks = int(self.explicit.sum())
+        played_tracks = int(self.played.sum())
+
+        summary = {
+            'played_tracks': played_tracks,
+            'inactive_tracks': size - played_tracks,
+            'total_duration_ms': int(self.columns['duration_ms'].sum()),
+            'explicit_tracks': explicit_tracks,
+            'preview_available': int(self.has_preview.sum()),
+            'average_popularity': self.mean('popularity'),
+            'average_energy': self.mean('energy'),
+            'average_tempo': self.mean('tempo'),
+            'average_danceability': self.mean('danceability'),
+            'average_valence': self.mean('valence'),
+            'explicit_percentage': explicit_tracks / size * 100 if size else 0,
+            'active_percentage': played_tracks / size * 100 if size else 0,
+            'percentiles': self.percentiles()
+        }
+        summary.update(self.distributions())
+        return summary
+
+    def below_thresholds(self, min_popularity: int, min_energy: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Masks of tracks below the popularity and energy thresholds."""
+        return self.columns['popularity'] < min_popularity, self.columns['energy'] < min_energy
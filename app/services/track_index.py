@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Audio features compared between tracks and the range each is scaled from to [0, 1]
+FEATURE_SCALES = {
+    'energy': (0.0, 1.0),
+    'danceability': (0.0, 1.0),
+    'valence': (0.0, 1.0),
+    'acousticness': (0.0, 1.0),
+    'instrumentalness': (0.0, 1.0),
+    'tempo': (50.0, 200.0)
+}
+
+FEATURE_DIMENSIONS = tuple(FEATURE_SCALES)
+
+_LOWER = np.array([low for low, _ in FEATURE_SCALES.values()])
+_RANGE = np.array([high - low for low, high in FEATURE_SCALES.values()])
+
+# Largest distance between two vectors in the unit cube
+MAX_DISTANCE = float(np.sqrt(len(FEATURE_DIMENSIONS)))
+
+KMEANS_ITERATIONS = 20
+
+def feature_matrix(features: Dict[str, Dict[str, Any]], track_ids: List[str]) -> np.ndarray:
+    """Normalised feature vectors of ``track_ids``, one row each; missing values sit mid-range."""
+    rows = []
+    for track_id in track_ids:
+        feature = features.get(track_id)
+        feature = feature if isinstance(feature, dict) else {}
+        rows.append([feature.get(name) for name in FEATURE_DIMENSIONS])
+
+    matrix = np.array(rows, dtype=np.float64).reshape(len(track_ids), len(FEATURE_DIMENSIONS))
+    matrix = (matrix - _LOWER) / _RANGE
+    matrix[np.isnan(matrix)] = 0.5
+    return np.clip(matrix, 0.0, 1.0)
+
+def denormalise(vector: np.ndarray) -> Dict[str, float]:
+    """A normalised vector in each feature's own units."""
+    return dict(zip(FEATURE_DIMENSIONS, (vector * _RANGE + _LOWER).tolist()))
+
+def squared_distances(matrix: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Squared Euclidean distance from every row of ``matrix`` to every row of ``points``."""
+    return ((matrix[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+
+def kmeans(matrix: np.ndarray, clusters: int, seed: int = 0) -> np.ndarray:
+    """Cluster labels of each row from k-means++ seeded by ``seed``, so results repeat."""
+    size = len(matrix)
+    clusters = min(clusters, size)
+    if clusters <= 1:
+        return np.zeros(size, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    centres = [matrix[rng.integers(size)]]
+    nearest = squared_distances(matrix, centres[0][None]).ravel()
+    for _ in range(clusters - 1):
+        total = nearest.sum()
+        if total == 0:
+            break
+        centres.append(matrix[rng.choice(size, p=nearest / total)])
+        nearest = np.minimum(nearest, squared_distances(matrix, centres[-1][None]).ravel())
+    centres = np.array(centres)
+
+    labels = None
+    for _ in range(KMEANS_ITERATIONS):
+        new_labels = squared_distances(matrix, centres).argmin(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=len(centres))
+        sums = np.zeros_like(centres)
+        np.add.at(sums, labels, matrix)
+        occupied = counts > 0
+        centres[occupied] = sums[occupied] / counts[occupied, None]
+    return labels
+
+def farthest_point_sample(matrix: np.ndarray, count: int) -> np.ndarray:
+    """Row indices of ``count`` rows spread across ``matrix`` by farthest-point sampling.
+
+    Starts from the row nearest the centroid, then repeatedly adds the row
+    farthest from everything chosen so far. Ties go to the lowest index, so
+    the same matrix always gives the same rows. Distances are expanded as
+    ``|x|^2 - 2x.c + |c|^2`` so each step is one matrix-vector product.
+    """
+    size = len(matrix)
+    count = min(count, size)
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    norms = np.einsum('ij,ij->i', matrix, matrix)
+    chosen = np.empty(count, dtype=np.int64)
+    chosen[0] = (norms - 2 * (matrix @ matrix.mean(axis=0))).argmin()
+    nearest = norms - 2 * (matrix @ matrix[chosen[0]]) + norms[chosen[0]]
+    for step in range(1, count):
+        point = chosen[step] = nearest.argmax()
+        np.minimum(nearest, norms - 2 * (matrix @ matrix[point]) + norms[point], out=nearest)
+    return chosen
+
+class TrackVectorIndex:
+    """A playlist's normalised audio-feature vectors, summarised by its centroid and cluster centroids.
+
+    Candidates are scored against those few anchors by brute force in one
+    vectorized pass: a candidate is similar when it is close to the playlist
+    as a whole and to the nearest group of its tracks, so a playlist mixing
+    styles does not only favour tracks between them.
+    """
+
+    def __init__(self, track_ids: List[str], matrix: np.ndarray, clusters: int = 4, seed: int = 0):
+        self.track_ids = list(track_ids)
+        self.matrix = matrix
+        self.centroid = matrix.mean(axis=0) if len(matrix) else np.full(len(FEATURE_DIMENSIONS), 0.5)
+        self.labels = kmeans(matrix, clusters, seed) if len(matrix) else np.zeros(0, dtype=np.int64)
+        self.cluster_sizes = np.bincount(self.labels) if len(matrix) else np.zeros(0, dtype=np.int64)
+        occupied = np.flatnonzero(self.cluster_sizes)
+        self.cluster_centroids = np.array([matrix[self.labels == label].mean(axis=0) for label in occupied])
+        self.labels = np.searchsorted(occupied, self.labels)
+        self.cluster_sizes = self.cluster_sizes[occupied]
+
+    @classmethod
+    def from_features(cls, features: Dict[str, Dict[str, Any]], clusters: int = 4, seed: int = 0) -> 'TrackVectorIndex':
+        """Index the tracks of a ``get_audio_features_batch`` result."""
+        track_ids = list(features)
+        return cls(track_ids, feature_matrix(features, track_ids), clusters, seed)
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def score(self, matrix: np.ndarray) -> np.ndarray:
+        """Similarity in [0, 1] of each row: the mean closeness to the centroid and to the nearest cluster."""
+        if not len(matrix):
+            return np.zeros(0)
+        to_centroid = np.sqrt(squared_distances(matrix, self.centroid[None]).ravel())
+        if len(self.cluster_centroids):
+            to_cluster = np.sqrt(squared_distances(matrix, self.cluster_centroids).min(axis=1))
+        else:
+            to_cluster = to_centroid
+        return 1.0 - (to_centroid + to_cluster) / (2 * MAX_DISTANCE)
+
+    def rank(self, features: Dict[str, Dict[str, Any]], track_ids: List[str]) -> List[Tuple[str, float]]:
+        """``(track_id, similarity)`` pairs for ``track_ids``, most similar first."""
+        scores = self.score(feature_matrix(features, track_ids))
+        order = np.argsort(-scores, kind='stable')
+        return [(track_ids[i], float(scores[i])) for i in order]
+
+    def cluster_members(self, cluster: int, count: int) -> List[str]:
+        """IDs of the ``count`` tracks closest to a cluster's centroid."""
+        members = np.flatnonzero(self.labels == cluster)
+        distances = squared_distances(self.matrix[members], self.cluster_centroids[cluster][None]).ravel()
+        return [self.track_ids[i] for i in members[np.argsort(distances, kind='stable')[:count]]]
+
+    def diverse_seeds(self, count: int = 5) -> List[str]:
+        """IDs of ``count`` tracks covering the spread of the playlist's features."""
+        return [self.track_ids[i] for i in farthest_point_sample(self.matrix, count)]
+
+    def targets(self, vector: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """``target_*`` recommendation parameters for a vector, the playlist centroid by default."""
+        vector = self.centroid if vector is None else vector
+        return {f"target_{name}": value for name, value in denormalise(vector).items()}
@@ -0,0 +1,259 @@
+import random
+
+# Markets listed on a typical recorded track and album; they dominate unprojected payloads
+MARKETS = [
+    "AD", "AE", "AG", "AL", "AM", "AO", "AR", "AT", "AU", "AZ", "BA", "BB", "BD", "BE", "BF", "BG", "BH", "BI",
+    "BJ", "BN", "BO", "BR", "BS", "BT", "BW", "BY", "BZ", "CA", "CD", "CG", "CH", "CI", "CL", "CM", "CO", "CR",
+    "CV", "CW", "CY", "CZ", "DE", "DJ", "DK", "DM", "DO", "DZ", "EC", "EE", "EG", "ES", "ET", "FI", "FJ", "FM",
+    "FR", "GA", "GB", "GD", "GE", "GH", "GM", "GN", "GQ", "GR", "GT", "GW", "GY", "HK", "HN", "HR", "HT", "HU",
+    "ID", "IE", "IL", "IN", "IQ", "IS", "IT", "JM", "JO", "JP", "KE", "KG", "KH", "KI", "KM", "KN", "KR", "KW",
+    "KZ", "LA", "LB", "LC", "LI", "LK", "LR", "LS", "LT", "LU", "LV", "LY", "MA", "MC", "MD", "ME", "MG", "MH",
+    "MK", "ML", "MN", "MO", "MR", "MT", "MU", "MV", "MW", "MX", "MY", "MZ", "NA", "NE", "NG", "NI", "NL", "NO",
+    "NP", "NR", "NZ", "OM", "PA", "PE", "PG", "PH", "PK", "PL", "PS", "PT", "PW", "PY", "QA", "RO", "RS", "RW",
+    "SA", "SB", "SC", "SE", "SG", "SI", "SK", "SL", "SM", "SN", "SR", "ST", "SV", "SZ", "TD", "TG", "TH", "TJ",
+    "TL", "TN", "TO", "TR", "TT", "TV", "TW", "TZ", "UA", "UG", "US", "UY", "UZ", "VC", "VE", "VN", "VU", "WS",
+    "XK", "ZA", "ZM", "ZW"
+]
+
+API_URL = 'https://api.spotify.com/v1'
+
+def spotify_id(kind, index):
+    """Deterministic 22 character Spotify ID."""
+    return f"{kind}{index:021d}"
+
+def _artist(index):
+    artist_id = spotify_id('a', index)
+    return {
+        'external_urls': {'spotify': f"https://open.spotify.com/artist/{artist_id}"},
+        'href': f"{API_URL}/artists/{artist_id}",
+        'id': artist_id,
+        'name': f"Artist {index}",
+        'type': 'artist',
+        'uri': f"spotify:artist:{artist_id}"
+    }
+
+def make_track(index, rng):
+    """A full track object shaped like a recorded ``tracks`` response entry."""
+    track_id = spotify_id('t', index)
+    album_id = spotify_id('b', index // 10)
+    primary = rng.randrange(max(10, index // 8 + 1))
+    album = {
+        'album_type': rng.choice(['album', 'album', 'single', 'compilation']),
+        'artists': [_artist(primary)],
+        'available_markets': MARKETS,
+        'external_urls': {'spotify': f"https://open.spotify.com/album/{album_id}"},
+        'href': f"{API_URL}/albums/{album_id}",
+        'id': album_id,
+        'images': [
+            {'height': size, 'url': f"https://i.scdn.co/image/ab67616d0000{size:04d}{album_id}", 'width': size}
+            for size in (640, 300, 64)
+        ],
+        'name': f"Album {index // 10}",
+        'release_date': f"{rng.randint(1960, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'release_date_precision': 'day',
+        'total_tracks': 12,
+        'type': 'album',
+        'uri': f"spotify:album:{album_id}"
+    }
+    artists = [_artist(primary)]
+    if rng.random() < 0.3:
+        artists.append(_artist(rng.randrange(1000)))
+    return {
+        'album': album,
+        'artists': artists,
+        'available_markets': MARKETS,
+        'disc_number': 1,
+        'duration_ms': rng.randint(90000, 420000),
+        'episode': False,
+        'explicit': rng.random() < 0.2,
+        'external_ids': {'isrc': f"USRC1{index:07d}"},
+        'external_urls': {'spotify': f"https://open.spotify.com/track/{track_id}"},
+        'href': f"{API_URL}/tracks/{track_id}",
+        'id': track_id,
+        'is_local': False,
+        'name': f"Track {index}",
+        'popularity': rng.randint(0, 100),
+        'preview_url': f"https://p.scdn.co/mp3-preview/{track_id}" if rng.random() < 0.7 else None,
+        'track': True,
+        'track_number': index % 12 + 1,
+        'type': 'track',
+        'uri': f"spotify:track:{track_id}"
+    }
+
+def make_audio_features(track, rng):
+    """An ``audio-features`` entry for a track."""
+    return {
+        'acousticness': rng.random(),
+        'analysis_url': f"{API_URL}/audio-analysis/{track['id']}",
+        'danceability': rng.random(),
+        'duration_ms': track['duration_ms'],
+        'energy': rng.random(),
+        'id': track['id'],
+        'instrumentalness': rng.random() ** 4,
+        'key': rng.randrange(12),
+        'liveness': rng.random(),
+        'loudness': -rng.random() * 20,
+        'mode': rng.randrange(2),
+        'speechiness': rng.random() / 3,
+        'tempo': 60 + rng.random() * 120,
+        'time_signature': 4,
+        'track_href': track['href'],
+        'type': 'audio_features',
+        'uri': track['uri'],
+        'valence': rng.random()
+    }
+
+class PlaylistFixture:
+    """A playlist and the catalog around it, replayed in place of the Spotify API.
+
+    Responses are built in the shape Spotify returns them, full objects
+    included, from a fixed seed so every run replays identical data. About
+    2% of the items repeat an earlier track and a few are local files, as
+    in real playlists. Removals change the contents and the ``snapshot_id``.
+    """
+
+    def __init__(self, size, seed=0, playlist_id='benchmarkplaylist0000'):
+        rng = random.Random(seed)
+        self.playlist_id = playlist_id
+        self.version = 1
+        self.tracks = {}
+        self.audio_features = {}
+        self.items = []
+
+        for index in range(size):
+            if index > 10 and rng.random() < 0.02:
+                track = self.items[rng.randrange(len(self.items))]['track']
+            elif index > 10 and rng.random() < 0.002:
+                track = self._local_track(index)
+            else:
+                track = self._add_track(index, rng)
+            self.items.append(self._item(track, rng))
+
+        # Recommendations come from tracks outside the playlist
+        self.recommendations = [self._add_track(size + index, rng) for index in range(100)]
+        self.recently_played = [
+            {
+                'track': self.items[rng.randrange(len(self.items))]['track'],
+                'played_at': f"2024-06-{rng.randint(1, 28):02d}T12:00:00.000Z",
+                'context': None
+            }
+            for _ in range(min(50, size))
+            if size
+        ]
+        # Saved library: tracks outside the playlist, then some from it
+        saved = [self._add_track(size + 100 + index, rng) for index in range(150)]
+        saved += [self.items[rng.randrange(len(self.items))]['track'] for _ in range(min(50, size))]
+        self.saved_tracks = [
+            {'added_at': f"2024-0{rng.randint(1, 9)}-{rng.randint(1, 28):02d}T08:00:00Z", 'track': track}
+            for track in saved
+        ]
+
+    def _add_track(self, index, rng):
+        track = make_track(index, rng)
+        self.tracks[track['id']] = track
+        self.audio_features[track['id']] = make_audio_features(track, rng)
+        return track
+
+    @staticmethod
+    def _local_track(index):
+        return {
+            'id': None,
+            'name': f"Local file {index}",
+            'uri': f"spotify:local:::Local+file+{index}:180",
+            'is_local': True,
+            'artists': [{'name': '', 'id': None}],
+            'album': {'name': '', 'images': []},
+            'duration_ms': 180000,
+            'popularity': 0
+        }
+
+    @staticmethod
+    def _item(track, rng):
+        return {
+            'added_at': f"20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00Z",
+            'added_by': {
+                'external_urls': {'spotify': 'https://open.spotify.com/user/benchmark'},
+                'href': f"{API_URL}/users/benchmark",
+                'id': 'benchmark',
+                'type': 'user',
+                'uri': 'spotify:user:benchmark'
+            },
+            'is_local': bool(track.get('is_local')),
+            'primary_color': None,
+            'track': track,
+            'video_thumbnail': {'url': None}
+        }
+
+    @property
+    def snapshot_id(self):
+        return f"{self.playlist_id}-v{self.version}"
+
+    def page(self, offset, limit):
+        """A ``playlists/{id}/tracks`` paging object."""
+        href = f"{API_URL}/playlists/{self.playlist_id}/tracks"
+        total = len(self.items)
+        return {
+            'href': f"{href}?offset={offset}&limit={limit}",
+            'items': self.items[offset:offset + limit],
+            'limit': limit,
+            'next': f"{href}?offset={offset + limit}&limit={limit}" if offset + limit < total else None,
+            'offset': offset,
+            'previous': f"{href}?offset={max(0, offset - limit)}&limit={limit}" if offset else None,
+            'total': total
+        }
+
+    def playlist(self):
+        """A ``playlists/{id}`` object with its first page of items."""
+        return {
+            'collaborative': False,
+            'description': 'Benchmark playlist',
+            'external_urls': {'spotify': f"https://open.spotify.com/playlist/{self.playlist_id}"},
+            'followers': {'href': None, 'total': 12},
+            'href': f"{API_URL}/playlists/{self.playlist_id}",
+            'id': self.playlist_id,
+            'images': [{'height': 640, 'url': f"https://mosaic.scdn.co/640/{self.playlist_id}", 'width': 640}],
+            'name': f"Benchmark {len(self.items)}",
+            'owner': {'display_name': 'Benchmark', 'id': 'benchmark', 'type': 'user', 'uri': 'spotify:user:benchmark'},
+            'public': True,
+            'snapshot_id': self.snapshot_id,
+            'tracks': self.page(0, 100),
+            'type': 'playlist',
+            'uri': f"spotify:playlist:{self.playlist_id}"
+        }
+
+    def saved_page(self, offset, limit):
+        """A ``me/tracks`` paging object."""
+        href = f"{API_URL}/me/tracks"
+        total = len(self.saved_tracks)
+        return {
+            'href': f"{href}?offset={offset}&limit={limit}",
+            'items': self.saved_tracks[offset:offset + limit],
+            'limit': limit,
+            'next': f"{href}?offset={offset + limit}&limit={limit}" if offset + limit < total else None,
+            'offset': offset,
+            'previous': None,
+            'total': total
+        }
+
+    def remove(self, tracks, snapshot_id=None):
+        """Apply a ``DELETE playlists/{id}/tracks`` body; returns False if a position does not match."""
+        if snapshot_id is not None and snapshot_id != self.snapshot_id:
+            return False
+
+        remove_positions = set()
+        remove_uris = set()
+        for entry in tracks:
+            if 'positions' in entry:
+                for position in entry['positions']:
+                    if position >= len(self.items) or self.items[position]['track']['uri'] != entry['uri']:
+                        return False
+                    remove_positions.add(position)
+            else:
+                remove_uris.add(entry['uri'])
+
+        self.items = [
+            item for position, item in enumerate(self.items)
+            if position not in remove_positions and item['track']['uri'] not in remove_uris
+        ]
+        self.version += 1
+        return True
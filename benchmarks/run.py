@@ -0,0 +1,243 @@
+"""Micro-benchmarks for the playlist manager's hot paths.
+
+Replays fixture Spotify responses through a local stand-in transport, so
+no credentials or network are needed. Run from the repository root:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 100,1000 --only analyze_tracks,optimize_playlist --json
+
+For each benchmark and playlist size it reports wall time, CPU time (work
+done by every thread), time spent sleeping (rate limiting, backoff and
+simulated latency, summed over threads), upstream calls and peak traced
+memory. Peak memory comes from a separate run under ``tracemalloc`` so
+tracing does not distort the timings. Every run starts from empty caches.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCHMARKS = (
+    'get_playlist_tracks',
+    'get_audio_features_batch',
+    'analyze_tracks',
+    'optimize_playlist',
+    'get_similar_tracks',
+    'convert_to_serializable'
+)
+
+OPTIMIZE_CRITERIA = {'minPopularity': 30, 'minEnergy': 0.2, 'autoRemove': True}
+
+class SleepRecorder:
+    """Wraps ``time.sleep`` to total the time every thread spends sleeping."""
+
+    def __init__(self):
+        self.total = 0.0
+        self._sleep = time.sleep
+        self._lock = threading.Lock()
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.total += max(0.0, seconds)
+        self._sleep(seconds)
+
+    def __enter__(self):
+        time.sleep = self.sleep
+        return self
+
+    def __exit__(self, *exc_info):
+        time.sleep = self._sleep
+
+def configure_environment(args, data_dir):
+    """Point every store at a scratch directory and keep coordination in process.
+
+    Must run before the app is imported, since its singletons read the
+    environment at import time.
+    """
+    os.environ['ANALYSIS_CACHE_PATH'] = os.path.join(data_dir, 'analysis_cache.db')
+    os.environ['FEATURE_STORE_PATH'] = os.path.join(data_dir, 'audio_features.db')
+    os.environ['SPOTIFY_QUOTA_BACKEND'] = 'none'
+    os.environ['CATEGORY_CACHE_BACKEND'] = 'memory'
+    os.environ['GUEST_TOKEN_STORE'] = 'none'
+    os.environ['METRICS_BACKEND'] = 'none'
+    if args.max_rps:
+        os.environ['SPOTIFY_MAX_RPS'] = str(args.max_rps)
+
+    # Log records are still formatted, as in production, but not printed
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(open(os.devnull, 'w'))]
+    )
+
+class Harness:
+    """Builds a fresh fixture, transport and manager for each benchmark run."""
+
+    def __init__(self, latency):
+        import requests
+        import spotipy
+        from app.manager import SpotifyPlaylistManager
+        from app.services.analysis_cache import analysis_cache
+        from app.services.feature_store import feature_store
+        from app.services.request_scheduler import request_scheduler, MAX_BATCH_SIZES
+        from benchmarks.fixtures import PlaylistFixture
+        from benchmarks.transport import ReplayTransport
+
+        self.latency = latency
+        self.requests = requests
+        self.spotipy = spotipy
+        self.manager_class = SpotifyPlaylistManager
+        self.analysis_cache = analysis_cache
+        self.feature_store = feature_store
+        self.request_scheduler = request_scheduler
+        self.max_batch_sizes = MAX_BATCH_SIZES
+        self.fixture_class = PlaylistFixture
+        self.transport_class = ReplayTransport
+        self.fixtures = {}
+
+    def fixture(self, size):
+        """A fresh copy of the fixture for ``size`` tracks; generated once per size."""
+        if size not in self.fixtures:
+            self.fixtures[size] = self.fixture_class(size)
+        fixture = self.fixtures[size]
+        clone = self.fixture_class.__new__(self.fixture_class)
+        clone.__dict__.update(fixture.__dict__)
+        clone.items = list(fixture.items)
+        return clone
+
+    def reset(self):
+        """Empty the caches and give the request scheduler a full bucket."""
+        self.feature_store._write([('DELETE FROM audio_features', (), False)])
+        self.analysis_cache._write([('DELETE FROM playlist_analysis', (), False)])
+        scheduler = self.request_scheduler
+        with scheduler._lock:
+            scheduler.rate = scheduler.max_rate
+            scheduler.tokens = scheduler.burst
+            scheduler.last_refill = time.monotonic()
+            scheduler.paused_until = 0.0
+            scheduler.batch_sizes = dict(self.max_batch_sizes)
+
+    def manager(self, size):
+        """Manager on a real spotipy client whose HTTP calls the replay transport answers."""
+        fixture = self.fixture(size)
+        transport = self.transport_class(fixture, latency=self.latency)
+        session = self.requests.Session()
+        session.mount('https://', transport)
+        sp = self.spotipy.Spotify(auth='benchmark-token', requests_session=session, retries=0)
+        return self.manager_class(fixture.playlist_id, sp=sp), transport
+
+    def prepare(self, name, manager):
+        """Untimed setup for a benchmark; returns the callable to measure."""
+        if name == 'get_playlist_tracks':
+            return manager.get_playlist_tracks
+        if name == 'get_audio_features_batch':
+            track_ids = [item['track']['id'] for item in manager.get_playlist_tracks()]
+            return lambda: manager.get_audio_features_batch(track_ids)
+        if name == 'analyze_tracks':
+            return manager.analyze_tracks
+        if name == 'optimize_playlist':
+            return lambda: manager.optimize_playlist(OPTIMIZE_CRITERIA)
+        if name == 'get_similar_tracks':
+            return manager.get_similar_tracks
+        if name == 'convert_to_serializable':
+            analysis = manager.analyze_tracks()
+            import numpy as np
+            # Analysis as built before conversion, numpy scalars included
+            for row in analysis['track_details']:
+                row['popularity'] = np.int64(row['popularity'])
+                row['energy'] = np.float64(row['energy'])
+            return lambda: manager.convert_to_serializable(analysis)
+        raise ValueError(f"Unknown benchmark: {name}")
+
+    def run(self, name, size, trace_memory=False):
+        """Run one benchmark from empty caches and return its measurements."""
+        self.reset()
+        manager, transport = self.manager(size)
+        func = self.prepare(name, manager)
+        calls_before = transport.total_calls
+        bytes_before = transport.bytes_sent
+
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            with SleepRecorder() as sleeps:
+                cpu_start = time.process_time()
+                wall_start = time.perf_counter()
+                func()
+                wall = time.perf_counter() - wall_start
+                cpu = time.process_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+
+        return {
+            'benchmark': name,
+            'tracks': size,
+            'wall_ms': wall * 1000,
+            'cpu_ms': cpu * 1000,
+            'sleep_ms': sleeps.total * 1000,
+            'upstream_calls': transport.total_calls - calls_before,
+            'upstream_bytes': transport.bytes_sent - bytes_before,
+            'peak_mib': peak / 2**20 if peak is not None else None
+        }
+
+def measure(harness, name, size, repeat, trace_memory):
+    """Best of ``repeat`` timed runs, plus the peak memory of one traced run."""
+    runs = [harness.run(name, size) for _ in range(repeat)]
+    result = min(runs, key=lambda run: run['wall_ms'])
+    if trace_memory:
+        result['peak_mib'] = harness.run(name, size, trace_memory=True)['peak_mib']
+    return result
+
+def format_table(results):
+    header = f"{'benchmark':<26}{'tracks':>8}{'wall ms':>11}{'cpu ms':>11}{'sleep ms':>11}{'calls':>8}{'KiB in':>10}{'peak MiB':>10}"
+    lines = [header, '-' * len(header)]
+    for result in results:
+        peak = f"{result['peak_mib']:.1f}" if result['peak_mib'] is not None else '-'
+        lines.append(
+            f"{result['benchmark']:<26}{result['tracks']:>8}{result['wall_ms']:>11.1f}{result['cpu_ms']:>11.1f}"
+            f"{result['sleep_ms']:>11.1f}{result['upstream_calls']:>8}{result['upstream_bytes'] / 1024:>10.0f}{peak:>10}"
+        )
+    return '\n'.join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000', help='comma separated playlist sizes')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help='comma separated benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per case; the fastest is reported')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated seconds per upstream call')
+    parser.add_argument('--max-rps', type=float, default=None, help='override SPOTIFY_MAX_RPS for the request scheduler')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run for peak memory')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    names = [name for name in args.only.split(',') if name]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory(prefix='spm-bench-') as data_dir:
+        configure_environment(args, data_dir)
+        harness = Harness(args.latency)
+        results = []
+        for name in names:
+            for size in sizes:
+                result = measure(harness, name, size, max(1, args.repeat), not args.no_memory)
+                results.append(result)
+                if not args.json:
+                    print(format_table([result]).splitlines()[-1] if len(results) > 1 else format_table([result]), flush=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+import requests
+from requests.adapters import BaseAdapter
+
+def parse_fields(spec):
+    """Parse a Spotify ``fields`` value into a nested dict; None selects a whole value."""
+    def add(tree, name, subtree):
+        *parents, leaf = name.split('.')
+        for parent in parents:
+            tree = tree.setdefault(parent, {})
+        tree[leaf] = subtree
+
+    def parse(index):
+        tree = {}
+        name = ''
+        while index < len(spec):
+            char = spec[index]
+            if char == ',':
+                if name:
+                    add(tree, name, None)
+                name = ''
+                index += 1
+            elif char == '(':
+                subtree, index = parse(index + 1)
+                add(tree, name, subtree)
+                name = ''
+            elif char == ')':
+                if name:
+                    add(tree, name, None)
+                return tree, index + 1
+            else:
+                name += char
+                index += 1
+        if name:
+            add(tree, name, None)
+        return tree, index
+
+    return parse(0)[0]
+
+def project(value, tree):
+    """Keep only the fields selected by a parsed ``fields`` tree, as Spotify does."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(entry, tree) for entry in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+class ReplayTransport(BaseAdapter):
+    """Requests adapter that answers Spotify Web API calls from a ``PlaylistFixture``.
+
+    Mounted on the session of a real spotipy client, so spotipy's request
+    building and JSON decoding run as in production while nothing leaves
+    the process. Responses are serialised and honour ``fields`` like the
+    API does. Every call is counted per endpoint; ``latency`` adds a
+    simulated round trip, spent sleeping.
+    """
+
+    ROUTES = [
+        ('GET', re.compile(r'^/v1/playlists/([^/]+)/tracks$'), 'playlist_tracks'),
+        ('DELETE', re.compile(r'^/v1/playlists/([^/]+)/tracks$'), 'remove_items'),
+        ('GET', re.compile(r'^/v1/playlists/([^/]+)$'), 'playlist'),
+        ('GET', re.compile(r'^/v1/audio-features/?$'), 'audio_features'),
+        ('GET', re.compile(r'^/v1/tracks/?$'), 'tracks'),
+        ('GET', re.compile(r'^/v1/recommendations$'), 'recommendations'),
+        ('GET', re.compile(r'^/v1/me/player/recently-played$'), 'recently_played'),
+        ('GET', re.compile(r'^/v1/me/tracks$'), 'saved_tracks'),
+        ('GET', re.compile(r'^/v1/me$'), 'me')
+    ]
+
+    def __init__(self, fixture, latency=0.0):
+        super().__init__()
+        self.fixture = fixture
+        self.latency = latency
+        self.calls = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._fields = {}
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        for method, pattern, name in self.ROUTES:
+            match = pattern.match(url.path)
+            if match and request.method == method:
+                break
+        else:
+            name, match = 'unknown', None
+
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if match is None:
+            return self._response(request, 404, {'error': {'status': 404, 'message': 'Not found'}})
+
+        status, payload = getattr(self, f"_{name}")(match, query, request)
+        if status == 200 and query.get('fields'):
+            payload = project(payload, self._parsed_fields(query['fields']))
+        return self._response(request, status, payload)
+
+    def close(self):
+        pass
+
+    def _parsed_fields(self, spec):
+        tree = self._fields.get(spec)
+        if tree is None:
+            tree = self._fields[spec] = parse_fields(spec)
+        return tree
+
+    def _response(self, request, status, payload):
+        body = json.dumps(payload).encode()
+        with self._lock:
+            self.bytes_sent += len(body)
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def _playlist_tracks(self, match, query, request):
+        return 200, self.fixture.page(int(query.get('offset', 0)), int(query.get('limit', 100)))
+
+    def _remove_items(self, match, query, request):
+        body = json.loads(request.body or '{}')
+        if not self.fixture.remove(body.get('tracks', []), body.get('snapshot_id')):
+            return 400, {'error': {'status': 400, 'message': 'Could not remove tracks, please check parameters.'}}
+        return 200, {'snapshot_id': self.fixture.snapshot_id}
+
+    def _playlist(self, match, query, request):
+        return 200, self.fixture.playlist()
+
+    def _audio_features(self, match, query, request):
+        ids = query.get('ids', '').split(',')
+        return 200, {'audio_features': [self.fixture.audio_features.get(track_id) for track_id in ids]}
+
+    def _tracks(self, match, query, request):
+        ids = query.get('ids', '').split(',')
+        return 200, {'tracks': [self.fixture.tracks.get(track_id) for track_id in ids]}
+
+    def _recommendations(self, match, query, request):
+        limit = int(query.get('limit', 20))
+        return 200, {'seeds': [], 'tracks': self.fixture.recommendations[:limit]}
+
+    def _recently_played(self, match, query, request):
+        limit = int(query.get('limit', 20))
+        return 200, {'items': self.fixture.recently_played[:limit], 'next': None, 'limit': limit}
+
+    def _saved_tracks(self, match, query, request):
+        return 200, self.fixture.saved_page(int(query.get('offset', 0)), int(query.get('limit', 20)))
+
+    def _me(self, match, query, request):
+        return 200, {'id': 'benchmark', 'display_name': 'Benchmark'}
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
@@ -1,5 +1,6 @@
 
 import multiprocessing
+import os
 
 
 bind = "0.0.0.0:8000"
@@ -10,6 +11,8 @@ workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "gevent"
 threads = 4
 worker_connections = 1000
+# Size each worker's Spotify connection pool to match its greenlet capacity
+os.environ.setdefault('SPOTIFY_HTTP_POOL_SIZE', str(worker_connections))
 timeout = 300
 keepalive = 2
 
@@ -18,6 +21,8 @@ graceful_timeout = 300
 timeout = 300
 
 # Logging
+# Sampled upstream logs by default; write another mode to LOG_MODE_FILE to switch live
+os.environ.setdefault('LOG_MODE', 'production')
 accesslog = "-"
 errorlog = "-"
 loglevel = "info"
@@ -38,5 +43,17 @@ group = None
 tmp_upload_dir = None
 
 
+def on_starting(server):
+    # Metrics totals start from zero with each server
+    from app.services.metrics import metrics
+    metrics.clear()
+
+
+def post_worker_init(worker):
+    # Every worker drains the shared job queue, not only those that receive submissions
+    from app.services.jobs import job_queue
+    job_queue.start()
+
+
 def child_exit(server, worker):
     server.log.info("Worker exited: %s", worker.pid)